@@ -1,38 +1,326 @@
-import requests
+import atexit
 import json
+import logging
+import os
+import partCache
+import random
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+try:
+    import orjson #Faster dataStr decoding when it is installed
+except ImportError:
+    orjson = None
+
+logger = logging.getLogger(__name__)
+
+baseUrl = os.environ.get("EASYEDA_API_URL", "https://pro.easyeda.com/api").rstrip("/") #See setBaseUrl
+poolSize = 32 #Max connections kept alive to the API, should be at least the number of fetch workers
+searchBatchSize = 100 #Codes sent in one searchByCodes request
+maxRetries = 4 #Retries of a request that was rate limited, hit a server error or lost its connection
+retryBackoff = 0.5 #Seconds before the first retry, doubled for every further retry
+maxRetryWait = 30 #Longest wait before a retry, also caps Retry-After
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+cache = partCache.PartCache()
+
+session = None
+sessionLock = threading.Lock()
+
+componentMemo = OrderedDict() #uuid -> component for the current batch, see clearComponentMemo
+componentMemoSize = 512 #Components kept in componentMemo, the least recently used are read from the cache again
+componentInFlight = {} #uuid -> Future of the download in progress
+componentLock = threading.Lock()
+componentCounts = {"shared": 0, "coalesced": 0}
+requestCounts = {}
+retryCounts = {}
+decodeCounts = {"lines": 0, "errors": 0} #dataStr lines decoded and lines that could not be decoded
+
+def countRequest(endpoint):
+    with componentLock:
+        requestCounts[endpoint] = requestCounts.get(endpoint, 0) + 1
+
+def countRetry(endpoint):
+    with componentLock:
+        retryCounts[endpoint] = retryCounts.get(endpoint, 0) + 1
+
+def retryDelay(response, attempt):
+    delay = retryBackoff * 2 ** attempt
+    if response is not None:
+        try:
+            delay = float(response.headers["Retry-After"])
+        except (KeyError, ValueError):
+            pass
+    return min(maxRetryWait, delay + random.uniform(0, retryBackoff)) #Spread out threads that were limited together
+
+def sendRequest(endpoint, method, url, **kwargs):
+    """
+    Sends a request on the shared session. Rate limited requests, server errors
+    and dropped connections are retried up to maxRetries times, waiting as long
+    as Retry-After asks or backing off exponentially. The last response is
+    returned either way so callers still see the error status.
+    """
+    import requests #Only imported once something has to be downloaded, see getSession
+    attempt = 0
+    while True:
+        countRequest(endpoint)
+        try:
+            response = getSession().request(method, url, **kwargs)
+        except requests.ConnectionError:
+            if attempt >= maxRetries:
+                raise
+            response = None
+        else:
+            if response.status_code not in RETRY_STATUSES or attempt >= maxRetries:
+                return response
+        countRetry(endpoint)
+        time.sleep(retryDelay(response, attempt))
+        attempt += 1
+
+def statusError(response):
+    #The error for a response that is not a 200, raise_for_status leaves 1xx and 3xx alone
+    import requests
+    try:
+        response.raise_for_status()
+    except requests.HTTPError as e:
+        return e
+    return requests.HTTPError(f"Unexpected status {response.status_code} for url: {response.url}", response=response)
+
+def getSession():
+    global session
+    with sessionLock:
+        if session is None:
+            import requests #Deferred so cache lookups and imports of api stay fast
+            from requests.adapters import HTTPAdapter
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=poolSize, pool_maxsize=poolSize)
+            session.mount("http://", adapter)
+            session.mount("https://", adapter)
+        return session
+
+def setBaseUrl(url):
+    #Defaults to pro.easyeda.com or the EASYEDA_API_URL environment variable, see stubServer for a local stand-in
+    global baseUrl
+    baseUrl = url.rstrip("/")
 
 def partNumToIds(partNum): #For Single
-    return partNumsToIds([partNum])
+    partInfo = partNumsToIds([partNum])[0]
+    if partInfo is None:
+        raise ValueError(f"Unknown LCSC part number: {partNum}")
+    return partInfo
 
 def partNumsToIds(partNums): #For List
-    url = "https://pro.easyeda.com/api/devices/searchByCodes"
+    """
+    Returns the part info for every LCSC code in partNums, in the same order.
+    Unknown codes are returned as None.
+    """
+    found, _ = resolvePartNums(partNums)
+    return [found.get(partNum) for partNum in partNums]
+
+def normalizePartNum(partNum):
+    #An LCSC code the way EasyEDA writes it, so " c2040" is looked up, cached and journaled as C2040
+    return partNum.strip().upper()
+
+def searchByCodes(partNums):
+    url = f"{baseUrl}/devices/searchByCodes"
     data = {"codes[]": partNums}
-    response = requests.post(url, data=data)
+    response = sendRequest("searchByCodes", "POST", url, data=data)
 
     if response.status_code == 200:
-        return response.json()["result"][0]
+        found = {result["product_code"]: result for result in response.json()["result"]}
+        for partNum in partNums:
+            cache.set("codes", partNum, found.get(partNum), flush=False) #None is stored as a negative entry
+        cache.flush() #Once per batch of codes, not once per code
+        return found
+    raise statusError(response)
+
+def resolvePartNums(partNums, batchSize=None, workers=8, failures=None):
+    """
+    Resolves any number of LCSC codes to their part info.
+
+    Codes that are not cached are split into batches of batchSize
+    (searchBatchSize by default) which are sent to searchByCodes on up to
+    `workers` threads. Results are matched back by product_code, codes are
+    compared after normalizePartNum so c2040 finds C2040 too. found, unknown
+    and failures use the codes as they were given.
+
+    A batch that fails does not stop the others. With failures (a dict)
+    given, every code of a failed batch is added to it with the error and
+    left out of found and unknown. Without it, the error of the first failed
+    batch is raised once every batch is done. The other batches are cached
+    by then, so resolving again only asks for the failed codes.
+
+    Returns a tuple (found, unknown) where found maps each known code to its
+    part info and unknown lists the codes EasyEDA does not know, in input order.
+    """
+    batchSize = batchSize or searchBatchSize
+    codes = {partNum: normalizePartNum(partNum) for partNum in partNums} #Drops duplicates but keeps the order
+    byCode = {}
+    missing = []
+    for code in dict.fromkeys(codes.values()):
+        cached, partInfo = cache.get("codes", code)
+        if not cached:
+            missing.append(code)
+        elif partInfo is not None: #Cached unknown codes are not asked for again
+            byCode[code] = partInfo
+
+    def search(batch):
+        try:
+            return searchByCodes(batch), None
+        except Exception as e:
+            return {}, e
+
+    batches = [missing[start:start + batchSize] for start in range(0, len(missing), batchSize)]
+    if len(batches) <= 1 or workers <= 1:
+        batchResults = [search(batch) for batch in batches]
     else:
-        response.raise_for_status()
+        with ThreadPoolExecutor(max_workers=min(workers, len(batches))) as executor:
+            batchResults = list(executor.map(search, batches))
+    failed = {} #code -> error of its batch
+    for batch, (batchResult, error) in zip(batches, batchResults):
+        byCode.update(batchResult)
+        if error is not None:
+            failed.update(dict.fromkeys(batch, error))
+    if failed:
+        errors = [error for _, error in batchResults if error is not None]
+        logger.warning("Failed to resolve %d of %d batches (%d codes), first: %r", len(errors), len(batches), len(failed), errors[0])
+        if failures is None:
+            raise errors[0]
+        failures.update((partNum, failed[code]) for partNum, code in codes.items() if code in failed)
+
+    found = {partNum: byCode[code] for partNum, code in codes.items() if code in byCode}
+    unknown = [partNum for partNum, code in codes.items() if code not in byCode and code not in failed]
+    return found, unknown
+
+def downloadComponent(uuid):
+    found, component = cache.get("components", uuid)
+    if found:
+        return component
+    url = f"{baseUrl}/v2/components/{uuid}?uuid={uuid}&withSchematic=on"
+    response = sendRequest("components", "GET", url)
+    if response.status_code == 200:
+        result = response.json()["result"]
+        component = {"dataStr": result["dataStr"], "display_title": result["display_title"]}
+        cache.set("components", uuid, component, flush=False) #The index is written by finishBatch
+        return component
+    raise statusError(response)
+
+def getComponent(uuid):
+    """
+    Returns the cached component for uuid, downloading it at most once per batch
+    while it stays in componentMemo or the cache. If another thread is already downloading the same uuid this waits for that
+    download instead of starting a second one.
+    """
+    with componentLock:
+        if uuid in componentMemo:
+            componentCounts["shared"] += 1
+            componentMemo.move_to_end(uuid)
+            return componentMemo[uuid]
+        future = componentInFlight.get(uuid)
+        owner = future is None
+        if owner:
+            future = Future()
+            componentInFlight[uuid] = future
+        else:
+            componentCounts["coalesced"] += 1
+    if not owner:
+        return future.result()
+    try:
+        component = downloadComponent(uuid)
+    except BaseException as e:
+        with componentLock:
+            del componentInFlight[uuid]
+        future.set_exception(e)
+        raise
+    with componentLock:
+        componentMemo[uuid] = component
+        while len(componentMemo) > componentMemoSize: #A long batch would otherwise hold every component it used
+            componentMemo.popitem(last=False)
+        del componentInFlight[uuid]
+    future.set_result(component)
+    return component
+
+def fetchComponent(uuid):
+    """
+    Returns (parsedData, title) for a component from a single download.
+    parsedData is freshly parsed on every call so callers can modify it.
+    """
+    component = getComponent(uuid)
+    return parseDataStr(component["dataStr"]), component["display_title"]
+
+def fetchComponentRows(uuid):
+    """
+    Returns (rows, title) for a component where rows is a generator decoding
+    the dataStr as it is read, see iterDataStr.
+    """
+    component = getComponent(uuid)
+    return iterDataStr(component["dataStr"]), component["display_title"]
+
+def clearComponentMemo():
+    with componentLock:
+        componentMemo.clear()
+
+def finishBatch():
+    """
+    Called once a batch of parts is fetched. Clears componentMemo and writes
+    the cache index once for everything the batch changed, the components it
+    downloaded and the last access time of every hit.
+    """
+    clearComponentMemo()
+    cache.flush()
+
+atexit.register(lambda: cache.flush()) #For scripts that use the API without finishing a batch
+
+def decodeLine(line):
+    if orjson is not None:
+        try:
+            return orjson.loads(line)
+        except orjson.JSONDecodeError:
+            pass #json also accepts NaN, Infinity and huge ints, so let it decide
+    return json.loads(line)
+
+def iterDataStr(data_str):
+    """
+    Decodes a dataStr one line at a time and yields each decoded row, without
+    building a list of lines first. Lines that fail to decode are skipped and
+    counted in decodeCounts. The first failure of a dataStr is logged along
+    with how many lines failed.
+    """
+    lines = 0
+    errors = 0
+    firstError = None
+    position = 0
+    try:
+        while position < len(data_str):
+            end = data_str.find("\n", position)
+            if end == -1:
+                end = len(data_str)
+            line = data_str[position:end].strip()
+            position = end + 1
+            if not line:
+                continue
+            lines += 1
+            try:
+                row = decodeLine(line)
+            except ValueError as e:
+                errors += 1
+                if firstError is None:
+                    firstError = f"{line}\nError: {e}"
+                continue
+            yield row
+    finally:
+        with componentLock:
+            decodeCounts["lines"] += lines
+            decodeCounts["errors"] += errors
+        if errors:
+            logger.warning("Failed to parse %d of %d lines, first: %s", errors, lines, firstError)
+
+def parseDataStr(data_str):
+    return list(iterDataStr(data_str))
 
 def partInfoToSymbol(partJson): #For Single
     uuid = partJson["attributes"]["Symbol"]
-    url = f"https://pro.easyeda.com/api/v2/components/{uuid}?uuid={uuid}&withSchematic=on"
-    response = requests.get(url)
-    if response.status_code == 200:
-        data_str = response.json()["result"]["dataStr"]
-        lines = data_str.splitlines()
-        parsed_data = []
-        for line in lines:
-            line = line.strip()
-            if line:
-                try:
-                    parsed_line = json.loads(line)
-                    parsed_data.append(parsed_line)
-                except json.JSONDecodeError as e:
-                    print(f"Failed to parse line: {line}\nError: {e}")
-        return parsed_data
-    else:
-        response.raise_for_status()
+    return fetchComponent(uuid)[0]
 
 def partInfosToSymbols(partsJson): #For List
     results = []
@@ -43,23 +331,7 @@ def partInfosToSymbols(partsJson): #For List
 
 def partInfoToFootprint(partJson): #For Single
     uuid = partJson["attributes"]["Footprint"]
-    url = f"https://pro.easyeda.com/api/v2/components/{uuid}?uuid={uuid}&withSchematic=on"
-    response = requests.get(url)
-    if response.status_code == 200:
-        data_str = response.json()["result"]["dataStr"]
-        lines = data_str.splitlines()
-        parsed_data = []
-        for line in lines:
-            line = line.strip()
-            if line:
-                try:
-                    parsed_line = json.loads(line)
-                    parsed_data.append(parsed_line)
-                except json.JSONDecodeError as e:
-                    print(f"Failed to parse line: {line}\nError: {e}")
-        return parsed_data
-    else:
-        response.raise_for_status()
+    return fetchComponent(uuid)[0]
 
 def partInfosToFootprint(partsJson): #For List
     results = []
@@ -68,11 +340,27 @@ def partInfosToFootprint(partsJson): #For List
         results.append(footprints)
     return results
 
+def partInfoToSymbolAndName(partJson): #For Single, symbol and name from the same download
+    return fetchComponent(partJson["attributes"]["Symbol"])
+
+def partInfoToSymbolRowsAndName(partJson): #For Single, decoded lazily
+    return fetchComponentRows(partJson["attributes"]["Symbol"])
+
+def partInfoToFootprintRows(partJson): #For Single, decoded lazily
+    return fetchComponentRows(partJson["attributes"]["Footprint"])[0]
+
+def partInfoToFootprintRowsAndName(partJson): #For Single, decoded lazily
+    return fetchComponentRows(partJson["attributes"]["Footprint"])
+
 def partInfoToName(partJson): #For Single
     uuid = partJson["attributes"]["Symbol"]
-    url = f"https://pro.easyeda.com/api/v2/components/{uuid}?uuid={uuid}&withSchematic=on"
-    response = requests.get(url)
-    if response.status_code == 200:
-        return response.json()["result"]["display_title"]
-    else:
-        response.raise_for_status()
\ No newline at end of file
+    return getComponent(uuid)["display_title"]
+
+def cacheStats():
+    stats = cache.stats()
+    stats["sharedComponents"] = componentCounts["shared"]
+    stats["coalescedComponents"] = componentCounts["coalesced"]
+    stats["requests"] = dict(requestCounts)
+    stats["retries"] = dict(retryCounts)
+    stats["decodeErrors"] = decodeCounts["errors"]
+    return stats
@@ -0,0 +1,135 @@
+import json
+import os
+import shutil
+import sys
+import threading
+import time
+
+import api
+
+#Keeps a batch conversion going when single parts fail and lets a rerun pick up where the last run stopped.
+#Every part is tried under a RetryPolicy, a part that still fails is reported instead of ending the batch, and
+#a CheckpointJournal in a job folder next to the library records each part's outcome along with the data of
+#every part that was fetched.
+
+class PartFailure(Exception):
+    """
+    A part that could not be resolved, fetched or converted.
+    stage names the step that failed and attempts how often it was tried.
+    """
+    def __init__(self, stage, error, attempts=1):
+        super().__init__(f"{stage} failed after {attempts} attempt(s): {error!r}")
+        self.stage = stage
+        self.error = error
+        self.attempts = attempts
+
+    def toDict(self, partNum):
+        return {"partNum": partNum, "stage": self.stage, "error": f"{type(self.error).__name__}: {self.error}", "attempts": self.attempts}
+
+class RetryPolicy:
+    """
+    How a failing step of a part is retried.
+
+    :param attempts: Tries per step including the first.
+    :param backoff: Seconds before the second try, doubled for every further try.
+    :param maxBackoff: Longest wait between two tries.
+    :param retryOn: Exception types worth another try. Other errors fail the
+                    step right away. Network errors from requests are OSErrors.
+    :param noRetryOn: Exception types in retryOn that fail the step right away
+                      all the same. By default the HTTP and connection errors
+                      of requests, api.sendRequest already retried the ones
+                      worth retrying and a 404 or 400 stays one.
+    """
+    def __init__(self, attempts=3, backoff=1.0, maxBackoff=30.0, retryOn=(OSError,), noRetryOn=None):
+        self.attempts = max(1, attempts)
+        self.backoff = backoff
+        self.maxBackoff = maxBackoff
+        self.retryOn = retryOn
+        self.noRetryOn = noRetryOn
+
+    def isFinal(self, error):
+        noRetryOn = self.noRetryOn
+        if noRetryOn is None:
+            requests = sys.modules.get("requests") #Its errors can only be raised once it was imported, see api.sendRequest
+            noRetryOn = (requests.HTTPError, requests.ConnectionError) if requests is not None else ()
+        return isinstance(error, noRetryOn)
+
+    def call(self, stage, function, *args):
+        """
+        Returns function(*args), trying it again on the errors in retryOn.
+        Raises a PartFailure for stage when it does not succeed.
+        """
+        for attempt in range(1, self.attempts + 1):
+            try:
+                return function(*args)
+            except self.retryOn as e:
+                if attempt == self.attempts or self.isFinal(e):
+                    raise PartFailure(stage, e, attempt) from e
+            except Exception as e:
+                raise PartFailure(stage, e, attempt) from e
+            time.sleep(min(self.maxBackoff, self.backoff * 2 ** (attempt - 1)))
+
+class CheckpointJournal:
+    """
+    Records the outcome of every part of a batch in jobDir/journal.jsonl, one
+    JSON line per event so a run that is killed loses at most the line it was
+    writing. The data of every fetched part is kept in jobDir/parts so a rerun
+    loads it instead of fetching it again. The last event of a part wins.
+    Parts are keyed by api.normalizePartNum, so data saved under the
+    product_code EasyEDA returned is found for the code as it was asked for.
+    """
+    def __init__(self, jobDir):
+        self.jobDir = jobDir
+        self.path = os.path.join(jobDir, "journal.jsonl")
+        self.lock = threading.Lock()
+        self.states = {} #partNum -> last event
+        os.makedirs(os.path.join(jobDir, "parts"), exist_ok=True)
+        if os.path.exists(self.path):
+            with open(self.path, "r", encoding="utf-8") as file:
+                for line in file:
+                    try:
+                        event = json.loads(line)
+                    except ValueError: #Cut off when the last run was killed
+                        continue
+                    self.states[event["partNum"]] = event
+        self.file = open(self.path, "a", encoding="utf-8")
+
+    def partPath(self, partNum):
+        return os.path.join(self.jobDir, "parts", f"{api.normalizePartNum(partNum)}.json")
+
+    def record(self, partNum, status, **details):
+        partNum = api.normalizePartNum(partNum)
+        event = {"partNum": partNum, "status": status, "time": round(time.time(), 3), **details}
+        with self.lock:
+            self.states[partNum] = event
+            self.file.write(json.dumps(event) + "\n")
+            self.file.flush()
+
+    def hasPartData(self, partNum):
+        return os.path.exists(self.partPath(partNum))
+
+    def savePartData(self, partData):
+        partNum = partData["partNumb"]
+        path = self.partPath(partNum)
+        tempPath = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tempPath, "w", encoding="utf-8") as file:
+            json.dump(partData, file)
+        os.replace(tempPath, path)
+        self.record(partNum, "fetched")
+
+    def loadPartData(self, partNum):
+        with open(self.partPath(partNum), "r", encoding="utf-8") as file:
+            return json.load(file)
+
+    def failed(self, failure):
+        #failure is a PartFailure.toDict
+        self.record(failure["partNum"], "failed", **{key: value for key, value in failure.items() if key != "partNum"})
+
+    def close(self):
+        with self.lock:
+            self.file.close()
+
+    def remove(self):
+        #Once every part made it into the library the checkpoint is not needed, and a later run should fetch fresh data
+        self.close()
+        shutil.rmtree(self.jobDir, ignore_errors=True)
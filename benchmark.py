@@ -0,0 +1,801 @@
+import argparse
+import contextlib
+import http.client
+import io
+import json
+import math
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import threading
+import tracemalloc
+
+from shapely.geometry import Polygon
+
+import api
+import conversionService
+import eagleConvert
+import fragmentCache
+import libraryWriter
+import partCache
+import runMetrics
+import shapeRecords
+import stubServer
+import syntheticParts
+
+######################## Fetch Benchmark ########################
+# Measures parts/second of eagleConvert.fetchMultipleParts at different worker counts.
+
+def benchmarkFetch(args):
+    partInfos, components = syntheticParts.makeCatalog(args.parts, sharedVariants=args.shared)
+    server = stubServer.startStubServer(partInfos, components, latency=args.latency)
+    api.setBaseUrl(server.url)
+    api.cache.enabled = False #Every part must go over the network
+    results = []
+    try:
+        for workers in args.workers:
+            api.requestCounts.clear()
+            startTime = time.perf_counter()
+            try:
+                partDatas = eagleConvert.fetchMultipleParts(list(partInfos), workers=workers)
+            finally:
+                api.clearComponentMemo()
+            elapsed = time.perf_counter() - startTime
+            assert [partData["partNumb"] for partData in partDatas] == list(partInfos) #Input order is kept
+            requests = sum(api.requestCounts.values())
+            results.append({"workers": workers, "seconds": elapsed, "partsPerSecond": args.parts / elapsed, "requests": requests})
+            print(f"workers={workers:<3} {elapsed:8.3f}s {args.parts / elapsed:9.1f} parts/s {requests:6d} requests")
+    finally:
+        server.shutdown()
+    return results
+
+######################## Load Test ########################
+# Drives convertMultiplePartsToEagle against the stub server with latency, errors and rate limiting injected,
+# and reports throughput, per-part fetch latency and how many requests had to be retried.
+
+@contextlib.contextmanager
+def timedFetchPartData(latencies):
+    #fetchMultipleParts looks fetchPartData up on the module, so it can be wrapped for the run
+    fetchPartData = eagleConvert.fetchPartData
+    def timed(*args, **kwargs):
+        startTime = time.perf_counter()
+        result = fetchPartData(*args, **kwargs)
+        latencies.append(time.perf_counter() - startTime)
+        return result
+    eagleConvert.fetchPartData = timed
+    try:
+        yield
+    finally:
+        eagleConvert.fetchPartData = fetchPartData
+
+def runLoad(server, partNums, workers, processes, outputPath):
+    api.requestCounts.clear()
+    api.retryCounts.clear()
+    for name in server.counts:
+        server.counts[name] = 0
+    latencies = []
+    error = None
+    startTime = time.perf_counter()
+    with timedFetchPartData(latencies):
+        try:
+            eagleConvert.convertMultiplePartsToEagle(partNums, workers=workers, outputPath=outputPath, processes=processes)
+        except Exception as e: #A request that failed after every retry ends the run, report it instead
+            error = repr(e)
+    elapsed = time.perf_counter() - startTime
+    latencies.sort()
+    return {
+        "workers": workers,
+        "seconds": elapsed,
+        "partsPerSecond": len(latencies) / elapsed,
+        "parts": len(latencies),
+        "p50": runMetrics.percentile(latencies, 0.50),
+        "p95": runMetrics.percentile(latencies, 0.95),
+        "p99": runMetrics.percentile(latencies, 0.99),
+        "requests": sum(api.requestCounts.values()),
+        "retries": sum(api.retryCounts.values()),
+        "server": dict(server.counts),
+        "error": error
+    }
+
+def benchmarkLoad(args):
+    if args.fixtures and os.path.isdir(args.fixtures) and any(name.endswith(".json") for name in os.listdir(args.fixtures)):
+        recorded, components = stubServer.loadFixtureCatalog(args.fixtures)
+        #Recorded parts are repeated under new codes to reach --parts, sharing their symbols and footprints
+        partInfos = {}
+        for index in range(args.parts):
+            partInfo = dict(list(recorded.values())[index % len(recorded)])
+            partInfo["product_code"] = syntheticParts.partCode(index)
+            partInfos[partInfo["product_code"]] = partInfo
+    else:
+        partInfos, components = syntheticParts.makeCatalog(args.parts, sharedVariants=args.shared)
+    server = stubServer.startStubServer(partInfos, components, latency=args.latency, jitter=args.jitter, errorRate=args.error_rate, rateLimit=args.rate_limit, seed=args.seed)
+    api.setBaseUrl(server.url)
+    api.cache.enabled = False #Every part must go over the network
+    api.retryBackoff, previousBackoff = args.backoff, api.retryBackoff
+    results = []
+    try:
+        with tempfile.TemporaryDirectory() as directory:
+            for workers in args.workers:
+                result = runLoad(server, list(partInfos), workers, args.processes, os.path.join(directory, "library.lbr"))
+                results.append(result)
+                print(f"workers={workers:<3} {result['seconds']:8.3f}s {result['partsPerSecond']:8.1f} parts/s   "
+                      f"p50 {result['p50'] * 1000:8.1f}ms p95 {result['p95'] * 1000:8.1f}ms p99 {result['p99'] * 1000:8.1f}ms   "
+                      f"{result['requests']:5d} requests {result['retries']:5d} retries "
+                      f"({result['server']['errors']} errors, {result['server']['rateLimited']} rate limited)")
+                if result["error"]:
+                    print(f"    run failed after {result['parts']} parts: {result['error']}")
+    finally:
+        api.retryBackoff = previousBackoff
+        server.shutdown()
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as file:
+            json.dump(results, file, indent=2)
+        print(f"Results written to {args.output}")
+    return results
+
+######################## SMD Placement Benchmark ########################
+# Compares computeSmdPlacement with the stepwise search it replaced.
+
+def computeSmdPlacementStepwise(vertexData, step=0.01):
+    #The original implementation, kept as the reference for checkSmdEquivalence
+    polygon = Polygon([(v["@x"], v["@y"]) for v in vertexData])
+    center = polygon.centroid
+    center_x, center_y = center.x, center.y
+    max_dx = 0.0
+    max_dy = 0.0
+    while True:
+        new_dx = max_dx + step
+        new_dy = max_dy + step
+        half_w = new_dx / 2.0
+        half_h = new_dy / 2.0
+        rectangle = Polygon([
+            (center_x - half_w, center_y - half_h),
+            (center_x + half_w, center_y - half_h),
+            (center_x + half_w, center_y + half_h),
+            (center_x - half_w, center_y + half_h)
+        ])
+        if rectangle.within(polygon):
+            max_dx = new_dx
+            max_dy = new_dy
+        else:
+            break
+    return center_x, center_y, max_dx, max_dy
+
+def toVertexData(points):
+    return [{"@x": x, "@y": y} for x, y in points]
+
+def smdShapes():
+    shapes = {
+        "rect 0.6x0.3": [(0, 0), (0.6, 0), (0.6, 0.3), (0, 0.3)],
+        "rect 5x3": [(0, 0), (5, 0), (5, 3), (0, 3)],
+        "thermal 8x8": [(-4, -4), (4, -4), (4, 4), (-4, 4)],
+        "rotated rect": [(0, 0), (2, 1), (1.5, 2), (-0.5, 1)],
+        "hexagon": [(math.cos(a * math.pi / 3) * 2, math.sin(a * math.pi / 3) * 2) for a in range(6)],
+        "chamfered QFN": [(-2.5, -2.5), (2.5, -2.5), (2.5, 2.5), (-2.0, 2.5), (-2.5, 2.0)],
+        "L pad": [(0, 0), (4, 0), (4, 1), (1, 1), (1, 3), (0, 3)],
+        "T pad": [(0, 3), (0, 2), (1.25, 2), (1.25, 0), (1.75, 0), (1.75, 2), (3, 2), (3, 3)],
+    }
+    star = []
+    for vertex in range(40):
+        angle = 2 * math.pi * vertex / 40
+        radius = 3 if vertex % 2 == 0 else 2.4
+        star.append((math.cos(angle) * radius, math.sin(angle) * radius))
+    shapes["star 40"] = star
+    return {name: toVertexData(points) for name, points in shapes.items()}
+
+def checkSmdEquivalence(shapes, step=0.01):
+    """
+    Checks the new search against the stepwise one: the centroid square must
+    match it (the stepwise search can stop one step early when its running sum
+    of steps drifts above an exact fit) and the rectangle must fit in the pad
+    and be at least as large.
+    """
+    for name, vertexData in shapes.items():
+        legacy = computeSmdPlacementStepwise(vertexData, step)
+        square = eagleConvert.computeSmdPlacement(vertexData, step, square=True)
+        assert square[:2] == legacy[:2], f"{name}: square center {square[:2]} != stepwise {legacy[:2]}"
+        assert -1e-9 <= square[2] - legacy[2] <= step + 1e-9, f"{name}: square {square[2]} != stepwise {legacy[2]}"
+        x, y, dx, dy = eagleConvert.computeSmdPlacement(vertexData, step)
+        pad = Polygon([(v["@x"], v["@y"]) for v in vertexData])
+        smd = Polygon([(x - dx / 2, y - dy / 2), (x + dx / 2, y - dy / 2), (x + dx / 2, y + dy / 2), (x - dx / 2, y + dy / 2)])
+        assert smd.buffer(-1e-9).within(pad), f"{name}: rectangle {x, y, dx, dy} is not inside the pad"
+        assert dx * dy >= legacy[2] * legacy[3] - 1e-9, f"{name}: rectangle {dx}x{dy} is smaller than stepwise {legacy[2]}x{legacy[3]}"
+
+def timeCall(function, repeat):
+    startTime = time.perf_counter()
+    for _ in range(repeat):
+        result = function()
+    return (time.perf_counter() - startTime) / repeat, result
+
+def benchmarkSmd(args):
+    shapes = smdShapes()
+    checkSmdEquivalence(shapes)
+    print("Equivalence check passed")
+    results = []
+    for name, vertexData in shapes.items():
+        legacyTime, legacy = timeCall(lambda: computeSmdPlacementStepwise(vertexData), args.repeat)
+        newTime, placement = timeCall(lambda: eagleConvert.computeSmdPlacement(vertexData), args.repeat)
+        results.append({"shape": name, "stepwiseSeconds": legacyTime, "seconds": newTime, "stepwise": legacy, "placement": placement})
+        print(f"{name:<14} stepwise {legacyTime * 1000:9.3f}ms {legacy[2]:.2f}x{legacy[3]:.2f}   new {newTime * 1000:8.3f}ms {placement[2]:.2f}x{placement[3]:.2f}   {legacyTime / newTime:7.1f}x")
+    return results
+
+######################## Conversion Benchmark ########################
+# Measures the per-primitive cost of convertItems on one large footprint.
+
+def benchmarkConvert(args):
+    items = syntheticParts.footprintItems(args.pads, lineCount=args.lines)
+    phrasedItems = eagleConvert.parsePartData(items)
+    results = []
+    for _ in range(args.repeat):
+        context = eagleConvert.ConversionContext("C0", False, eagleConvert.canvasUnit(phrasedItems))
+        startTime = time.perf_counter()
+        eagleConvert.convertItems(phrasedItems, "BENCH", context)
+        results.append(time.perf_counter() - startTime)
+    best = min(results)
+    print(f"{len(phrasedItems)} primitives {best * 1000:8.3f}ms {best / len(phrasedItems) * 1e6:8.3f}us/primitive")
+    return {"primitives": len(phrasedItems), "seconds": best, "secondsPerPrimitive": best / len(phrasedItems)}
+
+######################## Outline Benchmark ########################
+# Compares converting long FILL/POLY outlines with NumPy against converting them one coordinate at a time.
+
+def convertOutline(phrasedItems, vectorizeMin):
+    eagleConvert.VECTORIZE_MIN_COORDINATES, previous = vectorizeMin, eagleConvert.VECTORIZE_MIN_COORDINATES
+    try:
+        context = eagleConvert.ConversionContext("C0", False, eagleConvert.canvasUnit(phrasedItems))
+        return eagleConvert.convertItems(phrasedItems, "BENCH", context)[0].toDict()
+    finally:
+        eagleConvert.VECTORIZE_MIN_COORDINATES = previous
+
+def benchmarkOutline(args):
+    if eagleConvert.loadNumpy() is None:
+        print("NumPy is not installed, outlines are always converted one coordinate at a time")
+        return []
+    results = []
+    for vertices in args.vertices:
+        items = syntheticParts.footprintItems(0, logoVertices=vertices, logoArcEvery=args.arc_every)
+        phrasedItems = eagleConvert.parsePartData(items)
+        assert convertOutline(phrasedItems, math.inf) == convertOutline(phrasedItems, 0), f"{vertices} vertices: NumPy and pure Python outlines differ"
+        pythonTime, _ = timeCall(lambda: convertOutline(phrasedItems, math.inf), args.repeat)
+        numpyTime, _ = timeCall(lambda: convertOutline(phrasedItems, 0), args.repeat)
+        results.append({"vertices": vertices, "pythonSeconds": pythonTime, "numpySeconds": numpyTime})
+        print(f"{vertices:>6} vertices   python {pythonTime * 1000:8.3f}ms   numpy {numpyTime * 1000:8.3f}ms   {pythonTime / numpyTime:5.1f}x")
+    return results
+
+######################## Memory Benchmark ########################
+# Compares the memory held by converted shapes as shapeRecords against the dicts they are written from.
+
+def componentsToPartData(partInfo, symbol, footprint):
+    #The same partData fetchPartData builds, from already downloaded components
+    return {
+        "partInfo": partInfo,
+        "partSymbolPhrased": eagleConvert.parsePartData(api.iterDataStr(symbol["dataStr"])),
+        "partFootprintPhrased": eagleConvert.parsePartData(api.iterDataStr(footprint["dataStr"])),
+        "partName": symbol["display_title"].replace(" ", "-"),
+        "partNumb": partInfo["product_code"]
+    }
+
+def syntheticPartData(index, **footprintOptions):
+    partInfo, components = syntheticParts.makePart(index, pinCount=16, **footprintOptions)
+    return componentsToPartData(partInfo, components[partInfo["attributes"]["Symbol"]], components[partInfo["attributes"]["Footprint"]])
+
+def tracedSize(build):
+    tracemalloc.start()
+    try:
+        kept = build()
+        size = tracemalloc.get_traced_memory()[0]
+    finally:
+        tracemalloc.stop()
+    return size, kept
+
+def benchmarkMemory(args):
+    partDataList = [syntheticPartData(index, polyPads=2, polyVertices=12, logoVertices=args.logo_vertices, lineCount=args.lines) for index in range(args.parts)]
+    recordSize, shapes = tracedSize(lambda: [shape for partData in partDataList for shape in eagleConvert.convertPartShapes(partData)])
+    shapes = None
+    dictSize, shapeDicts = tracedSize(lambda: [shape.toDict() for partData in partDataList for shape, names, elapsed in eagleConvert.convertPartShapes(partData)])
+    shapeDicts = None
+    print(f"{args.parts} parts   records {recordSize / 2**20:8.2f} MiB   dicts {dictSize / 2**20:8.2f} MiB   {dictSize / recordSize:5.1f}x")
+    return {"parts": args.parts, "recordBytes": recordSize, "dictBytes": dictSize}
+
+######################## Pin/Pad Naming Benchmark ########################
+# Compares UniqueNames and groupConnects with the list scans they replaced on parts with many pins.
+
+def uniqueNamesScanning(requestedNames):
+    #The original naming, kept as the reference for benchmarkNames
+    names = []
+    for name in requestedNames:
+        while name in names:
+            name += "*"
+        names.append(name)
+    return names
+
+def groupConnectsScanning(pins, pads):
+    #The original connect matching, kept as the reference for benchmarkNames
+    pins = pins.copy()
+    pads = pads.copy()
+    connects = []
+    while len(pins) > 0:
+        findPin = pins.pop(0)
+        connectPin = [findPin]
+        for pin in pins.copy():
+            if pin.rstrip("*") == findPin.rstrip("*"):
+                pins.remove(pin)
+                connectPin.append(pin)
+        connectPad = []
+        for pad in pads.copy():
+            if pad.rstrip("*") == findPin.rstrip("*"):
+                pads.remove(pad)
+                connectPad.append(pad)
+        connects.append((connectPin, connectPad))
+    return connects, pads
+
+def requestedNames(count, seed):
+    #Ball names with a few repeated power/ground names, like a BGA
+    rand = random.Random(seed)
+    return [rand.choice(["GND", "VCC", "VDDIO"]) if rand.random() < 0.15 else f"{chr(65 + index // 40 % 20)}{index % 40 + 1}" for index in range(count)]
+
+def nameAndConnect(requestedPins, requestedPads):
+    pinNames = eagleConvert.UniqueNames()
+    padNames = eagleConvert.UniqueNames()
+    pins = [pinNames.add(name) for name in requestedPins]
+    pads = [padNames.add(name) for name in requestedPads]
+    return pins, pads, eagleConvert.groupConnects(pins, pads)
+
+def nameAndConnectScanning(requestedPins, requestedPads):
+    pins = uniqueNamesScanning(requestedPins)
+    pads = uniqueNamesScanning(requestedPads)
+    return pins, pads, groupConnectsScanning(pins, pads)
+
+def benchmarkNames(args):
+    results = []
+    for count in args.pins:
+        requestedPins, requestedPads = requestedNames(count, 1), requestedNames(count, 2)
+        assert nameAndConnect(requestedPins, requestedPads) == nameAndConnectScanning(requestedPins, requestedPads), f"{count} pins: names or connects differ"
+        newTime, _ = timeCall(lambda: nameAndConnect(requestedPins, requestedPads), args.repeat)
+        scanningTime, _ = timeCall(lambda: nameAndConnectScanning(requestedPins, requestedPads), args.repeat)
+        results.append({"pins": count, "scanningSeconds": scanningTime, "seconds": newTime})
+        print(f"{count:>6} pins   scanning {scanningTime * 1000:10.3f}ms   new {newTime * 1000:8.3f}ms   {scanningTime / newTime:7.1f}x")
+    return results
+
+######################## dataStr Decoding Benchmark ########################
+# Compares the fused iterDataStr/iterPartData pipeline with the two-pass decoding it replaced.
+
+def parseDataStrTwoPass(data_str):
+    #The original decoding, kept as the reference for benchmarkDecode
+    parsed_data = []
+    for line in data_str.splitlines():
+        line = line.strip()
+        if line:
+            parsed_data.append(json.loads(line))
+    return eagleConvert.parsePartData(parsed_data)
+
+def parseDataStrFused(data_str):
+    return eagleConvert.parsePartData(api.iterDataStr(data_str))
+
+def tracedPeak(function):
+    tracemalloc.start()
+    try:
+        function()
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    return peak
+
+def benchmarkDecode(args):
+    results = []
+    for pads in args.pads:
+        data_str = syntheticParts.dataStr(syntheticParts.footprintItems(pads, polyPads=pads // 20, polyVertices=32, logoVertices=pads // 10, lineCount=pads * 2))
+        assert parseDataStrFused(data_str) == parseDataStrTwoPass(data_str), f"{pads} pads: decoded items differ"
+        twoPassTime, _ = timeCall(lambda: parseDataStrTwoPass(data_str), args.repeat)
+        fusedTime, _ = timeCall(lambda: parseDataStrFused(data_str), args.repeat)
+        twoPassPeak = tracedPeak(lambda: parseDataStrTwoPass(data_str))
+        fusedPeak = tracedPeak(lambda: parseDataStrFused(data_str))
+        results.append({"pads": pads, "bytes": len(data_str), "twoPassSeconds": twoPassTime, "seconds": fusedTime, "twoPassPeakBytes": twoPassPeak, "peakBytes": fusedPeak})
+        print(f"{len(data_str) / 2**20:7.2f} MiB dataStr   two-pass {twoPassTime * 1000:8.2f}ms {twoPassPeak / 2**20:7.2f} MiB peak   fused {fusedTime * 1000:8.2f}ms {fusedPeak / 2**20:7.2f} MiB peak")
+    print(f"JSON backend: {'orjson' if api.orjson is not None else 'json'}")
+    return results
+
+######################## Benchmark Suite ########################
+# Times every stage of a conversion on recorded EasyEDA payloads and on synthetic large parts, stores the
+# results as JSON and compares them against a baseline run.
+#
+# A fixture is one JSON file per part holding {"partInfo", "symbol", "footprint"} where symbol and footprint
+# are the component payloads as api.getComponent returns them. Record some with `benchmark.py record`.
+
+SUITE_SCENARIOS = { #name -> (syntheticParts.makePart options, parts)
+    "small": ({"pinCount": 8}, 200),
+    "bga": ({"pinCount": 1024}, 4),
+    "polyPads": ({"pinCount": 16, "polyPads": 16, "polyVertices": 48}, 10),
+    "logo": ({"pinCount": 8, "logoVertices": 4000, "logoArcEvery": 7}, 10)
+}
+
+def recordFixtures(args):
+    os.makedirs(args.fixtures, exist_ok=True)
+    found, unknown = api.resolvePartNums(args.partNums)
+    if unknown:
+        print(f"Unknown LCSC parts skipped: {unknown}")
+    for partNum, partInfo in found.items():
+        fixture = {
+            "partInfo": partInfo,
+            "symbol": api.getComponent(partInfo["attributes"]["Symbol"]),
+            "footprint": api.getComponent(partInfo["attributes"]["Footprint"])
+        }
+        with open(os.path.join(args.fixtures, f"{partNum}.json"), "w", encoding="utf-8") as file:
+            json.dump(fixture, file)
+        print(f"Recorded {partNum}")
+    api.finishBatch()
+
+def loadFixtures(directory):
+    fixtures = []
+    if directory and os.path.isdir(directory):
+        for fileName in sorted(os.listdir(directory)):
+            if fileName.endswith(".json"):
+                with open(os.path.join(directory, fileName), encoding="utf-8") as file:
+                    fixture = json.load(file)
+                fixtures.append((fixture["partInfo"], fixture["symbol"], fixture["footprint"]))
+    return fixtures
+
+def syntheticScenario(options, parts):
+    fixtures = []
+    for index in range(parts):
+        partInfo, components = syntheticParts.makePart(index, **options)
+        fixtures.append((partInfo, components[partInfo["attributes"]["Symbol"]], components[partInfo["attributes"]["Footprint"]]))
+    return fixtures
+
+class StageTimes:
+    def __init__(self):
+        self.seconds = {}
+        self.counts = {}
+
+    def add(self, stage, seconds, count=1):
+        self.seconds[stage] = self.seconds.get(stage, 0.0) + seconds
+        self.counts[stage] = self.counts.get(stage, 0) + count
+
+def timeConversionPass(phrasedItems, shape, context, times):
+    for item in phrasedItems:
+        startTime = time.perf_counter()
+        eagleConvert.convertPhrasedToXML(item, shape, context)
+        times.add(f"convert.{item['ITEM'][0]}", time.perf_counter() - startTime)
+
+def timePart(partInfo, symbol, footprint, times):
+    startTime = time.perf_counter()
+    partData = componentsToPartData(partInfo, symbol, footprint)
+    times.add("parsePartData", time.perf_counter() - startTime)
+
+    symbolContext = eagleConvert.ConversionContext(partData["partNumb"], True)
+    symbolShape = shapeRecords.Shape(partData["partName"])
+    timeConversionPass(partData["partSymbolPhrased"], symbolShape, symbolContext, times)
+    footprintContext = eagleConvert.ConversionContext(partData["partNumb"], False, eagleConvert.canvasUnit(partData["partFootprintPhrased"]))
+    footprintShape = shapeRecords.Shape(partData["partName"])
+    timeConversionPass(partData["partFootprintPhrased"], footprintShape, footprintContext, times)
+
+    startTime = time.perf_counter()
+    eagleConvert.groupConnects(symbolContext.pins, footprintContext.pads)
+    times.add("connects", time.perf_counter() - startTime)
+
+    startTime = time.perf_counter()
+    libraryWriter.renderFragment("symbol", symbolShape.toDict())
+    libraryWriter.renderFragment("package", footprintShape.toDict())
+    times.add("serialize", time.perf_counter() - startTime)
+    return partData
+
+@contextlib.contextmanager
+def timedSmdPlacement(times):
+    #convertPolyPad looks computeSmdPlacement up on the module, so it can be wrapped for the run
+    computeSmdPlacement = eagleConvert.computeSmdPlacement
+    def timed(*args, **kwargs):
+        startTime = time.perf_counter()
+        try:
+            return computeSmdPlacement(*args, **kwargs)
+        finally:
+            times.add("computeSmdPlacement", time.perf_counter() - startTime)
+    eagleConvert.computeSmdPlacement = timed
+    try:
+        yield
+    finally:
+        eagleConvert.computeSmdPlacement = computeSmdPlacement
+
+def runScenario(fixtures):
+    times = StageTimes()
+    partDataList = []
+    with timedSmdPlacement(times):
+        for partInfo, symbol, footprint in fixtures:
+            partDataList.append(timePart(partInfo, symbol, footprint, times))
+    startTime = time.perf_counter()
+    eagleConvert.createXML(partDataList, output=io.StringIO())
+    times.add("createXML", time.perf_counter() - startTime, len(partDataList))
+    return times
+
+def scenarioResult(runs, parts):
+    #Keeps the fastest of the repeated runs for every stage
+    stages = {}
+    for stage in sorted(set().union(*(run.seconds for run in runs))):
+        seconds = min(run.seconds.get(stage, 0.0) for run in runs)
+        count = max(run.counts.get(stage, 0) for run in runs)
+        stages[stage] = {"count": count, "perItem": seconds / count if count else 0.0, "perPart": seconds / parts, "per1000Parts": seconds / parts * 1000}
+    return {"parts": parts, "stages": stages}
+
+def compareResults(results, baseline, threshold, floor):
+    """
+    Returns (scenario, stage, baseline perPart, perPart) for every stage that
+    got more than threshold slower per part than in baseline. Differences
+    under floor seconds per part are ignored as noise.
+    """
+    regressions = []
+    for scenario, result in results["scenarios"].items():
+        baseStages = baseline.get("scenarios", {}).get(scenario, {}).get("stages", {})
+        for stage, timing in result["stages"].items():
+            if stage not in baseStages:
+                continue
+            basePerPart = baseStages[stage]["perPart"]
+            if timing["perPart"] > basePerPart * (1 + threshold) and timing["perPart"] - basePerPart > floor:
+                regressions.append((scenario, stage, basePerPart, timing["perPart"]))
+    return regressions
+
+def benchmarkSuite(args):
+    scenarios = {name: syntheticScenario(options, max(1, round(parts * args.scale))) for name, (options, parts) in SUITE_SCENARIOS.items()}
+    fixtures = loadFixtures(args.fixtures)
+    if fixtures:
+        scenarios["fixtures"] = fixtures
+    else:
+        print(f"No fixtures in {args.fixtures}, running synthetic parts only")
+
+    results = {
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "numpy": eagleConvert.loadNumpy() is not None,
+        "orjson": api.orjson is not None,
+        "scenarios": {}
+    }
+    for name, scenarioFixtures in scenarios.items():
+        runs = [runScenario(scenarioFixtures) for _ in range(args.repeat)]
+        result = results["scenarios"][name] = scenarioResult(runs, len(scenarioFixtures))
+        print(f"{name} ({result['parts']} parts)")
+        for stage, timing in result["stages"].items():
+            print(f"    {stage:<28} {timing['perPart'] * 1000:10.4f}ms/part {timing['per1000Parts']:10.4f}s/1000 parts {timing['count']:8d}x {timing['perItem'] * 1e6:10.2f}us each")
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as file:
+            json.dump(results, file, indent=2)
+        print(f"Results written to {args.output}")
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as file:
+            baseline = json.load(file)
+        regressions = compareResults(results, baseline, args.threshold, args.floor)
+        for scenario, stage, basePerPart, perPart in regressions:
+            print(f"REGRESSION {scenario} {stage}: {basePerPart * 1000:.4f}ms/part -> {perPart * 1000:.4f}ms/part ({perPart / basePerPart:.2f}x)")
+        if regressions:
+            raise SystemExit(1)
+        print(f"No regressions against {args.baseline}")
+    return results
+
+######################## Conversion Service Benchmark ########################
+# Runs conversionService against the stub server and measures request latency once the caches are warm, checks
+# that concurrent requests for one part are converted once, and compares with starting a process per part.
+
+def getLibrary(connection, partNum):
+    startTime = time.perf_counter()
+    connection.request("GET", f"/parts/{partNum}")
+    response = connection.getresponse()
+    body = response.read()
+    assert response.status == 200, (response.status, body[:200])
+    return time.perf_counter() - startTime, response.getheader("X-Conversion")
+
+def requestConcurrently(url, partNums, concurrency):
+    #Sends the requests over `concurrency` keep-alive connections, returns (seconds, served) per request
+    host, port = url.rsplit("/", 1)[-1].split(":")
+    results = []
+    lock = threading.Lock()
+    queue = list(reversed(partNums))
+    def worker():
+        connection = http.client.HTTPConnection(host, int(port))
+        try:
+            while True:
+                with lock:
+                    if not queue:
+                        return
+                    partNum = queue.pop()
+                result = getLibrary(connection, partNum)
+                with lock:
+                    results.append(result)
+        finally:
+            connection.close()
+    threads = [threading.Thread(target=worker) for _ in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results
+
+def benchmarkService(args):
+    partInfos, components = syntheticParts.makeCatalog(args.parts)
+    partNums = list(partInfos)
+    stub = stubServer.startStubServer(partInfos, components, latency=args.latency)
+    previousUrl, previousCache = api.baseUrl, api.cache
+    results = {}
+    try:
+        with tempfile.TemporaryDirectory() as directory:
+            api.setBaseUrl(stub.url)
+            api.cache = partCache.PartCache(os.path.join(directory, "cache"))
+            service = conversionService.ConversionService(workers=args.workers, fragments=fragmentCache.FragmentCache(partCache.PartCache(os.path.join(directory, "fragments")))).warm()
+            server = conversionService.ConversionServer(service).start()
+            try:
+                #Every request for the first part arrives before its conversion is done
+                served = [kind for _, kind in requestConcurrently(server.url, [partNums[0]] * args.concurrency, args.concurrency)]
+                results["coalescing"] = {"requests": len(served), "conversions": served.count("converted"), "coalesced": served.count("coalesced")}
+                cold = requestConcurrently(server.url, partNums[1:], 1)
+                warm = requestConcurrently(server.url, [random.Random(args.seed).choice(partNums) for _ in range(args.requests)], args.concurrency)
+                service.results.clear() #Converted again from the download and converted part caches
+                reconverted = requestConcurrently(server.url, partNums, 1)
+                results["server"] = service.stats()["latency"]
+            finally:
+                server.shutdown()
+                server.server_close()
+
+            #The same parts converted by a new process each, with the download cache already warm
+            environment = dict(os.environ, EASYEDA_API_URL=stub.url)
+            command = [sys.executable, "lcscToEagle.py", "-q", "--cache-dir", os.path.join(directory, "cache"), "convert", "-o", os.path.join(directory, "library.lbr")]
+            cwd = os.path.dirname(os.path.abspath(__file__))
+            processTimes = []
+            for partNum in partNums[:args.repeat]:
+                startTime = time.perf_counter()
+                subprocess.run(command + [partNum], cwd=cwd, env=environment, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+                processTimes.append(time.perf_counter() - startTime)
+    finally:
+        api.setBaseUrl(previousUrl)
+        api.cache = previousCache
+        stub.shutdown()
+
+    coldTimes = sorted(seconds for seconds, _ in cold)
+    warmTimes = sorted(seconds for seconds, kind in warm if kind == "hit")
+    reconvertedTimes = sorted(seconds for seconds, _ in reconverted)
+    processTimes.sort()
+    results["cold"] = {"count": len(coldTimes), "p50Ms": runMetrics.percentile(coldTimes, 0.50) * 1000, "p99Ms": runMetrics.percentile(coldTimes, 0.99) * 1000}
+    results["warmHits"] = {"count": len(warmTimes), "p50Ms": runMetrics.percentile(warmTimes, 0.50) * 1000, "p99Ms": runMetrics.percentile(warmTimes, 0.99) * 1000}
+    results["warmConversions"] = {"count": len(reconvertedTimes), "p50Ms": runMetrics.percentile(reconvertedTimes, 0.50) * 1000, "p99Ms": runMetrics.percentile(reconvertedTimes, 0.99) * 1000}
+    results["processPerPart"] = {"count": len(processTimes), "p50Ms": runMetrics.percentile(processTimes, 0.50) * 1000, "p99Ms": runMetrics.percentile(processTimes, 0.99) * 1000}
+    coalescing = results["coalescing"]
+    print(f"coalescing         {coalescing['requests']} concurrent requests for one part, {coalescing['conversions']} conversion, {coalescing['coalesced']} coalesced")
+    for name, label in (("cold", "first request"), ("warmHits", "warm hit"), ("warmConversions", "from disk caches"), ("processPerPart", "process per part")):
+        result = results[name]
+        print(f"{label:<18} {result['count']:6d} requests   p50 {result['p50Ms']:9.3f}ms   p99 {result['p99Ms']:9.3f}ms")
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as file:
+            json.dump(results, file, indent=2)
+        print(f"Results written to {args.output}")
+    return results
+
+######################## Import Time Benchmark ########################
+# Measures how long starting Python and importing each entry point takes, in fresh interpreters, and
+# which of the slow optional modules got imported along the way.
+
+HEAVY_MODULES = ("shapely", "numpy", "requests", "xmltodict")
+IMPORT_TARGETS = {
+    "partCache": ["-c", "import partCache"],
+    "api": ["-c", "import api"],
+    "libraryWriter": ["-c", "import libraryWriter"],
+    "eagleConvert": ["-c", "import eagleConvert"],
+    "lcscToEagle": ["-c", "import lcscToEagle"],
+    "cache check": ["lcscToEagle.py", "--cache-dir", "{cacheDir}", "cache", "check", "C1880271"]
+}
+
+def runFresh(arguments, cwd):
+    startTime = time.perf_counter()
+    subprocess.run([sys.executable] + arguments, cwd=cwd, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    return time.perf_counter() - startTime
+
+def loadedHeavyModules(statement, cwd):
+    check = f"{statement}; import sys; print(' '.join(name for name in {HEAVY_MODULES!r} if name in sys.modules))"
+    return subprocess.run([sys.executable, "-c", check], cwd=cwd, capture_output=True, text=True).stdout.split()
+
+def benchmarkImports(args):
+    cwd = os.path.dirname(os.path.abspath(__file__))
+    baseline = statistics.median(runFresh(["-c", "pass"], cwd) for _ in range(args.repeat))
+    print(f"{'python -c pass':<16} {baseline * 1000:8.1f}ms")
+    results = {"interpreterSeconds": baseline, "targets": {}}
+    with tempfile.TemporaryDirectory() as cacheDir:
+        for name, arguments in IMPORT_TARGETS.items():
+            arguments = [argument.format(cacheDir=cacheDir) for argument in arguments]
+            seconds = statistics.median(runFresh(arguments, cwd) for _ in range(args.repeat))
+            loaded = loadedHeavyModules(arguments[1], cwd) if arguments[0] == "-c" else []
+            results["targets"][name] = {"seconds": seconds, "importSeconds": seconds - baseline, "heavyModules": loaded}
+            print(f"{name:<16} {seconds * 1000:8.1f}ms   +{(seconds - baseline) * 1000:7.1f}ms over python" + (f"   loads {', '.join(loaded)}" if loaded else ""))
+    return results
+
+BENCHMARKS = {
+    "fetch": benchmarkFetch,
+    "load": benchmarkLoad,
+    "smd": benchmarkSmd,
+    "convert": benchmarkConvert,
+    "outline": benchmarkOutline,
+    "memory": benchmarkMemory,
+    "names": benchmarkNames,
+    "decode": benchmarkDecode,
+    "suite": benchmarkSuite,
+    "service": benchmarkService,
+    "record": recordFixtures,
+    "imports": benchmarkImports
+}
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="LCSCtoEAGLE benchmarks")
+    subparsers = parser.add_subparsers(dest="benchmark", required=True)
+
+    fetchParser = subparsers.add_parser("fetch", help="Fetch throughput against a local stub server")
+    fetchParser.add_argument("--parts", type=int, default=64)
+    fetchParser.add_argument("--latency", type=float, default=0.02, help="Seconds the stub server waits per request")
+    fetchParser.add_argument("--workers", type=int, nargs="+", default=[1, 8, 32])
+    fetchParser.add_argument("--shared", type=int, default=None, help="Number of distinct symbols/footprints the parts share")
+
+    loadParser = subparsers.add_parser("load", help="convertMultiplePartsToEagle against a stub server with faults injected")
+    loadParser.add_argument("--parts", type=int, default=200)
+    loadParser.add_argument("--workers", type=int, nargs="+", default=[1, 8, 32])
+    loadParser.add_argument("--processes", type=int, default=1)
+    loadParser.add_argument("--fixtures", default="./fixtures", help="Serve these recorded parts instead of synthetic ones")
+    loadParser.add_argument("--shared", type=int, default=None, help="Number of distinct symbols/footprints the synthetic parts share")
+    loadParser.add_argument("--latency", type=float, default=0.02, help="Seconds the stub server waits per request")
+    loadParser.add_argument("--jitter", type=float, default=0.03, help="Up to this many seconds more per request")
+    loadParser.add_argument("--error-rate", type=float, default=0.02, help="Share of requests answered with a 503")
+    loadParser.add_argument("--rate-limit", type=float, default=None, help="Requests per second before the server answers 429")
+    loadParser.add_argument("--backoff", type=float, default=0.05, help="api.retryBackoff for the run")
+    loadParser.add_argument("--seed", type=int, default=1)
+    loadParser.add_argument("--output", default=None, help="Write the results to this JSON file")
+
+    smdParser = subparsers.add_parser("smd", help="computeSmdPlacement against the stepwise search")
+    smdParser.add_argument("--repeat", type=int, default=3)
+
+    convertParser = subparsers.add_parser("convert", help="Per-primitive cost of converting a large footprint")
+    convertParser.add_argument("--pads", type=int, default=1000)
+    convertParser.add_argument("--lines", type=int, default=1000)
+    convertParser.add_argument("--repeat", type=int, default=5)
+
+    outlineParser = subparsers.add_parser("outline", help="NumPy against pure Python conversion of long outlines")
+    outlineParser.add_argument("--vertices", type=int, nargs="+", default=[100, 1000, 10000])
+    outlineParser.add_argument("--arc-every", type=int, default=5, help="Every n-th vertex of the logo is an ARC")
+    outlineParser.add_argument("--repeat", type=int, default=5)
+
+    memoryParser = subparsers.add_parser("memory", help="Memory held by converted shapes as records and as dicts")
+    memoryParser.add_argument("--parts", type=int, default=2000)
+    memoryParser.add_argument("--lines", type=int, default=20)
+    memoryParser.add_argument("--logo-vertices", type=int, default=64)
+
+    namesParser = subparsers.add_parser("names", help="Pin/pad naming and connect matching against the list scans")
+    namesParser.add_argument("--pins", type=int, nargs="+", default=[100, 1000, 5000])
+    namesParser.add_argument("--repeat", type=int, default=1)
+
+    decodeParser = subparsers.add_parser("decode", help="Fused dataStr decoding against the two-pass decoding")
+    decodeParser.add_argument("--pads", type=int, nargs="+", default=[100, 1000, 10000])
+    decodeParser.add_argument("--repeat", type=int, default=3)
+
+    suiteParser = subparsers.add_parser("suite", help="Time every conversion stage on fixtures and synthetic parts")
+    suiteParser.add_argument("--fixtures", default="./fixtures", help="Directory of recorded parts")
+    suiteParser.add_argument("--output", default=None, help="Write the results to this JSON file")
+    suiteParser.add_argument("--baseline", default=None, help="Results JSON of an earlier run to compare against")
+    suiteParser.add_argument("--threshold", type=float, default=0.25, help="Slowdown per part counted as a regression")
+    suiteParser.add_argument("--floor", type=float, default=2e-5, help="Seconds per part a stage has to slow down by before it counts")
+    suiteParser.add_argument("--scale", type=float, default=1.0, help="Multiplies the number of synthetic parts")
+    suiteParser.add_argument("--repeat", type=int, default=3)
+
+    serviceParser = subparsers.add_parser("service", help="Latency of the conversion service with warm caches and request coalescing")
+    serviceParser.add_argument("--parts", type=int, default=50)
+    serviceParser.add_argument("--requests", type=int, default=2000, help="Warm requests to send")
+    serviceParser.add_argument("--concurrency", type=int, default=8, help="Connections sending requests at the same time")
+    serviceParser.add_argument("--workers", type=int, default=8)
+    serviceParser.add_argument("--latency", type=float, default=0.02, help="Seconds the stub server waits per request")
+    serviceParser.add_argument("--repeat", type=int, default=5, help="Parts converted by a new process each for comparison")
+    serviceParser.add_argument("--seed", type=int, default=1)
+    serviceParser.add_argument("--output", default=None, help="Write the results to this JSON file")
+
+    recordParser = subparsers.add_parser("record", help="Record parts from EasyEDA as fixtures for the suite")
+    recordParser.add_argument("partNums", nargs="+")
+    recordParser.add_argument("--fixtures", default="./fixtures")
+
+    importsParser = subparsers.add_parser("imports", help="Start-up and import time of the entry points")
+    importsParser.add_argument("--repeat", type=int, default=9)
+
+    args = parser.parse_args()
+    BENCHMARKS[args.benchmark](args)
@@ -0,0 +1,280 @@
+import argparse
+import json
+import logging
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, unquote, urlparse
+
+import api
+import eagleConvert
+import fragmentCache
+import runMetrics
+
+#A long running local HTTP service converting parts on request, for tools that would otherwise start a new
+#process per part. The download cache, the converted part cache, the pooled HTTP session and Shapely stay loaded
+#between requests, converted libraries are kept in memory for a while and concurrent requests share the download of
+#every part they have in common. Libraries are returned in the response body, nothing is written to the working directory.
+#
+#   GET /parts/C1880271                     library with one part
+#   GET /parts/C1880271?format=fragment     only its <library> element, to paste into another library
+#   GET /library?codes=C1880271,C2934560    library with several parts, sorted by LCSC code
+#   GET /stats                              cache stats and p50/p99 latency per kind of request
+
+logger = logging.getLogger(__name__)
+
+class UnknownParts(Exception):
+    def __init__(self, partNums):
+        super().__init__(f"Unknown LCSC parts: {', '.join(partNums)}")
+        self.partNums = partNums
+
+def libraryElement(library):
+    #The <library> element of a converted library, descriptions are escaped so the tags only show up once
+    start = library.index(b"<library")
+    end = library.index(b"</library>") + len(b"</library>")
+    return library[start:end]
+
+class ConversionService:
+    """
+    Converts parts into libraries, keeping the results of recent requests and
+    coalescing concurrent requests for the same set of parts into one
+    conversion. A part several requests need at once is fetched once, by the
+    first of them. Thread safe, every request of the HTTP server calls
+    library() on its own thread.
+
+    :param workers: Download threads per conversion.
+    :param fragments: fragmentCache.FragmentCache converted parts are reused
+                      from, the one beside api.cache by default.
+    :param resultTtl: Seconds a converted library is served from memory before
+                      it is converted again from the caches.
+    :param maxResults: Converted libraries kept in memory, least recently used
+                       ones are dropped first.
+    """
+    def __init__(self, workers=8, fragments=None, resultTtl=3600, maxResults=256):
+        self.workers = workers
+        self.fragments = fragments if fragments is not None else fragmentCache.besideCache(api.cache)
+        self.resultTtl = resultTtl
+        self.maxResults = maxResults
+        self.results = OrderedDict() #sorted part numbers -> (expires, library bytes)
+        self.inFlight = {} #sorted part numbers -> Future of the conversion in progress
+        self.fetching = {} #part number -> Future of its part data, None for an unknown part
+        self.converting = 0 #Conversions in progress, api's component memo is only cleared once none is left
+        self.lock = threading.Lock()
+        self.latencies = runMetrics.LatencyLog()
+        self.counts = {"hit": 0, "coalesced": 0, "converted": 0, "failed": 0}
+        self.partCounts = {"fetched": 0, "shared": 0} #Parts fetched, parts taken from another request's fetch
+
+    def warm(self):
+        #Loads what the first conversion would otherwise pay for
+        api.getSession()
+        eagleConvert.loadShapely()
+        eagleConvert.loadNumpy()
+        return self
+
+    def library(self, partNums):
+        """
+        Returns (library bytes, how it was served) for partNums, where how is
+        "hit" for a library still in memory, "coalesced" when it waited for a
+        conversion another request started and "converted" otherwise. The
+        parts are written sorted by code, so the order they are asked for in
+        does not matter. Raises UnknownParts when EasyEDA does not know some
+        of the parts.
+        """
+        key = tuple(sorted(set(partNums)))
+        with self.lock:
+            result = self.results.get(key)
+            if result is not None and result[0] > time.monotonic():
+                self.results.move_to_end(key)
+                self.counts["hit"] += 1
+                return result[1], "hit"
+            future = self.inFlight.get(key)
+            owner = future is None
+            if owner:
+                future = Future()
+                self.inFlight[key] = future
+            else:
+                self.counts["coalesced"] += 1
+        if not owner:
+            return future.result(), "coalesced"
+        try:
+            library = self.convert(key)
+        except BaseException as e:
+            with self.lock:
+                del self.inFlight[key]
+                self.counts["failed"] += 1
+            future.set_exception(e)
+            raise
+        with self.lock:
+            self.results[key] = (time.monotonic() + self.resultTtl, library)
+            self.results.move_to_end(key)
+            while len(self.results) > self.maxResults:
+                self.results.popitem(last=False)
+            del self.inFlight[key]
+            self.counts["converted"] += 1
+        future.set_result(library)
+        return library, "converted"
+
+    def convert(self, partNums):
+        metrics = runMetrics.RunMetrics(progress=False)
+        with self.lock:
+            self.converting += 1
+        try:
+            partDataList = self.fetchParts(partNums, metrics)
+        finally:
+            with self.lock:
+                self.converting -= 1
+                if not self.converting: #Components stay in api.cache, the memo would only grow
+                    api.finishBatch()
+        unknown = [partNum for partNum, partData in zip(partNums, partDataList) if partData is None]
+        if unknown:
+            raise UnknownParts(unknown)
+        return eagleConvert.createXML(partDataList, metrics=metrics, fragments=self.fragments).encode("utf-8")
+
+    def fetchParts(self, partNums, metrics):
+        """
+        Returns the part data of every part in partNums, None for the unknown
+        ones. Parts another request is fetching already are waited for, the
+        rest are fetched together and handed to requests that ask for them
+        meanwhile.
+        """
+        futures = {}
+        owned = []
+        with self.lock:
+            for partNum in partNums:
+                future = self.fetching.get(partNum)
+                if future is None:
+                    future = self.fetching[partNum] = Future()
+                    owned.append(partNum)
+                futures[partNum] = future
+            self.partCounts["fetched"] += len(owned)
+            self.partCounts["shared"] += len(partNums) - len(owned)
+        if owned:
+            try:
+                fetched = {partData["partNumb"]: partData for partData in eagleConvert.fetchMultipleParts(owned, workers=self.workers, metrics=metrics)}
+            except BaseException as e:
+                for partNum in owned:
+                    futures[partNum].set_exception(e)
+                raise
+            finally:
+                with self.lock:
+                    for partNum in owned:
+                        del self.fetching[partNum]
+            for partNum in owned:
+                futures[partNum].set_result(fetched.get(partNum))
+        return [futures[partNum].result() for partNum in partNums]
+
+    def stats(self):
+        with self.lock:
+            counts = dict(self.counts)
+            partCounts = dict(self.partCounts)
+            results = len(self.results)
+        return {"requests": counts, "parts": partCounts, "resultsInMemory": results, "latency": self.latencies.report(), "cache": api.cacheStats(), "fragments": self.fragments.report()}
+
+def parsePartNums(values):
+    #Codes may be repeated or comma separated, duplicates are dropped and the order is kept
+    partNums = [code.strip().upper() for value in values for code in value.split(",") if code.strip()]
+    return list(dict.fromkeys(partNums))
+
+class ConversionServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, service, host="127.0.0.1", port=0):
+        super().__init__((host, port), ConversionHandler)
+        self.service = service
+
+    @property
+    def url(self):
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self):
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self
+
+class ConversionHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1" #Keep-alive so a client can send many requests over one connection
+    disable_nagle_algorithm = True
+
+    def send(self, status, body, contentType, headers=()):
+        self.send_response(status)
+        self.send_header("Content-Type", contentType)
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in headers:
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def sendJson(self, status, body):
+        self.send(status, json.dumps(body).encode("utf-8"), "application/json")
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        query = parse_qs(url.query)
+        path = url.path.rstrip("/")
+        if path == "/stats":
+            self.sendJson(200, self.server.service.stats())
+            return
+        if path.startswith("/parts/"):
+            partNums = parsePartNums([unquote(path[len("/parts/"):])])
+            if len(partNums) != 1:
+                self.sendJson(400, {"error": "Give one LCSC part number, use /library for several"})
+                return
+        elif path == "/library":
+            partNums = parsePartNums(query.get("codes", []))
+            if not partNums:
+                self.sendJson(400, {"error": "No LCSC part numbers given, use /library?codes=C1880271,C2934560"})
+                return
+        else:
+            self.sendJson(404, {"error": f"Unknown path {url.path}"})
+            return
+        self.convert(partNums, query.get("format", ["lbr"])[0])
+
+    def convert(self, partNums, outputFormat):
+        if outputFormat not in ("lbr", "fragment"):
+            self.sendJson(400, {"error": f"Unknown format {outputFormat!r}, use lbr or fragment"})
+            return
+        service = self.server.service
+        startTime = time.perf_counter()
+        try:
+            library, served = service.library(partNums)
+        except UnknownParts as e:
+            self.sendJson(404, {"error": str(e), "unknown": e.partNums})
+            return
+        except Exception as e:
+            logger.exception("##### Converting %s Failed #####", ",".join(partNums))
+            self.sendJson(502, {"error": f"{type(e).__name__}: {e}"})
+            return
+        service.latencies.add(served, time.perf_counter() - startTime)
+        headers = [("X-Conversion", served)]
+        if outputFormat == "fragment":
+            self.send(200, libraryElement(library), "application/xml", headers)
+        else:
+            fileName = (partNums[0] if len(partNums) == 1 else "library") + ".lbr"
+            self.send(200, library, "application/xml", headers + [("Content-Disposition", f'attachment; filename="{fileName}"')])
+
+    def log_message(self, format, *args):
+        logger.debug("%s %s", self.address_string(), format % args)
+
+def serve(host="127.0.0.1", port=8766, workers=8, resultTtl=3600):
+    service = ConversionService(workers=workers, resultTtl=resultTtl).warm()
+    server = ConversionServer(service, host, port)
+    logger.info("##### Serving Conversions on %s #####", server.url)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+    logger.info("##### Served %s #####", service.stats()["requests"])
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Local HTTP service converting LCSC parts into EAGLE libraries")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8766)
+    parser.add_argument("--workers", type=int, default=8, help="Download threads per conversion")
+    parser.add_argument("--result-ttl", type=float, default=3600, help="Seconds a converted library is served from memory")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    serve(args.host, args.port, args.workers, args.result_ttl)
@@ -1,86 +1,463 @@
 import api
-import xmltodict
+import batchJob
+import fragmentCache
 import math
 import json
-from shapely.geometry import Polygon, Point
+import bisect
 import time
+import hashlib
+import io
+import logging
+import os
+import shutil
+import libraryWriter
+import libraryMerge
+import libraryShards
+import partIndex
+import runMetrics
+import shapeMinimizer
+import shapeRecords
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+logger = logging.getLogger(__name__)
+
+#Shapely and NumPy take longer to import than most runs spend converting, so they are only imported
+#once a POLY pad needs computeSmdPlacement or a long path is converted.
+shapely = Polygon = box = prep = None #Set by loadShapely
+numpy = None #Set by loadNumpy, stays None when NumPy is not installed
+numpyChecked = False
+minimizeShapes = True #Run shapeMinimizer over every converted symbol and footprint
+
+def loadShapely():
+    global shapely, Polygon, box, prep
+    if shapely is None:
+        from shapely.geometry import Polygon, box
+        from shapely.prepared import prep
+        import shapely as shapelyModule
+        shapely = shapelyModule
+
+def loadNumpy():
+    global numpy, numpyChecked
+    if not numpyChecked:
+        try:
+            import numpy
+        except ImportError: #Paths are converted one coordinate at a time without it
+            numpy = None
+        numpyChecked = True
+    return numpy
+
+def symbolUnitsToMillimeters(units):
+    return units * 0.254
+
+def mmUnitsToMillimeters(units):
+    return round(((units / 10) * 0.128) * 2, 2)
+
+def milUnitsToMillimeters(units):
+    return round((units * 0.0254) * 2, 2)
+
+def defaultUnitsToMillimeters(units):
+    return round((units / 10) * 0.128, 2) #mm Units Default
+
+def roundArray(values, decimals):
+    """
+    Rounds a NumPy array the same way round() rounds each float. round() rounds
+    the exact decimal value of a float, while scaling first can land on the
+    other side of a half, so values that end up close to a half are redone
+    with round().
+    """
+    factor = 10 ** decimals
+    scaled = values * factor
+    rounded = numpy.rint(scaled) / factor
+    for index in numpy.flatnonzero(numpy.abs(scaled - numpy.floor(scaled) - 0.5) < 1e-6):
+        rounded[index] = round(float(values[index]), decimals)
+    return rounded
+
+def symbolArrayToMillimeters(values):
+    return values * 0.254
+
+def mmArrayToMillimeters(values):
+    return roundArray(((values / 10) * 0.128) * 2, 2)
+
+def milArrayToMillimeters(values):
+    return roundArray((values * 0.0254) * 2, 2)
+
+def defaultArrayToMillimeters(values):
+    return roundArray((values / 10) * 0.128, 2)
+
+ARRAY_UNITS = { #Vectorized version of each unit conversion, must give the same floats
+    symbolUnitsToMillimeters: symbolArrayToMillimeters,
+    mmUnitsToMillimeters: mmArrayToMillimeters,
+    milUnitsToMillimeters: milArrayToMillimeters,
+    defaultUnitsToMillimeters: defaultArrayToMillimeters
+}
+VECTORIZE_MIN_COORDINATES = 64 #Shorter paths are faster to convert one coordinate at a time
+
+FOOTPRINT_UNITS = {
+    "mm": mmUnitsToMillimeters,
+    "mil": milUnitsToMillimeters
+}
+
+EAGLE_LAYERS = (-1, 1, 16, 21, 22, 29, 30, 31, 32, 51, 52, 20, -1, 48) #EasyEDA layer index to EAGLE layer
+SPECIAL_LAYERS = {
+    55: 44, #Drills
+    57: 19, #Unrouted
+    48: 51, #Not perfect Match, Top Document or 52 for Bottom Document
+    50: 18 #Not perfect Match, 17 for Pads or 18 for Vias
+}
+
+class UnitTable(dict):
+    """
+    Remembers the millimeter value of every coordinate converted in a pass.
+    Footprints reuse the same few coordinates a lot and rounding is the
+    expensive part of converting one.
+    """
+    def __init__(self, convert):
+        self.convert = convert
 
-global unit
-unit = "mm" #Default
-global isSymbol
-isSymbol = True #Default
-
-def theoryUnitsToMillimeters(units):
-    global isSymbol
-    if isSymbol:
-        return units * 0.254
-    if unit == "mm":
-        return round(((units / 10) * 0.128) * 2, 2)
-    elif unit == "mil":
-        return round((units * 0.0254) * 2, 2)
-    else:
-        print(f"Unknown Unit: {unit}")
-        return round((units / 10) * 0.128, 2) #mm Units Default
+    def __missing__(self, units):
+        millimeters = self.convert(units)
+        if units != 0: #0.0 and -0.0 are the same key but not the same result
+            self[units] = millimeters
+        return millimeters
+
+class UniqueNames:
+    """
+    Pin or pad names of one pass in the order they were added. A name that is
+    already taken gets a * added until it is unique. The last name handed out
+    for every requested name is remembered, so adding the same name again
+    starts from there instead of stepping through every * again.
+    """
+    def __init__(self):
+        self.names = []
+        self.taken = set()
+        self.lastTaken = {} #Requested name -> last name handed out for it
+
+    def add(self, name):
+        candidate = self.lastTaken.get(name, name)
+        while candidate in self.taken:
+            candidate += "*"
+        self.taken.add(candidate)
+        self.lastTaken[name] = candidate
+        self.names.append(candidate)
+        return candidate
+
+class ConversionContext:
+    """
+    Conversion state for one symbol or footprint pass over a part.
+    The unit conversion is picked once here, and coordinates and layers are
+    converted once per pass, so converting an item does not check the unit or
+    layer again.
+
+    :param partNumb: LCSC part number of the part being converted.
+    :param isSymbol: True for the symbol pass, False for the footprint pass.
+    :param unit: Unit from the footprint's CANVAS, either "mm" or "mil".
+    :param metrics: runMetrics.RunMetrics the pass adds its timings to.
+    """
+    def __init__(self, partNumb, isSymbol, unit="mm", metrics=None):
+        self.partNumb = partNumb
+        self.isSymbol = isSymbol
+        self.unit = unit
+        self.metrics = metrics if metrics is not None else runMetrics.RunMetrics()
+        self.pinNames = UniqueNames()
+        self.padNames = UniqueNames()
+        self.pins = self.pinNames.names #Pin names created so far, duplicates get a * added
+        self.pads = self.padNames.names #Pad names created so far, duplicates get a * added
+        self.layers = {} #EasyEDA layer -> EAGLE layer seen in this pass
+        self.reported = set() #Messages already logged in this pass
+        self.drawingLayer = 94 if isSymbol else 21
+        if isSymbol:
+            convert = symbolUnitsToMillimeters
+        elif unit in FOOTPRINT_UNITS:
+            convert = FOOTPRINT_UNITS[unit]
+        else:
+            self.reportOnce(f"Unknown Unit: {unit}")
+            convert = defaultUnitsToMillimeters
+        self.toMillimeters = UnitTable(convert).__getitem__
+        self.arrayToMillimeters = ARRAY_UNITS[convert]
+
+    def layer(self, layer):
+        if not isinstance(layer, int):
+            return theoryLayerToEagleLayer(layer, self)
+        eagleLayer = self.layers.get(layer)
+        if eagleLayer is None:
+            eagleLayer = self.layers[layer] = theoryLayerToEagleLayer(layer, self)
+        return eagleLayer
+
+    def coordinatesToMillimeters(self, values):
+        #Converts a list of coordinates at once, with NumPy for long lists
+        if len(values) < VECTORIZE_MIN_COORDINATES or loadNumpy() is None:
+            toMillimeters = self.toMillimeters
+            return [toMillimeters(float(value)) for value in values]
+        return self.arrayToMillimeters(numpy.array(values, dtype=float)).tolist()
+
+    def reportOnce(self, message, key=None):
+        #Logs message the first time key (the message itself by default) comes up in this pass
+        key = message if key is None else key
+        if key not in self.reported:
+            self.reported.add(key)
+            logger.warning(message)
+
+def theoryUnitsToMillimeters(units, context):
+    return context.toMillimeters(units)
 
 def formatCoordinate(value, decimals=6):
     return f"{value:.{decimals}f}"
 
-def theoryLayerToEagleLayer(layer):
-    global isSymbol
+def theoryLayerToEagleLayer(layer, context):
     if not isinstance(layer, (int)):
-        print(f"Unknown Layer which is not int: {layer}")
+        logger.warning("Unknown Layer which is not int: %s", layer)
         return -1
-    if layer == 55:
-        return 44 #Drills
-    elif layer == 57:
-        return 19 #Unrouted
-    elif layer == 48: #Not perfect Match
-        return 51 #Top Document or 52 for Bottom Document
-    elif layer == 50: #Not perfect Match
-        return 18 #17 for Pads or 18 for Vias
+    if layer in SPECIAL_LAYERS:
+        return SPECIAL_LAYERS[layer]
     elif layer > 13 or layer < 1:
-        print(f"Unknown Layer: {layer}")
-        return 94 if isSymbol else 49 #Reference Layer
+        logger.warning("Unknown Layer: %s", layer)
+        return 94 if context.isSymbol else 49 #Reference Layer
     elif layer == 12:
-        print(f"Uncertain Layer: {layer}")
+        logger.debug("Uncertain Layer: %s", layer)
                                                            #⌄ Index 12 is either 17 (PADS) or 18 (VIAS)
-    return [-1, 1, 16, 21, 22, 29, 30, 31, 32, 51, 52, 20, -1, 48][layer] #Convert EasyEDA layer to EAGLE layer
+    return EAGLE_LAYERS[layer] #Convert EasyEDA layer to EAGLE layer
 
-def parsePartData(partData):
-    json_output = []
+def iterPartData(partData):
+    """
+    Groups decoded dataStr rows into items the way parsePartData does, one at
+    a time. Each ITEM is yielded once the ATTR rows that follow it are
+    attached, so partData can be a generator like api.iterDataStr.
+    """
     last_item = None
 
     for index, data in enumerate(partData):
         if not data:
-            print(f"Skipping empty entry at index {index}.")
+            logger.debug("Skipping empty entry at index %d.", index)
             continue
 
         element_type = data[0].upper()
 
         if element_type != "ATTR":
             # Main element (ITEM)
-            item_dict = {"ITEM": data}
-            json_output.append(item_dict)
-            last_item = item_dict  # Update the last_item reference
+            if last_item is not None:
+                yield last_item
+            last_item = {"ITEM": data}  # Update the last_item reference
         else:
             # Attribute (ATTR)
             # Expected data format:
             # ['ATTR', 'e6', 'e5', 'NAME', 'GND', False, True, -41.3, 49.08502, 0, 'st3', 0]
             if len(data) < 5:
-                print(f"Insufficient data for ATTR at index {index}: {data}")
+                logger.warning("Insufficient data for ATTR at index %d: %s", index, data)
                 continue
 
             if not last_item:
-                print(f"No main ITEM to associate with ATTR at index {index}: {data}")
+                logger.warning("No main ITEM to associate with ATTR at index %d: %s", index, data)
                 continue
 
             attr_key = data[3]  # The attribute name (e.g., 'NAME', 'NUMBER', etc.)
 
             last_item[attr_key] = data
 
-    return json_output
+    if last_item is not None:
+        yield last_item
+
+def parsePartData(partData):
+    return list(iterPartData(partData))
+
+def floorToStep(value, step):
+    return round(math.floor(value / step + 1e-9) * step, 6)
+
+def largestSquareAtPoint(preparedPolygon, center_x, center_y, limit, step):
+    """
+    Bisection for the largest square (in multiples of step) centered on a point
+    that still fits in the polygon. Fitting is monotone in size so this finds the
+    same square as growing it one step at a time, in log(limit / step) tests.
+    """
+    low = 0
+    high = int(math.ceil(limit / step)) + 1
+    while high - low > 1:
+        middle = (low + high) // 2
+        half = middle * step / 2.0
+        if preparedPolygon.contains(box(center_x - half, center_y - half, center_x + half, center_y + half)):
+            low = middle
+        else:
+            high = middle
+    return round(low * step, 6)
 
-def computeSmdPlacement(vertexData, step=0.01):
+def convexChains(polygon):
+    """
+    Splits a convex polygon into its lower and upper chains, each a pair of
+    (xs, ys) lists with strictly increasing xs.
+    """
+    points = sorted(set(polygon.exterior.coords))
+
+    def halfHull(points):
+        hull = []
+        for point in points:
+            while len(hull) >= 2 and (hull[-1][0] - hull[-2][0]) * (point[1] - hull[-2][1]) - (hull[-1][1] - hull[-2][1]) * (point[0] - hull[-2][0]) <= 0:
+                hull.pop()
+            hull.append(point)
+        return hull
+
+    lower = halfHull(points)
+    upper = halfHull(points[::-1])[::-1]
+
+    def toChain(hull, pick):
+        xs, ys = [], []
+        for x, y in hull:
+            if xs and x == xs[-1]:
+                ys[-1] = pick(ys[-1], y)
+            else:
+                xs.append(x)
+                ys.append(y)
+        return xs, ys
+
+    return toChain(lower, min), toChain(upper, max)
+
+def chainAt(chain, x):
+    xs, ys = chain
+    if x <= xs[0]:
+        return ys[0]
+    if x >= xs[-1]:
+        return ys[-1]
+    index = bisect.bisect_right(xs, x) - 1
+    ratio = (x - xs[index]) / (xs[index + 1] - xs[index])
+    return ys[index] + (ys[index + 1] - ys[index]) * ratio
+
+def goldenMaximize(function, low, high, tolerance):
+    ratio = (math.sqrt(5) - 1) / 2
+    a = high - ratio * (high - low)
+    b = low + ratio * (high - low)
+    valueA, valueB = function(a), function(b)
+    while high - low > tolerance:
+        if valueA < valueB:
+            low, a, valueA = a, b, valueB
+            b = low + ratio * (high - low)
+            valueB = function(b)
+        else:
+            high, b, valueB = b, a, valueA
+            a = high - ratio * (high - low)
+            valueA = function(a)
+    return (a, valueA) if valueA >= valueB else (b, valueB)
+
+def largestRectangleInConvex(polygon, tolerance):
+    """
+    Largest axis-aligned rectangle inside a convex polygon.
+
+    For a rectangle spanning x0..x1 the usable height is
+    min(upper(x0), upper(x1)) - max(lower(x0), lower(x1)) because the upper chain
+    is concave and the lower chain convex. The area is log-concave in (x0, x1)
+    so a nested golden-section search converges to the optimum, to within
+    tolerance on each side.
+    """
+    lower, upper = convexChains(polygon)
+    minx, maxx = lower[0][0], lower[0][-1]
+
+    def bestForLeft(x0):
+        top, bottom = chainAt(upper, x0), chainAt(lower, x0)
+        return goldenMaximize(lambda x1: (x1 - x0) * (min(top, chainAt(upper, x1)) - max(bottom, chainAt(lower, x1))), x0, maxx, tolerance)
+
+    x0, _ = goldenMaximize(lambda x0: bestForLeft(x0)[1], minx, maxx, tolerance)
+    x1, area = bestForLeft(x0)
+    if area <= 0:
+        return None
+    y0 = max(chainAt(lower, x0), chainAt(lower, x1))
+    y1 = min(chainAt(upper, x0), chainAt(upper, x1))
+    return x0, y0, x1, y1
+
+def coveredCells(polygon, preparedPolygon, xs, ys):
+    """
+    Returns rows[row][column] telling if the grid cell is fully inside the polygon.
+    Uses the vectorized Shapely 2 functions when they are available.
+    """
+    if hasattr(shapely, "covers") and hasattr(shapely, "box"):
+        columns = len(xs) - 1
+        x0 = [xs[column] for _ in range(len(ys) - 1) for column in range(columns)]
+        x1 = [xs[column + 1] for _ in range(len(ys) - 1) for column in range(columns)]
+        y0 = [ys[row] for row in range(len(ys) - 1) for _ in range(columns)]
+        y1 = [ys[row + 1] for row in range(len(ys) - 1) for _ in range(columns)]
+        flags = shapely.covers(polygon, shapely.box(x0, y0, x1, y1)).tolist()
+        return [flags[row * columns:(row + 1) * columns] for row in range(len(ys) - 1)]
+    return [[preparedPolygon.covers(box(xs[column], ys[row], xs[column + 1], ys[row + 1])) for column in range(len(xs) - 1)] for row in range(len(ys) - 1)]
+
+def largestRectangleInPolygon(polygon, preparedPolygon, step, resolution=32, maxGridLines=160):
+    """
+    Largest axis-aligned rectangle inside any simple polygon.
+
+    The bounding box is cut into a grid along the polygon's own x and y
+    coordinates, which is exact for rectilinear pads, or into `resolution`
+    evenly spaced lines when the pad has slanted edges. Cells fully covered by the polygon are marked and
+    the largest rectangle of covered cells is found row by row with the
+    largest-rectangle-in-histogram stack algorithm, weighting every column by
+    its width. On a pad with slanted edges the result is then grown with
+    growRectangle.
+    """
+    minx, miny, maxx, maxy = polygon.bounds
+    coords = polygon.exterior.coords
+    xs = set(x for x, _ in coords)
+    ys = set(y for _, y in coords)
+    rectilinear = all(x1 == x2 or y1 == y2 for (x1, y1), (x2, y2) in zip(coords, coords[1:]))
+    gridIsExact = rectilinear and len(xs) <= maxGridLines and len(ys) <= maxGridLines
+    if not gridIsExact:
+        xs = set(minx + (maxx - minx) * i / resolution for i in range(resolution + 1))
+        ys = set(miny + (maxy - miny) * i / resolution for i in range(resolution + 1))
+    xs = sorted(xs)
+    ys = sorted(ys)
+    widths = [xs[i + 1] - xs[i] for i in range(len(xs) - 1)]
+    offsets = [0.0]
+    for width in widths:
+        offsets.append(offsets[-1] + width)
+
+    covered = coveredCells(polygon, preparedPolygon, xs, ys)
+    best = None
+    bestArea = 0.0
+    heights = [0.0] * len(widths)
+    for row in range(len(ys) - 1):
+        rowHeight = ys[row + 1] - ys[row]
+        for column in range(len(widths)):
+            if covered[row][column]:
+                heights[column] += rowHeight
+            else:
+                heights[column] = 0.0
+        stack = [] #(first column, height)
+        for column in range(len(widths) + 1):
+            columnHeight = heights[column] if column < len(widths) else 0.0
+            first = column
+            while stack and stack[-1][1] >= columnHeight:
+                first, stackHeight = stack.pop()
+                area = stackHeight * (offsets[column] - offsets[first])
+                if area > bestArea:
+                    bestArea = area
+                    best = (xs[first], ys[row + 1] - stackHeight, xs[column], ys[row + 1])
+            stack.append((first, columnHeight))
+    if best is not None and not gridIsExact:
+        best = growRectangle(preparedPolygon, best, max(maxx - minx, maxy - miny), step / 100.0)
+    return best
+
+def growRectangle(preparedPolygon, rectangle, limit, tolerance, rounds=1):
+    """
+    Pushes each side of a rectangle outwards as far as it still fits, using bisection.
+    Used to tighten grid results on pads with slanted edges.
+    """
+    x0, y0, x1, y1 = rectangle
+    for _ in range(rounds):
+        for side in range(4):
+            low, high = 0.0, limit
+            while high - low > tolerance:
+                middle = (low + high) / 2
+                candidate = [x0 - middle if side == 0 else x0, y0 - middle if side == 1 else y0,
+                             x1 + middle if side == 2 else x1, y1 + middle if side == 3 else y1]
+                if preparedPolygon.contains(box(*candidate)):
+                    low = middle
+                else:
+                    high = middle
+            if side == 0:
+                x0 -= low
+            elif side == 1:
+                y0 -= low
+            elif side == 2:
+                x1 += low
+            else:
+                y1 += low
+    return x0, y0, x1, y1
+
+def computeSmdPlacement(vertexData, step=0.01, square=False):
     """
     Given a polygon's vertex data in the form:
         vertexData = [
@@ -88,663 +465,975 @@ def computeSmdPlacement(vertexData, step=0.01):
             {"@x": x_mm, "@y": y_mm},
             ...
         ]
-    this function:
-      1) Creates a Shapely polygon.
-      2) Finds the polygon's centroid.
-      3) Iteratively expands an axis-aligned rectangle around the centroid 
-         until it can no longer fit inside the polygon.
-      
+    this function finds the largest axis-aligned rectangle that fits inside
+    the polygon so an SMD can be placed on a POLY pad:
+      - Axis-aligned rectangular pads are used as they are.
+      - Convex pads are solved with largestRectangleInConvex.
+      - Concave pads are solved with largestRectangleInPolygon.
+    With square=True it instead finds the largest square centered on the
+    polygon's centroid, like the original stepwise search did.
+
     Returns a tuple: (center_x, center_y, width, height)
-    in millimeters.
-    
-    :param vertexData: List of dict objects with '@x' and '@y' keys in mm.
-    :param step: The incremental step size in mm for expanding the rectangle.
+    in millimeters, with width and height rounded down to multiples of step.
+
+    :param vertexData: shapeRecords.Vertices, or a list of dict objects with '@x' and '@y' keys in mm.
+    :param step: The size resolution in mm.
+    :param square: Use the centroid square instead of the largest rectangle.
     """
-    coords = [(v["@x"], v["@y"]) for v in vertexData]
+    loadShapely()
+    coords = vertexData.points() if isinstance(vertexData, shapeRecords.Vertices) else [(v["@x"], v["@y"]) for v in vertexData]
     polygon = Polygon(coords)
+    if not polygon.is_valid:
+        polygon = polygon.buffer(0)
+        if polygon.geom_type == "MultiPolygon":
+            polygon = max(polygon.geoms, key=lambda part: part.area)
 
     center = polygon.centroid
-    center_x, center_y = center.x, center.y
-
-    max_dx = 0.0
-    max_dy = 0.0
-
-    while True:
-        new_dx = max_dx + step
-        new_dy = max_dy + step
-        
-        half_w = new_dx / 2.0
-        half_h = new_dy / 2.0
-
-        rect_coords = [
-            (center_x - half_w, center_y - half_h),
-            (center_x + half_w, center_y - half_h),
-            (center_x + half_w, center_y + half_h),
-            (center_x - half_w, center_y + half_h)
-        ]
-        rectangle = Polygon(rect_coords)
+    if polygon.is_empty or polygon.area <= 0:
+        return center.x if not center.is_empty else 0.0, center.y if not center.is_empty else 0.0, 0.0, 0.0
+    preparedPolygon = prep(polygon)
+    minx, miny, maxx, maxy = polygon.bounds
+    limit = max(maxx - minx, maxy - miny)
+
+    if square:
+        size = largestSquareAtPoint(preparedPolygon, center.x, center.y, limit, step)
+        return center.x, center.y, size, size
+
+    if abs(polygon.area - (maxx - minx) * (maxy - miny)) <= 1e-9 * max(polygon.area, 1.0):
+        rectangle = (minx, miny, maxx, maxy) #Already an axis-aligned rectangle
+    elif abs(polygon.convex_hull.area - polygon.area) <= 1e-9 * max(polygon.area, 1.0):
+        rectangle = largestRectangleInConvex(polygon, step / 100.0)
+    else:
+        rectangle = largestRectangleInPolygon(polygon, preparedPolygon, step)
 
-        if rectangle.within(polygon):
-            max_dx = new_dx
-            max_dy = new_dy
-        else:
-            break
-    return center_x, center_y, max_dx, max_dy
-
-def convertPhrasedToXML(phrasedData, editData, partNumb, metaData):
-    global isSymbol
-    drawingLayer = 94 if isSymbol else 21
-    useLayer = -1 if not (not isSymbol and len(phrasedData["ITEM"])) > 4 else phrasedData["ITEM"][4]
-
-    if phrasedData["ITEM"][0] == "RECT":
-        x1 = theoryUnitsToMillimeters(phrasedData["ITEM"][2])
-        y1 = theoryUnitsToMillimeters(phrasedData["ITEM"][3])
-        x2 = theoryUnitsToMillimeters(phrasedData["ITEM"][4])
-        y2 = theoryUnitsToMillimeters(phrasedData["ITEM"][5])
-
-        fillRect = False
-        if fillRect:
-            editData["rectangle"].append({
-                "@x1": x1,
-                "@y1": y1,
-                "@x2": x2,
-                "@y2": y2,
-                "@layer": drawingLayer if isSymbol else theoryLayerToEagleLayer(useLayer)
-            })
-        else:
-            editData["wire"].append({
-                "@x1": x1,
-                "@y1": y1,
-                "@x2": x2,
-                "@y2": y1,
-                "@width": 0.1,
-                "@layer": drawingLayer if isSymbol else theoryLayerToEagleLayer(useLayer)
-            })
-            editData["wire"].append({
-                "@x1": x2,
-                "@y1": y1,
-                "@x2": x2,
-                "@y2": y2,
-                "@width": 0.1,
-                "@layer": drawingLayer if isSymbol else theoryLayerToEagleLayer(useLayer)
-            })
-            editData["wire"].append({
-                "@x1": x2,
-                "@y1": y2,
-                "@x2": x1,
-                "@y2": y2,
-                "@width": 0.1,
-                "@layer": drawingLayer if isSymbol else theoryLayerToEagleLayer(useLayer)
-            })
-            editData["wire"].append({
-                "@x1": x1,
-                "@y1": y2,
-                "@x2": x1,
-                "@y2": y1,
-                "@width": 0.1,
-                "@layer": drawingLayer if isSymbol else theoryLayerToEagleLayer(useLayer)
-            })
-    elif phrasedData["ITEM"][0] == "CIRCLE":
-        editData["circle"].append({
-            "@x": theoryUnitsToMillimeters(phrasedData["ITEM"][2]),
-            "@y": theoryUnitsToMillimeters(phrasedData["ITEM"][3]),
-            "@radius": theoryUnitsToMillimeters(phrasedData["ITEM"][4]),
-            "@width": 0.1,
-            "@layer": drawingLayer if isSymbol else theoryLayerToEagleLayer(useLayer)
-        })
-    elif phrasedData["ITEM"][0] == "PIN":
-        if isSymbol:
-            pinLength = float(phrasedData["ITEM"][6]) #Pick out length, converts number length to text for EAGLE
-            pinName = phrasedData["NUMBER"][4]
-
-            nameSpace = "SYMBOL" if isSymbol else "FOOTPRINT"
-            metaData.setdefault(partNumb, {}).setdefault(nameSpace, {}).setdefault("PINS", [])
-            while pinName in metaData[partNumb][nameSpace]["PINS"]:
-                pinName += "*"
-            metaData[partNumb]["SYMBOL" if isSymbol else "FOOTPRINT"]["PINS"].append(pinName)
-
-            editData["pin"].append({
-                "@name": pinName, # + "-" + phrasedData["NAME"][4]
-                "@x": theoryUnitsToMillimeters(phrasedData["ITEM"][4]),
-                "@y": theoryUnitsToMillimeters(phrasedData["ITEM"][5]),
-                "@length": ["point", "short", "middle", "long"][math.ceil(pinLength * 0.1)], #Pick out length, converts number length to text for EAGLE
-                "@direction": {
-                    "IN": "in", #Input
-                    "OUT": "out", #Output
-                    "Bidirectional": "io", #Input/Output
-                    "Passive": "pas", #Passive
-                    "Open Collector": "oc",
-                    "Open Emitter": "oc", #Not Accurate
-                    "Power": "pwr", #Possibly sup for Supply Pin
-                    "GND": "pwr", #Ground
-                    "HIZ": "hiz",
-                    "Terminator": "io", #Not Sure
-                    "Undefined": "io"
-                }[phrasedData["Pin Type"][4]],
-                "@rot": "R" + str(phrasedData["ITEM"][7])
-            })
-        else:
-            print("PIN not supported in Footprint")
-    elif phrasedData["ITEM"][0] == "PAD":
-        padName = phrasedData["ITEM"][5] if phrasedData["ITEM"][5] != "0" else phrasedData["ITEM"][1]
-
-        nameSpace = "SYMBOL" if isSymbol else "FOOTPRINT"
-        metaData.setdefault(partNumb, {}).setdefault(nameSpace, {}).setdefault("PADS", [])
-        while padName in metaData[partNumb][nameSpace]["PADS"]:
-            padName += "*"
-        metaData[partNumb]["SYMBOL" if isSymbol else "FOOTPRINT"]["PADS"].append(padName)
-        useLayer = theoryLayerToEagleLayer(useLayer)
-        if useLayer == -1:
-            useLayer = 1 #Default to Top Layer
-        useSmd = True if phrasedData["ITEM"][9] == None else False
-
-        if phrasedData["ITEM"][10][0] == "RECT":
-            if useSmd:
-                editData["smd"].append({
-                    "@name": padName,
-                    "@x": theoryUnitsToMillimeters(phrasedData["ITEM"][6]),
-                    "@y": theoryUnitsToMillimeters(phrasedData["ITEM"][7]),
-                    "@dx": theoryUnitsToMillimeters(phrasedData["ITEM"][10][1]),
-                    "@dy": theoryUnitsToMillimeters(phrasedData["ITEM"][10][2]),
-                    "@layer": useLayer,
-                    "@rot": "R" + str(phrasedData["ITEM"][8])
-                })
-            else:
-                if phrasedData["ITEM"][9][0] == "ROUND":
-                    editData["pad"].append({
-                        "@name": padName,
-                        "@x": theoryUnitsToMillimeters(phrasedData["ITEM"][6]),
-                        "@y": theoryUnitsToMillimeters(phrasedData["ITEM"][7]),
-                        "@drill": theoryUnitsToMillimeters((phrasedData["ITEM"][9][1] + phrasedData["ITEM"][9][2]) / 2),
-                        "@diameter": theoryUnitsToMillimeters((phrasedData["ITEM"][10][1] + phrasedData["ITEM"][10][2]) / 2),
-                        "@shape": "square"
-                    })
-                    if phrasedData["ITEM"][9][1] != phrasedData["ITEM"][9][2]:
-                        print(f"ROUND not a circle: {phrasedData['ITEM'][9]}")
-                    if phrasedData["ITEM"][10][1] != phrasedData["ITEM"][10][2]:
-                        print(f"RECT not a square: {phrasedData['ITEM'][9]}")
-                else:
-                    print(f"Unknown PAD Hole Type: {phrasedData['ITEM'][9][0]}")
-        elif phrasedData["ITEM"][10][0] == "ELLIPSE":
-            if not useSmd:
-                editData["pad"].append({
-                    "@name": padName,
-                    "@x": theoryUnitsToMillimeters(phrasedData["ITEM"][6]),
-                    "@y": theoryUnitsToMillimeters(phrasedData["ITEM"][7]),
-                    "@drill": theoryUnitsToMillimeters((phrasedData["ITEM"][9][1] + phrasedData["ITEM"][9][2]) / 2),
-                    "@diameter": theoryUnitsToMillimeters((phrasedData["ITEM"][10][1] + phrasedData["ITEM"][10][2]) / 2),
-                })
-                if phrasedData["ITEM"][9][1] != phrasedData["ITEM"][9][2]:
-                    print(f"ROUND not a circle: {phrasedData['ITEM'][9]}")
-                if phrasedData["ITEM"][10][1] != phrasedData["ITEM"][10][2]:
-                    print(f"ELLIPSE not a circle: {phrasedData['ITEM'][9]}")
-            else:
-                print("ELLIPSE not supported in SMD")
-        elif phrasedData["ITEM"][10][0] == "OVAL":
-            if useSmd:
-                #SMD
-                editData["smd"].append({
-                    "@name": padName,
-                    "@x": theoryUnitsToMillimeters(phrasedData["ITEM"][6]),
-                    "@y": theoryUnitsToMillimeters(phrasedData["ITEM"][7]),
-                    "@dx": theoryUnitsToMillimeters(phrasedData["ITEM"][10][1]),
-                    "@dy": theoryUnitsToMillimeters(phrasedData["ITEM"][10][2]),
-                    "@layer": useLayer,
-                    "@roundness": "100",
-                    "@rot": "R" + str((phrasedData["ITEM"][8]) % 360)
-                })
-            else:
-                #PAD
-                editData["pad"].append({
-                    "@name": padName,
-                    "@x": theoryUnitsToMillimeters(phrasedData["ITEM"][6]),
-                    "@y": theoryUnitsToMillimeters(phrasedData["ITEM"][7]),
-                    "@drill": theoryUnitsToMillimeters(min(phrasedData["ITEM"][9][1], phrasedData["ITEM"][9][2])),
-                    "@diameter": theoryUnitsToMillimeters(phrasedData["ITEM"][10][1]),
-                    "@slotLength": theoryUnitsToMillimeters(max(phrasedData["ITEM"][9][1], phrasedData["ITEM"][9][2])),
-                    "@shape": phrasedData["ITEM"][9][0].lower(), #Get either SLOT or ROUND
-                    "@rot": "R" + str((phrasedData["ITEM"][8] + 90) % 360)
-                })
-        elif phrasedData["ITEM"][10][0] == "POLY":
-            if phrasedData["ITEM"][10][1][2] == "L": #isinstance(shape[0], (int, float))
-                vertexData = []
-                vertexList = phrasedData["ITEM"][10][1]
-                vertexList.pop(2)
-                if len(vertexList) % 2 != 0 or len(vertexList) <= 4:
-                    print(f"Invalid Length FILL (list): {vertexList}")
-                else:
-                    useLayer = theoryLayerToEagleLayer(useLayer)
-                    if useLayer == -1:
-                        print(f"Unknown useLayer FILL (list): {useLayer}")
-                        useLayer = 49 #Reference Layer
-                    for vert in range(0, len(vertexList), 2):
-                        vertexData.append({
-                            "@x": theoryUnitsToMillimeters(float(vertexList[vert])),
-                            "@y": theoryUnitsToMillimeters(float(vertexList[vert + 1]))
-                        })
-                    if isSymbol:
-                        useLayer = 94 #Symbol Layer
-                    else:
-                        editData["polygon"].append({ #Add Copper Polygon
-                            "@width": 0.1,
-                            "@layer": useLayer,
-                            "@pour": "solid",
-                            "vertex": vertexData
-                        })
-                        editData["polygon"].append({ #Add Solder Polygon
-                            "@width": 0.1,
-                            "@layer": 29 if useLayer == 1 else 30,
-                            "@pour": "solid",
-                            "vertex": vertexData
-                        })
-                        editData["polygon"].append({ #Add Stencil Polygon
-                            "@width": 0.1,
-                            "@layer": 31 if useLayer == 1 else 32,
-                            "@pour": "solid",
-                            "vertex": vertexData
-                        })
-                    x, y, dx, dy = computeSmdPlacement(vertexData, step=0.01)
-                    editData["smd" if useLayer != 94 else "polygon"].append({
-                        "@name": padName,
-                        "@x": x,
-                        "@y": y,
-                        "@dx": dx,
-                        "@dy": dy,
-                        "@layer": useLayer,
-                        "@rot": "R0"
-                    })
-        else:
-            print(f"Unknown PAD: {phrasedData['ITEM'][10][0]} {phrasedData['ITEM'][1]}")
-    elif phrasedData["ITEM"][0] == "FILL" or phrasedData["ITEM"][0] == "POLY":
-        fillType = "cutout" if phrasedData["ITEM"][0] == "POLY" else "solid"
-        dataIndex = 7 if phrasedData["ITEM"][0] == "FILL" else 6 #FILL has the list of data at index 7 meanwhile POLY has it's at index 6
-        if dataIndex >= len(phrasedData["ITEM"]):
-            dataIndex = 2 #Has a list of coords without the L or ARC
-        lineWidth = theoryUnitsToMillimeters(phrasedData["ITEM"][5])
-        if isinstance(phrasedData["ITEM"][dataIndex], (list)):
-            if isinstance(phrasedData["ITEM"][dataIndex][0], (list)):
-                shapesData = []
-                for shape in phrasedData["ITEM"][dataIndex]:
-                    shapesData.append(shape)
+    if rectangle is None:
+        size = largestSquareAtPoint(preparedPolygon, center.x, center.y, limit, step)
+        return center.x, center.y, size, size
+    x0, y0, x1, y1 = rectangle
+    return (x0 + x1) / 2.0, (y0 + y1) / 2.0, floorToStep(x1 - x0, step), floorToStep(y1 - y0, step)
+
+def splitPath(vertexList):
+    """
+    Splits an EasyEDA path into (command, numbers) runs where command is the
+    "L" or "ARC" in front of the numbers. A path starts out as lines.
+    """
+    runs = []
+    command = "L"
+    start = 0
+    for marker in [index for index, token in enumerate(vertexList) if isinstance(token, str)]:
+        if marker > start:
+            runs.append((command, vertexList[start:marker]))
+        command = vertexList[marker]
+        start = marker + 1
+    if start < len(vertexList):
+        runs.append((command, vertexList[start:]))
+    return runs
+
+def pathVertices(vertexList, context):
+    """
+    Converts an EasyEDA path into shapeRecords.Vertices. The coordinates of the whole
+    path are converted in one go. An ARC is followed by its curve and the
+    vertex it ends at, any numbers after that are lines again.
+    """
+    coordinates = []
+    curves = {} #Vertex index -> curve of the arc ending at it
+    for command, numbers in splitPath(vertexList):
+        if command == "ARC":
+            if len(numbers) < 3:
+                context.reportOnce(f"Incomplete ARC FILL (list): {vertexList}", key=("PATH", "ARC"))
+                continue
+            curves[len(coordinates) // 2] = numbers[0]
+            numbers = numbers[1:]
+        elif command != "L":
+            context.reportOnce(f"Unknown path command FILL (list): {command}", key=("PATH", command))
+            continue
+        if len(numbers) % 2 != 0:
+            context.reportOnce(f"Odd number of coordinates FILL (list): {vertexList}", key=("PATH", "odd"))
+            numbers = numbers[:-1]
+        coordinates += numbers
+    return shapeRecords.Vertices(context.coordinatesToMillimeters(coordinates), curves or None)
+
+PIN_LENGTHS = ("point", "short", "middle", "long")
+PIN_DIRECTIONS = {
+    "IN": "in", #Input
+    "OUT": "out", #Output
+    "Bidirectional": "io", #Input/Output
+    "Passive": "pas", #Passive
+    "Open Collector": "oc",
+    "Open Emitter": "oc", #Not Accurate
+    "Power": "pwr", #Possibly sup for Supply Pin
+    "GND": "pwr", #Ground
+    "HIZ": "hiz",
+    "Terminator": "io", #Not Sure
+    "Undefined": "io"
+}
+                 #⌄ Index 0 is Defualt text to center
+TEXT_ALIGNMENTS = ("center", "top-left", "center-left", "bottom-left", "top-center", "center", "bottom-center", "top-right", "center-right", "bottom-right")
+
+def itemLayer(phrasedData, context):
+    return -1 if not (not context.isSymbol and len(phrasedData["ITEM"])) > 4 else phrasedData["ITEM"][4]
+
+def convertRect(phrasedData, editData, context):
+    toMillimeters = context.toMillimeters
+    x1 = toMillimeters(phrasedData["ITEM"][2])
+    y1 = toMillimeters(phrasedData["ITEM"][3])
+    x2 = toMillimeters(phrasedData["ITEM"][4])
+    y2 = toMillimeters(phrasedData["ITEM"][5])
+    layer = context.drawingLayer if context.isSymbol else context.layer(itemLayer(phrasedData, context))
+
+    fillRect = False
+    if fillRect:
+        editData.rectangle.append(shapeRecords.Rectangle(x1, y1, x2, y2, layer))
+    else:
+        editData.wire.append(shapeRecords.Wire(x1, y1, x2, y1, 0.1, layer))
+        editData.wire.append(shapeRecords.Wire(x2, y1, x2, y2, 0.1, layer))
+        editData.wire.append(shapeRecords.Wire(x2, y2, x1, y2, 0.1, layer))
+        editData.wire.append(shapeRecords.Wire(x1, y2, x1, y1, 0.1, layer))
+
+def convertCircle(phrasedData, editData, context):
+    toMillimeters = context.toMillimeters
+    editData.circle.append(shapeRecords.Circle(
+        toMillimeters(phrasedData["ITEM"][2]),
+        toMillimeters(phrasedData["ITEM"][3]),
+        toMillimeters(phrasedData["ITEM"][4]),
+        0.1,
+        context.drawingLayer if context.isSymbol else context.layer(itemLayer(phrasedData, context))
+    ))
+
+def convertPin(phrasedData, editData, context):
+    if not context.isSymbol:
+        context.reportOnce("PIN not supported in Footprint")
+        return
+    pinLength = float(phrasedData["ITEM"][6]) #Pick out length, converts number length to text for EAGLE
+    pinName = context.pinNames.add(phrasedData["NUMBER"][4])
+
+    editData.pin.append(shapeRecords.Pin(
+        pinName, # + "-" + phrasedData["NAME"][4]
+        context.toMillimeters(phrasedData["ITEM"][4]),
+        context.toMillimeters(phrasedData["ITEM"][5]),
+        PIN_LENGTHS[math.ceil(pinLength * 0.1)], #Pick out length, converts number length to text for EAGLE
+        PIN_DIRECTIONS[phrasedData["Pin Type"][4]],
+        "R" + str(phrasedData["ITEM"][7])
+    ))
+
+def convertRectPad(phrasedData, editData, context, padName, useLayer, useSmd):
+    toMillimeters = context.toMillimeters
+    if useSmd:
+        editData.smd.append(shapeRecords.Smd(
+            padName,
+            toMillimeters(phrasedData["ITEM"][6]),
+            toMillimeters(phrasedData["ITEM"][7]),
+            toMillimeters(phrasedData["ITEM"][10][1]),
+            toMillimeters(phrasedData["ITEM"][10][2]),
+            useLayer,
+            rot="R" + str(phrasedData["ITEM"][8])
+        ))
+    elif phrasedData["ITEM"][9][0] == "ROUND":
+        editData.pad.append(shapeRecords.Pad(
+            padName,
+            toMillimeters(phrasedData["ITEM"][6]),
+            toMillimeters(phrasedData["ITEM"][7]),
+            toMillimeters((phrasedData["ITEM"][9][1] + phrasedData["ITEM"][9][2]) / 2),
+            toMillimeters((phrasedData["ITEM"][10][1] + phrasedData["ITEM"][10][2]) / 2),
+            shape="square"
+        ))
+        if phrasedData["ITEM"][9][1] != phrasedData["ITEM"][9][2]:
+            logger.debug("ROUND not a circle: %s", phrasedData["ITEM"][9])
+        if phrasedData["ITEM"][10][1] != phrasedData["ITEM"][10][2]:
+            logger.debug("RECT not a square: %s", phrasedData["ITEM"][9])
+    else:
+        context.reportOnce(f"Unknown PAD Hole Type: {phrasedData['ITEM'][9][0]}")
+
+def convertEllipsePad(phrasedData, editData, context, padName, useLayer, useSmd):
+    toMillimeters = context.toMillimeters
+    if useSmd:
+        context.reportOnce("ELLIPSE not supported in SMD")
+        return
+    editData.pad.append(shapeRecords.Pad(
+        padName,
+        toMillimeters(phrasedData["ITEM"][6]),
+        toMillimeters(phrasedData["ITEM"][7]),
+        toMillimeters((phrasedData["ITEM"][9][1] + phrasedData["ITEM"][9][2]) / 2),
+        toMillimeters((phrasedData["ITEM"][10][1] + phrasedData["ITEM"][10][2]) / 2),
+    ))
+    if phrasedData["ITEM"][9][1] != phrasedData["ITEM"][9][2]:
+        logger.debug("ROUND not a circle: %s", phrasedData["ITEM"][9])
+    if phrasedData["ITEM"][10][1] != phrasedData["ITEM"][10][2]:
+        logger.debug("ELLIPSE not a circle: %s", phrasedData["ITEM"][9])
+
+def convertOvalPad(phrasedData, editData, context, padName, useLayer, useSmd):
+    toMillimeters = context.toMillimeters
+    if useSmd:
+        #SMD
+        editData.smd.append(shapeRecords.Smd(
+            padName,
+            toMillimeters(phrasedData["ITEM"][6]),
+            toMillimeters(phrasedData["ITEM"][7]),
+            toMillimeters(phrasedData["ITEM"][10][1]),
+            toMillimeters(phrasedData["ITEM"][10][2]),
+            useLayer,
+            roundness="100",
+            rot="R" + str((phrasedData["ITEM"][8]) % 360)
+        ))
+    else:
+        #PAD
+        editData.pad.append(shapeRecords.Pad(
+            padName,
+            toMillimeters(phrasedData["ITEM"][6]),
+            toMillimeters(phrasedData["ITEM"][7]),
+            toMillimeters(min(phrasedData["ITEM"][9][1], phrasedData["ITEM"][9][2])),
+            toMillimeters(phrasedData["ITEM"][10][1]),
+            slotLength=toMillimeters(max(phrasedData["ITEM"][9][1], phrasedData["ITEM"][9][2])),
+            shape=phrasedData["ITEM"][9][0].lower(), #Get either SLOT or ROUND
+            rot="R" + str((phrasedData["ITEM"][8] + 90) % 360)
+        ))
+
+def convertPolyPad(phrasedData, editData, context, padName, useLayer, useSmd):
+    if phrasedData["ITEM"][10][1][2] != "L": #isinstance(shape[0], (int, float))
+        return
+    vertexList = phrasedData["ITEM"][10][1].copy() #Copy so the part data can be converted again
+    vertexList.pop(2)
+    if len(vertexList) % 2 != 0 or len(vertexList) <= 4:
+        logger.warning("Invalid Length FILL (list): %s", vertexList)
+        return
+    useLayer = context.layer(useLayer)
+    if useLayer == -1:
+        logger.warning("Unknown useLayer FILL (list): %s", useLayer)
+        useLayer = 49 #Reference Layer
+    vertices = shapeRecords.Vertices(context.coordinatesToMillimeters(vertexList))
+    if context.isSymbol:
+        useLayer = 94 #Symbol Layer
+    else:
+        editData.polygon.append(shapeRecords.Polygon(0.1, useLayer, "solid", vertices)) #Add Copper Polygon
+        editData.polygon.append(shapeRecords.Polygon(0.1, 29 if useLayer == 1 else 30, "solid", vertices)) #Add Solder Polygon
+        editData.polygon.append(shapeRecords.Polygon(0.1, 31 if useLayer == 1 else 32, "solid", vertices)) #Add Stencil Polygon
+    startTime = time.perf_counter()
+    x, y, dx, dy = computeSmdPlacement(vertices, step=0.01)
+    context.metrics.add("smdPlacement", time.perf_counter() - startTime)
+    (editData.smd if useLayer != 94 else editData.polygon).append(shapeRecords.Smd(padName, x, y, dx, dy, useLayer, rot="R0"))
+
+PAD_HANDLERS = {
+    "RECT": convertRectPad,
+    "ELLIPSE": convertEllipsePad,
+    "OVAL": convertOvalPad,
+    "POLY": convertPolyPad
+}
+
+def convertPad(phrasedData, editData, context):
+    padName = context.padNames.add(phrasedData["ITEM"][5] if phrasedData["ITEM"][5] != "0" else phrasedData["ITEM"][1])
+    useLayer = context.layer(itemLayer(phrasedData, context))
+    if useLayer == -1:
+        useLayer = 1 #Default to Top Layer
+    useSmd = True if phrasedData["ITEM"][9] == None else False
+
+    padShape = phrasedData["ITEM"][10][0]
+    handler = PAD_HANDLERS.get(padShape)
+    if handler is None:
+        context.reportOnce(f"Unknown PAD: {padShape} {phrasedData['ITEM'][1]}", key=("PAD", padShape))
+    else:
+        handler(phrasedData, editData, context, padName, useLayer, useSmd)
+
+def convertFill(phrasedData, editData, context):
+    toMillimeters = context.toMillimeters
+    drawingLayer = context.drawingLayer
+    useLayer = itemLayer(phrasedData, context)
+    fillType = "cutout" if phrasedData["ITEM"][0] == "POLY" else "solid"
+    dataIndex = 7 if phrasedData["ITEM"][0] == "FILL" else 6 #FILL has the list of data at index 7 meanwhile POLY has it's at index 6
+    if dataIndex >= len(phrasedData["ITEM"]):
+        dataIndex = 2 #Has a list of coords without the L or ARC
+    lineWidth = toMillimeters(phrasedData["ITEM"][5])
+    if not isinstance(phrasedData["ITEM"][dataIndex], (list)):
+        context.reportOnce(f"Unknown FILL {dataIndex}: {phrasedData['ITEM']}", key=("FILL", dataIndex))
+        return
+    if isinstance(phrasedData["ITEM"][dataIndex][0], (list)):
+        shapesData = []
+        for shape in phrasedData["ITEM"][dataIndex]:
+            shapesData.append(shape)
+    else:
+        shapesData = [phrasedData["ITEM"][dataIndex]]
+
+    for shape in shapesData:
+        if shape[0] == "CIRCLE":
+            editData.circle.append(shapeRecords.Circle(toMillimeters(shape[1]), toMillimeters(shape[2]), toMillimeters(shape[3]), lineWidth, drawingLayer))
+        elif shape[2] == "L" or isinstance(shape[0], (int, float)):
+            vertexList = shape.copy()
+            try: #Tries removing the L but if it doesn't exist it just continues
+                vertexList.remove("L")
+            except:
+                pass
+            if len(vertexList) == 4:
+                useLayer = context.layer(useLayer)
+                if useLayer == -1:
+                    logger.warning("Unknown useLayer FILL (list): %s", useLayer)
+                    useLayer = 49 #Reference Layer
+                editData.wire.append(shapeRecords.Wire(
+                    toMillimeters(float(vertexList[0])),
+                    toMillimeters(float(vertexList[1])),
+                    toMillimeters(float(vertexList[2])),
+                    toMillimeters(float(vertexList[3])),
+                    lineWidth,
+                    useLayer
+                ))
             else:
-                shapesData = [phrasedData["ITEM"][dataIndex]]
-
-            for shape in shapesData:
-                if shape[0] == "CIRCLE":
-                    editData["circle"].append({
-                        "@x": theoryUnitsToMillimeters(shape[1]),
-                        "@y": theoryUnitsToMillimeters(shape[2]),
-                        "@radius": theoryUnitsToMillimeters(shape[3]),
-                        "@width": lineWidth,
-                        "@layer": drawingLayer
-                    })
-                elif shape[2] == "L" or isinstance(shape[0], (int, float)):
-                    vertexData = []
-                    vertexList = shape.copy()
-                    try: #Tries removing the L but if it doesn't exist it just continues
-                        vertexList.remove("L")
-                    except:
-                        pass
-                    if len(vertexList) == 4:
-                        useLayer = theoryLayerToEagleLayer(useLayer)
-                        if useLayer == -1:
-                            print(f"Unknown useLayer FILL (list): {useLayer}")
-                            useLayer = 49 #Reference Layer
-                        editData["wire"].append({
-                            "@x1": theoryUnitsToMillimeters(float(vertexList[0])),
-                            "@y1": theoryUnitsToMillimeters(float(vertexList[1])),
-                            "@x2": theoryUnitsToMillimeters(float(vertexList[2])),
-                            "@y2": theoryUnitsToMillimeters(float(vertexList[3])),
-                            "@width": lineWidth,
-                            "@layer": useLayer
-                        })
-                    else:
-                        useLayer = theoryLayerToEagleLayer(useLayer)
-                        if useLayer == -1:
-                            useLayer = 49 #Reference Layer
-                        elif useLayer == 12:
-                            useLayer = 21
-
-                        i = 0
-                        usageType = "L"
-                        while i < len(vertexList):
-                            if partNumb == 'C105420':
-                                pass
-                                print(vertexList[i])
-                            if vertexList[i] == "L":
-                                usageType = "L"
-                                i += 1
-                                continue
-                            elif vertexList[i] == "ARC":
-                                usageType = "ARC"
-                                i += 1
-                                continue
-                            elif isinstance(vertexList[i], (int, float)):
-                                if usageType == "L":
-                                    vertexData.append({
-                                        "@x": theoryUnitsToMillimeters(vertexList[i]),
-                                        "@y": theoryUnitsToMillimeters(vertexList[i + 1])
-                                    })
-                                    i += 2
-                                elif usageType == "ARC":
-                                    print(vertexList[i + 1])
-                                    print(vertexList[i + 2])
-                                    print(vertexList[i])
-                                    vertexData.append({
-                                        "@x": theoryUnitsToMillimeters(vertexList[i + 1]),
-                                        "@y": theoryUnitsToMillimeters(vertexList[i + 2]),
-                                        "@curve": vertexList[i]
-                                    })
-                                    i += 3
-                                    usageType = "L"
-                                else:
-                                    print(f"Unknown usageType FILL (list): {usageType}")
-
-                        editData["polygon"].append({
-                            "@width": lineWidth,
-                            "@layer": useLayer,
-                            "@pour": fillType,
-                            "vertex": vertexData
-                        })
-                else:
-                    print(f"Unknown FILL (list): {shape}")
+                useLayer = context.layer(useLayer)
+                if useLayer == -1:
+                    useLayer = 49 #Reference Layer
+                elif useLayer == 12:
+                    useLayer = 21
+
+                editData.polygon.append(shapeRecords.Polygon(lineWidth, useLayer, fillType, pathVertices(vertexList, context)))
         else:
-            print(f"Unknown FILL {dataIndex}: {phrasedData['ITEM']}")
-    elif phrasedData["ITEM"][0] == "STRING":
-        editData["text"].append({
-            "@x": theoryUnitsToMillimeters(float(phrasedData["ITEM"][4])),
-            "@y": theoryUnitsToMillimeters(float(phrasedData["ITEM"][5])),
-            "@size": theoryUnitsToMillimeters(float(phrasedData["ITEM"][8])),
-            "@layer": theoryLayerToEagleLayer(phrasedData["ITEM"][3]),
-                        #⌄ Index 0 is Defualt text to center
-            "@align": ["center", "top-left", "center-left", "bottom-left", "top-center", "center", "bottom-center", "top-right", "center-right", "bottom-right"][int(phrasedData["ITEM"][12])],
-            "#text": phrasedData["ITEM"][6]
-        })
-    elif phrasedData["ITEM"][0] == "CANVAS":
-        if phrasedData["ITEM"][3] not in ["mm", "mil"]:
-            print(f"CANVAS not in a supported measurment! Errors may occur! Measurment Type: {phrasedData['ITEM'][3]}")
-        print(f"CANVAS INFO: {phrasedData['ITEM']}")
+            context.reportOnce(f"Unknown FILL (list): {shape}", key=("FILL", "list"))
+
+def convertString(phrasedData, editData, context):
+    toMillimeters = context.toMillimeters
+    editData.text.append(shapeRecords.Text(
+        toMillimeters(float(phrasedData["ITEM"][4])),
+        toMillimeters(float(phrasedData["ITEM"][5])),
+        toMillimeters(float(phrasedData["ITEM"][8])),
+        context.layer(phrasedData["ITEM"][3]),
+        TEXT_ALIGNMENTS[int(phrasedData["ITEM"][12])],
+        phrasedData["ITEM"][6]
+    ))
+
+def convertCanvas(phrasedData, editData, context):
+    if phrasedData["ITEM"][3] not in ["mm", "mil"]:
+        context.reportOnce(f"CANVAS not in a supported measurment! Errors may occur! Measurment Type: {phrasedData['ITEM'][3]}")
+    logger.debug("CANVAS INFO: %s", phrasedData["ITEM"])
+
+ELEMENT_HANDLERS = {
+    "RECT": convertRect,
+    "CIRCLE": convertCircle,
+    "PIN": convertPin,
+    "PAD": convertPad,
+    "FILL": convertFill,
+    "POLY": convertFill,
+    "STRING": convertString,
+    "CANVAS": convertCanvas
+}
+
+def convertPhrasedToXML(phrasedData, editData, context):
+    elementType = phrasedData["ITEM"][0]
+    handler = ELEMENT_HANDLERS.get(elementType)
+    if handler is None:
+        context.reportOnce(f"Unknown ELEMENT: {elementType}", key=("ELEMENT", elementType))
     else:
-        print(f"Unknown ELEMENT: {phrasedData['ITEM'][0]}")
-    return editData, metaData
+        handler(phrasedData, editData, context)
+    return editData
 
 def extractData(partData):
     return partData["partInfo"], partData["partSymbolPhrased"], partData["partFootprintPhrased"], partData["partName"], partData["partNumb"]
 
-def createXML(partDataList, saveMetaDict=False):
-    global isSymbol
-    xmlStartTime = time.time()
-    print(f"##### Initilizing XML Creation #####")
+def payloadHash(data):
+    return hashlib.sha1(json.dumps(data, sort_keys=True, separators=(",", ":")).encode("utf-8")).digest()
+
+def renderedKey(fragment, name):
+    #Hash of a rendered symbol or package without its name, for shapes only known as the text they were written as
+    from xml.sax.saxutils import quoteattr #Same quoting xmltodict uses for attributes
+    return hashlib.sha1(fragment.strip().replace(f"name={quoteattr(name)}", "name=", 1).encode("utf-8")).digest()
+
+def uniqueName(name, usedNames):
+    uniqueName = name
+    suffix = 2
+    while uniqueName in usedNames:
+        uniqueName = f"{name}_{suffix}"
+        suffix += 1
+    usedNames.add(uniqueName)
+    return uniqueName
+
+def canvasUnit(partFootprintPhrased):
+    for item in partFootprintPhrased:
+        if item["ITEM"][0] == "CANVAS":
+            return item["ITEM"][3]
+    return "mm"
+
+def convertItems(phrasedItems, partName, context):
+    """
+    Converts every phrased item of a symbol or footprint into a new
+    shapeRecords.Shape and, with minimizeShapes on, removes the geometry that
+    does not change how it looks. Returns (shape, names, milliseconds) where
+    names are the pin or pad names it created. The time per element type and
+    what the minimize pass removed are added to context.metrics.
+    """
+    startTime = time.perf_counter()
+    shape = shapeRecords.Shape(partName)
+    elementTimes = {} #Element type -> [seconds, count], added to the metrics once per pass
+    itemStartTime = startTime
+    for item in phrasedItems: #Fusion Electronics/EAGLE imports using millimeters as units no matter what.
+        try:
+            shape = convertPhrasedToXML(item, shape, context)
+        except:
+            logger.error("Error thrown due to %s", item)
+            raise
+        itemEndTime = time.perf_counter()
+        totals = elementTimes.get(item["ITEM"][0])
+        if totals is None:
+            elementTimes[item["ITEM"][0]] = [itemEndTime - itemStartTime, 1]
+        else:
+            totals[0] += itemEndTime - itemStartTime
+            totals[1] += 1
+        itemStartTime = itemEndTime
+    if minimizeShapes:
+        context.metrics.count(shapeMinimizer.minimizeShape(shape))
+        context.metrics.add("minimize", time.perf_counter() - itemStartTime)
+    elapsed = time.perf_counter() - startTime
+    context.metrics.addElements(elementTimes)
+    context.metrics.add("convert.symbol" if context.isSymbol else "convert.footprint", elapsed)
+    return shape, context.pins if context.isSymbol else context.pads, elapsed * 1000
+
+def convertSymbol(partData, metrics=None):
+    return convertItems(partData["partSymbolPhrased"], partData["partName"], ConversionContext(partData["partNumb"], True, metrics=metrics))
+
+def convertFootprint(partData, metrics=None):
+    context = ConversionContext(partData["partNumb"], False, canvasUnit(partData["partFootprintPhrased"]), metrics)
+    return convertItems(partData["partFootprintPhrased"], partData["partName"], context)
+
+def convertPartShapes(partData, withSymbol=True, withFootprint=True, metrics=None):
+    """
+    Converts a part's symbol and footprint, skipping the ones not asked for.
+    Only depends on its arguments so it can run in a worker process.
+    """
+    return convertSymbol(partData, metrics) if withSymbol else None, convertFootprint(partData, metrics) if withFootprint else None
+
+def convertPartShapesMeasured(partData, withSymbol, withFootprint):
+    #convertPartShapes for worker processes, the metrics are sent back with the shapes to be merged
+    metrics = runMetrics.RunMetrics()
+    return convertPartShapes(partData, withSymbol, withFootprint, metrics), metrics.snapshot()
 
-    #####
+class ShapeDeduplicator:
+    """
+    Keeps a single copy of every distinct symbol or package in a library.
+
+    Parts whose source data hashes the same as an earlier part are not
+    converted again, and converted shapes with the same content (ignoring the
+    name) are shared. Shapes that differ but would have the same name get a
+    numbered suffix so every name in the library stays unique. Only hashes,
+    names and sizes are kept, never the shapes themselves.
+
+    :param tag: "symbol" or "package", what the shapes are written as.
+    :param fragments: Optional fragmentCache.FragmentCache. Source data that
+                      was converted in an earlier run is then written from it
+                      without converting it again.
+    """
+    def __init__(self, tag, fragments=None):
+        self.tag = tag
+        self.fragments = fragments
+        self.bySource = {} #source hash -> (name, NUL separated names, milliseconds to convert, content hash)
+        self.byContent = {} #content hash -> (name, serialized bytes)
+        self.existing = {} #renderedKey -> (name, serialized bytes) of the shapes of a library merged into, see addExisting
+        self.usedNames = set()
+        self.stats = {"unique": 0, "duplicates": 0, "skippedConversions": 0, "bytesSaved": 0, "msSaved": 0.0}
+
+    def addExisting(self, fragments):
+        """
+        Takes the shapes of the library mergeIntoLibrary writes into, as
+        libraryMerge.Fragments. Their names are taken, and a new shape that
+        renders the same apart from its name uses the one in the library
+        instead of being written again with a suffix.
+        """
+        for fragment in fragments:
+            self.usedNames.add(fragment.name)
+            self.existing[renderedKey(fragment.text, fragment.name)] = (fragment.name, len(fragment.text.encode("utf-8")))
+
+    def add(self, sourceKey, partName, convert, writer):
+        """
+        Returns (name, names, isNew) for a part's symbol or package.
+        sourceKey is the payloadHash of the part's source data. convert() is
+        only called for new source data that is not in the fragment cache and
+        must return (shape, names, milliseconds) where shape is a
+        shapeRecords.Shape and names are the pin or pad names it created.
+        Shapes not in the library yet are written to writer, a
+        libraryWriter.LibraryWriter.
+        """
+        if sourceKey in self.bySource:
+            name, names, elapsed, contentKey = self.bySource[sourceKey]
+            self.stats["duplicates"] += 1
+            self.stats["skippedConversions"] += 1
+            self.stats["msSaved"] += elapsed
+            self.stats["bytesSaved"] += self.byContent[contentKey][1]
+            return name, names.split("\0") if names else [], False
+
+        entry = self.fragments.get(self.tag, sourceKey) if self.fragments is not None else None
+        if entry is None:
+            shape, names, elapsed = convert()
+            contentKey = shape.contentKey()
+            if self.fragments is not None:
+                shape.name = fragmentCache.NAME_PLACEHOLDER
+                entry = {"fragment": writer.render(self.tag, shape.toDict()), "names": names, "ms": elapsed, "contentKey": contentKey.hex()}
+                self.fragments.set(self.tag, sourceKey, entry)
+        else:
+            names, elapsed, contentKey = entry["names"], entry["ms"], bytes.fromhex(entry["contentKey"])
+        isNew = contentKey not in self.byContent
+        if isNew and self.existing:
+            if entry is None: #Rendered once without a name, to compare and then to write
+                shape.name = fragmentCache.NAME_PLACEHOLDER
+                entry = {"fragment": writer.render(self.tag, shape.toDict())}
+            existing = self.existing.get(renderedKey(entry["fragment"], fragmentCache.NAME_PLACEHOLDER))
+            if existing is not None:
+                self.byContent[contentKey] = existing
+                isNew = False
+        if isNew:
+            name = uniqueName(partName, self.usedNames)
+            if entry is None:
+                shape.name = name
+                size = writer.write(self.tag, shape.toDict())
+            else:
+                size = writer.writeRendered(self.tag, fragmentCache.fillPlaceholders(entry["fragment"], {"name": name}))
+            self.byContent[contentKey] = (name, size)
+            self.stats["unique"] += 1
+        else:
+            name = self.byContent[contentKey][0]
+            self.stats["duplicates"] += 1
+            self.stats["bytesSaved"] += self.byContent[contentKey][1]
+        self.bySource[sourceKey] = (name, "\0".join(names), elapsed, contentKey) #One string per part keeps memory small
+        return name, names, isNew
 
-    xmlInitial = '<?xml version="1.0" encoding="utf-8"?>\n<!DOCTYPE eagle SYSTEM "eagle.dtd">\n'
+    def needsConversion(self, sourceKey):
+        #Whether add() would have to convert this source data
+        return sourceKey not in self.bySource and not (self.fragments is not None and self.fragments.has(self.tag, sourceKey))
 
-    xmlContent = {
-        "eagle": {
-            "@version": "9.7.0",
-            "drawing": {
-                "settings": {
-                    "setting": [
-                        {"@alwaysvectorfont": "no"},
-                        {"@verticaltext": "up"}
-                    ]
-                },
-                "grid": {
-                    "@distance": "10",
-                    "@unitdist": "mm",
-                    "@unit": "mm",
-                    "@style": "lines",
-                    "@multiple": "1",
-                    "@display": "no",
-                    "@altdistance": "1",
-                    "@altunitdist": "mm",
-                    "@altunit": "mm"
-                },
-                "layers": {
-                    "layer":  [
-                        {"@number": "1", "@name": "Top", "@color": "4", "@fill": "1", "@visible": "yes", "@active": "yes"},
-                        {"@number": "2", "@name": "Route2", "@color": "16", "@fill": "1", "@visible": "no", "@active": "yes"},
-                        {"@number": "3", "@name": "Route3", "@color": "17", "@fill": "1", "@visible": "no", "@active": "yes"},
-                        {"@number": "4", "@name": "Route4", "@color": "18", "@fill": "1", "@visible": "no", "@active": "yes"},
-                        {"@number": "5", "@name": "Route5", "@color": "19", "@fill": "1", "@visible": "no", "@active": "yes"},
-                        {"@number": "6", "@name": "Route6", "@color": "25", "@fill": "1", "@visible": "no", "@active": "yes"},
-                        {"@number": "7", "@name": "Route7", "@color": "26", "@fill": "1", "@visible": "no", "@active": "yes"},
-                        {"@number": "8", "@name": "Route8", "@color": "27", "@fill": "1", "@visible": "no", "@active": "yes"},
-                        {"@number": "9", "@name": "Route9", "@color": "28", "@fill": "1", "@visible": "no", "@active": "yes"},
-                        {"@number": "10", "@name": "Route10", "@color": "29", "@fill": "1", "@visible": "no", "@active": "yes"},
-                        {"@number": "11", "@name": "Route11", "@color": "30", "@fill": "1", "@visible": "no", "@active": "yes"},
-                        {"@number": "12", "@name": "Route12", "@color": "20", "@fill": "1", "@visible": "no", "@active": "yes"},
-                        {"@number": "13", "@name": "Route13", "@color": "21", "@fill": "1", "@visible": "no", "@active": "yes"},
-                        {"@number": "14", "@name": "Route14", "@color": "22", "@fill": "1", "@visible": "no", "@active": "yes"},
-                        {"@number": "15", "@name": "Route15", "@color": "23", "@fill": "1", "@visible": "no", "@active": "yes"},
-                        {"@number": "16", "@name": "Bottom", "@color": "1", "@fill": "1", "@visible": "yes", "@active": "yes"},
-                        {"@number": "17", "@name": "Pads", "@color": "2", "@fill": "1", "@visible": "yes", "@active": "yes"},
-                        {"@number": "18", "@name": "Vias", "@color": "2", "@fill": "1", "@visible": "yes", "@active": "yes"},
-                        {"@number": "19", "@name": "Unrouted", "@color": "6", "@fill": "1", "@visible": "yes", "@active": "yes"},
-                        {"@number": "20", "@name": "Dimension", "@color": "24", "@fill": "1", "@visible": "yes", "@active": "yes"},
-                        {"@number": "21", "@name": "tPlace", "@color": "7", "@fill": "1", "@visible": "yes", "@active": "yes"},
-                        {"@number": "22", "@name": "bPlace", "@color": "7", "@fill": "1", "@visible": "yes", "@active": "yes"},
-                        {"@number": "23", "@name": "tOrigins", "@color": "15", "@fill": "1", "@visible": "yes", "@active": "yes"},
-                        {"@number": "24", "@name": "bOrigins", "@color": "15", "@fill": "1", "@visible": "yes", "@active": "yes"},
-                        {"@number": "25", "@name": "tNames", "@color": "7", "@fill": "1", "@visible": "yes", "@active": "yes"},
-                        {"@number": "26", "@name": "bNames", "@color": "7", "@fill": "1", "@visible": "yes", "@active": "yes"},
-                        {"@number": "27", "@name": "tValues", "@color": "7", "@fill": "1", "@visible": "yes", "@active": "yes"},
-                        {"@number": "28", "@name": "bValues", "@color": "7", "@fill": "1", "@visible": "yes", "@active": "yes"},
-                        {"@number": "29", "@name": "tStop", "@color": "7", "@fill": "3", "@visible": "no", "@active": "yes"},
-                        {"@number": "30", "@name": "bStop", "@color": "7", "@fill": "6", "@visible": "no", "@active": "yes"},
-                        {"@number": "31", "@name": "tCream", "@color": "7", "@fill": "4", "@visible": "no", "@active": "yes"},
-                        {"@number": "32", "@name": "bCream", "@color": "7", "@fill": "5", "@visible": "no", "@active": "yes"},
-                        {"@number": "33", "@name": "tFinish", "@color": "6", "@fill": "3", "@visible": "no", "@active": "yes"},
-                        {"@number": "34", "@name": "bFinish", "@color": "6", "@fill": "6", "@visible": "no", "@active": "yes"},
-                        {"@number": "35", "@name": "tGlue", "@color": "7", "@fill": "4", "@visible": "no", "@active": "yes"},
-                        {"@number": "36", "@name": "bGlue", "@color": "7", "@fill": "5", "@visible": "no", "@active": "yes"},
-                        {"@number": "37", "@name": "tTest", "@color": "7", "@fill": "1", "@visible": "no", "@active": "yes"},
-                        {"@number": "38", "@name": "bTest", "@color": "7", "@fill": "1", "@visible": "no", "@active": "yes"},
-                        {"@number": "39", "@name": "tKeepout", "@color": "4", "@fill": "11", "@visible": "yes", "@active": "yes"},
-                        {"@number": "40", "@name": "bKeepout", "@color": "1", "@fill": "11", "@visible": "yes", "@active": "yes"},
-                        {"@number": "41", "@name": "tRestrict", "@color": "4", "@fill": "10", "@visible": "yes", "@active": "yes"},
-                        {"@number": "42", "@name": "bRestrict", "@color": "1", "@fill": "10", "@visible": "yes", "@active": "yes"},
-                        {"@number": "43", "@name": "vRestrict", "@color": "2", "@fill": "10", "@visible": "yes", "@active": "yes"},
-                        {"@number": "44", "@name": "Drills", "@color": "7", "@fill": "1", "@visible": "no", "@active": "yes"},
-                        {"@number": "45", "@name": "Holes", "@color": "7", "@fill": "1", "@visible": "no", "@active": "yes"},
-                        {"@number": "46", "@name": "Milling", "@color": "3", "@fill": "1", "@visible": "no", "@active": "yes"},
-                        {"@number": "47", "@name": "Measures", "@color": "7", "@fill": "1", "@visible": "no", "@active": "yes"},
-                        {"@number": "48", "@name": "Document", "@color": "7", "@fill": "1", "@visible": "yes", "@active": "yes"},
-                        {"@number": "49", "@name": "Reference", "@color": "7", "@fill": "1", "@visible": "yes", "@active": "yes"},
-                        {"@number": "51", "@name": "tDocu", "@color": "7", "@fill": "1", "@visible": "yes", "@active": "yes"},
-                        {"@number": "52", "@name": "bDocu", "@color": "7", "@fill": "1", "@visible": "yes", "@active": "yes"},
-                        {"@number": "88", "@name": "SimResults", "@color": "9", "@fill": "1", "@visible": "yes", "@active": "yes"},
-                        {"@number": "89", "@name": "SimProbes", "@color": "9", "@fill": "1", "@visible": "yes", "@active": "yes"},
-                        {"@number": "90", "@name": "Modules", "@color": "5", "@fill": "1", "@visible": "yes", "@active": "yes"},
-                        {"@number": "91", "@name": "Nets", "@color": "2", "@fill": "1", "@visible": "yes", "@active": "yes"},
-                        {"@number": "92", "@name": "Busses", "@color": "1", "@fill": "1", "@visible": "yes", "@active": "yes"},
-                        {"@number": "93", "@name": "Pins", "@color": "2", "@fill": "1", "@visible": "yes", "@active": "yes"},
-                        {"@number": "94", "@name": "Symbols", "@color": "4", "@fill": "1", "@visible": "yes", "@active": "yes"},
-                        {"@number": "95", "@name": "Names", "@color": "7", "@fill": "1", "@visible": "yes", "@active": "yes"},
-                        {"@number": "96", "@name": "Values", "@color": "7", "@fill": "1", "@visible": "yes", "@active": "yes"},
-                        {"@number": "97", "@name": "Info", "@color": "7", "@fill": "1", "@visible": "yes", "@active": "yes"},
-                        {"@number": "98", "@name": "Guide", "@color": "6", "@fill": "1", "@visible": "yes", "@active": "yes"}
+def groupConnects(pins, pads):
+    """
+    Groups pins and pads that have the same name once the * added to
+    duplicates is stripped. Returns a list of (pins, pads) with one entry per
+    name, in the order the name first shows up in pins, and the pads whose
+    name no pin has.
+    """
+    pinGroups = {}
+    for pin in pins:
+        pinGroups.setdefault(pin.rstrip("*"), []).append(pin)
+    padGroups = {}
+    for pad in pads:
+        padGroups.setdefault(pad.rstrip("*"), []).append(pad)
+    connects = [(connectPin, padGroups.pop(name, [])) for name, connectPin in pinGroups.items()]
+    unusedPads = [pad for pad in pads if pad.rstrip("*") in padGroups]
+    return connects, unusedPads
+
+def devicesetDict(partName, partNumb, devicesetName, symbolName, packageName, pins, pads, footprintName=None):
+    """
+    Builds the deviceset of a part connecting its symbol's pins to the
+    package's pads. The EasyEDA footprint name, when known, is kept in a
+    FOOTPRINT attribute so partIndex can find it in the library.
+    Returns (devicesetDict, unusedPads).
+    """
+    componentDict = {
+        "@name": devicesetName,
+        "gates": {
+            "gate": [
+                {
+                    "@name": partNumb,
+                    "@symbol": symbolName,
+                    "@x": 0,
+                    "@y": 0
+                }
+            ]
+        },
+        "devices": {
+            "device": {
+                "@name": partName,
+                "@package": packageName,
+                "connects": {
+                    "connect": [
+                        #{
+                        #    "@gate": partNum,
+                        #    "@pin": "P$1",
+                        #    "@pad": "P$1"
+                        #}
                     ]
                 },
-                "library": {
-                    "symbols": {
-                        "symbol": []
-                    },
-                    "packages": {
-                        "package": []
-                    },
-                    "devicesets": {
-                        "deviceset": []
+                "technologies": {
+                    "technology": {
+                        "@name": "",
+                        "attribute": [
+                            {
+                                "@name": "POPULATE",
+                                "@value": "YES",
+                                "@constant": "no"
+                            },
+                            {
+                                "@name": "LCSC_PART",
+                                "@value": partNumb,
+                                "@constant": "yes"
+                            }
+                        ]
                     }
                 }
             }
-
         }
     }
 
+    if footprintName:
+        componentDict["devices"]["device"]["technologies"]["technology"]["attribute"].append({
+            "@name": "FOOTPRINT",
+            "@value": footprintName,
+            "@constant": "yes"
+        })
+
+    connects, unusedPads = groupConnects(pins, pads)
+    for connectPin, connectPad in connects:
+        if len(connectPin) > 0 and len(connectPad) > 0:
+            logger.debug("CONNECTING PINS %s WITH PADS %s", connectPin, connectPad)
+            componentDict["devices"]["device"]["connects"]["connect"].append({
+                "@gate": partNumb,
+                "@pin": " ".join(connectPin),
+                "@pad": " ".join(connectPad)
+            })
+        else:
+            logger.debug("CONNECT TERMINATED FOR PINS %s WITH PADS %s", connectPin, connectPad)
+    return componentDict, unusedPads
+
+def convertPartToXML(partData, writer, metaDict, symbolDeduplicator, packageDeduplicator, devicesetNames, keepMetaData=True, sourceKeys=None, shapes=(None, None), metrics=None, fragments=None):
+    """
+    Converts one part, writes its symbol, package and deviceset and returns
+    its partIndex record. sourceKeys and shapes can be passed in when the part
+    was already hashed and converted elsewhere, see convertInParallel. With
+    fragments, a fragmentCache.FragmentCache, a deviceset rendered in an
+    earlier run is reused when the part's symbol and footprint data did not
+    change.
+    """
+    partInfo, partSymbolPhrased, partFootprintPhrased, partName, partNumb = extractData(partData)
+    logger.debug("##### Creating XML for Part %s #####", partName)
+    symbolKey, footprintKey = sourceKeys or (payloadHash(partSymbolPhrased), payloadHash(partFootprintPhrased))
+    symbolShape, footprintShape = shapes
+
     #####
 
-    metaDict = {
+    logger.debug("##### Creating Symbol for Part %s #####", partName)
 
-    }
+    symbolName, pins, isNew = symbolDeduplicator.add(symbolKey, partName, lambda: symbolShape or convertSymbol(partData, metrics), writer)
+    if not isNew:
+        logger.debug("##### Reusing Symbol %s for Part %s #####", symbolName, partName)
 
     #####
 
-    for partData in partDataList:
-        partInfo, partSymbolPhrased, partFootprintPhrased, partName, partNumb = extractData(partData)
-        print(f"##### Creating XML for Part {partName} #####")
-
-        unit = "mm"
-        for item in partFootprintPhrased:
-            if item["ITEM"][0] == "CANVAS":
-                unit = item["ITEM"][3]
-                break
-
-        #####
-
-        print(f"##### Creating Symbol for Part {partName} #####")
-
-        symbolDict = {
-            "@name": partName,
-            "wire": [], #Init Arrays for Types
-            "rectangle": [],
-            "circle": [],
-            "pin": [],
-            "pad": [],
-            "smd": [],
-            "polygon": [],
-            "text": []
-        }
-        isSymbol = True
-        for item in partSymbolPhrased: #Fusion Electronics/EAGLE imports using millimeters as units no matter what.
+    logger.debug("##### Creating Footprint for Part %s #####", partName)
+
+    packageName, pads, isNew = packageDeduplicator.add(footprintKey, partName, lambda: footprintShape or convertFootprint(partData, metrics), writer)
+    if not isNew:
+        logger.debug("##### Reusing Footprint %s for Part %s #####", packageName, partName)
+
+    metaDict.setdefault(partNumb, {}).setdefault("SYMBOL", {})["PINS"] = pins
+    metaDict[partNumb].setdefault("FOOTPRINT", {})["PADS"] = pads
+
+    #####
+
+    logger.debug("##### Creating Component for Part %s #####", partName)
+
+    footprintName = partData.get("footprintName")
+    devicesetName = uniqueName(partName, devicesetNames)
+    if fragments is None:
+        componentDict, unusedPads = devicesetDict(partName, partNumb, devicesetName, symbolName, packageName, pins, pads, footprintName)
+        writer.writeDeviceset(componentDict)
+    else:
+        devicesetKey = payloadHash([symbolKey.hex(), footprintKey.hex(), partName, partNumb, footprintName])
+        entry = fragments.get("deviceset", devicesetKey)
+        if entry is None:
+            componentDict, unusedPads = devicesetDict(partName, partNumb, *fragmentCache.PLACEHOLDERS, pins, pads, footprintName) #Rendered with the placeholders as names
+            entry = {"fragment": writer.render("deviceset", componentDict), "unusedPads": unusedPads}
+            fragments.set("deviceset", devicesetKey, entry)
+        writer.writeRendered("deviceset", fragmentCache.fillPlaceholders(entry["fragment"], {"name": devicesetName, "symbol": symbolName, "package": packageName}))
+        unusedPads = entry["unusedPads"]
+    metaDict[partNumb]["SYMBOL"]["PINS"] = [] #Every pin was used up
+    metaDict[partNumb]["FOOTPRINT"]["PADS"] = unusedPads
+    if not keepMetaData:
+        del metaDict[partNumb] #Only kept when it will be saved, so memory does not grow with the number of parts
+
+    logger.debug("##### Finished Creating XML for Part %s #####", partName)
+    return partIndex.indexRecord(partNumb, partName, devicesetName, symbolName, packageName, footprintName, len(pins), len(pads))
+
+def convertInParallel(partDataList, symbolDeduplicator, packageDeduplicator, processes, metrics=None, isolate=False):
+    """
+    Converts parts on a process pool and yields (partData, sourceKeys, shapes)
+    in input order. Symbols and footprints whose source data was already
+    converted, or is being converted for an earlier part, are not sent again.
+    At most a few parts per process are in flight at a time. The timings of
+    the workers are merged into metrics. With isolate set a part that fails
+    to convert is yielded with a batchJob.PartFailure in place of its shapes.
+    """
+    from concurrent.futures import ProcessPoolExecutor #Importing it loads multiprocessing, so only when it is used
+    window = processes * 4
+    pending = deque()
+    pendingKeys = set()
+    with ProcessPoolExecutor(max_workers=processes) as executor:
+        def finish():
+            partData, sourceKeys, future = pending.popleft()
+            if future is None:
+                return partData, sourceKeys, (None, None)
             try:
-                symbolDict, metaDict = convertPhrasedToXML(item, symbolDict, partNumb, metaDict)
-            except:
-                print(f"Error thrown due to {item}")
-                raise
+                shapes, snapshot = future.result()
+            except Exception as e:
+                if not isolate:
+                    raise
+                return partData, sourceKeys, batchJob.PartFailure("convert", e)
+            if metrics is not None:
+                metrics.merge(snapshot)
+            return partData, sourceKeys, shapes
+
+        for partData in partDataList:
+            symbolKey, footprintKey = payloadHash(partData["partSymbolPhrased"]), payloadHash(partData["partFootprintPhrased"])
+            withSymbol = ("symbol", symbolKey) not in pendingKeys and symbolDeduplicator.needsConversion(symbolKey)
+            withFootprint = ("footprint", footprintKey) not in pendingKeys and packageDeduplicator.needsConversion(footprintKey)
+            pendingKeys.update((("symbol", symbolKey), ("footprint", footprintKey)))
+            future = executor.submit(convertPartShapesMeasured, partData, withSymbol, withFootprint) if withSymbol or withFootprint else None
+            pending.append((partData, (symbolKey, footprintKey), future))
+            while len(pending) >= window:
+                finished = finish()
+                yield finished
+                pendingKeys.difference_update((("symbol", finished[1][0]), ("footprint", finished[1][1]))) #Now in the deduplicators
+        while pending:
+            yield finish()
+
+def convertMissingShapes(partData, sourceKeys, shapes, symbolDeduplicator, packageDeduplicator, metrics):
+    #Converts what convertPartToXML would still have to, so a part that fails does so before any of it is written
+    symbolShape, footprintShape = shapes
+    if symbolShape is None and symbolDeduplicator.needsConversion(sourceKeys[0]):
+        symbolShape = convertSymbol(partData, metrics)
+    if footprintShape is None and packageDeduplicator.needsConversion(sourceKeys[1]):
+        footprintShape = convertFootprint(partData, metrics)
+    return symbolShape, footprintShape
+
+def createXML(partDataList, saveMetaDict=False, stats=None, output=None, processes=1, metrics=None, failures=None, fragments=None, indexRecords=None):
+    """
+    Converts the parts and writes them as an EAGLE library.
 
-        xmlContent["eagle"]["drawing"]["library"]["symbols"]["symbol"].append(symbolDict)
+    Each part is written out as soon as it is converted, so partDataList can be
+    a generator and memory use does not grow with the number of parts. With
+    output set to a path or text file the library is written there and None is
+    returned, otherwise the library is returned as a string.
 
-        #####
+    With processes above 1 parts are converted on that many worker processes.
+    The output is the same as converting them one after another.
 
-        print(f"##### Creating Footprint for Part {partName} #####")
+    Times and counts per stage and element type are added to metrics, a
+    runMetrics.RunMetrics, and also returned in stats["metrics"].
 
-        footprintDict = {
-            "@name": partName,
-            "wire": [], #Init Arrays for Types
-            "rectangle": [],
-            "circle": [],
-            "pin": [],
-            "pad": [],
-            "smd": [],
-            "polygon": [],
-            "text": []
-        }
-        isSymbol = False
-        for item in partFootprintPhrased: #Fusion Electronics/EAGLE imports using millimeters as units no matter what.
+    With failures set to a list a part that fails to convert is left out of
+    the library and reported there as a batchJob.PartFailure.toDict, instead
+    of the error ending the whole library.
+
+    With fragments, a fragmentCache.FragmentCache, parts converted in an
+    earlier run are written from it and only parts whose symbol or footprint
+    data or the converter changed are converted again. The counts of reused
+    and rebuilt parts are returned in stats["fragments"].
+
+    With indexRecords, a partIndex.RecordCollector, the part index record of
+    every part written is added to it, to be stored once the library is written.
+    """
+    xmlStartTime = time.perf_counter()
+    logger.debug("##### Initilizing XML Creation #####")
+    if metrics is None:
+        metrics = runMetrics.RunMetrics()
+    metrics.startPhase("convert", len(partDataList) if hasattr(partDataList, "__len__") else None)
+
+    #####
+
+    stringOutput = io.StringIO() if output is None else None
+    writer = libraryWriter.LibraryWriter(output if output is not None else stringOutput, metrics=metrics)
+
+    #####
+
+    metaDict = {
+
+    }
+
+    symbolDeduplicator = ShapeDeduplicator("symbol", fragments)
+    packageDeduplicator = ShapeDeduplicator("package", fragments)
+    devicesetNames = set()
+
+    def writePart(partData, sourceKeys=None, shapes=(None, None)):
+        if failures is not None:
             try:
-                footprintDict, metaDict = convertPhrasedToXML(item, footprintDict, partNumb, metaDict)
-            except:
-                print(f"Error thrown due to {item}")
-                raise
-        xmlContent["eagle"]["drawing"]["library"]["packages"]["package"].append(footprintDict)
-
-        #####
-
-        print(f"##### Creating Component for Part {partName} #####")
-
-        componentDict = {
-            "@name": partName,
-            "gates": {
-                "gate": [
-                    {
-                        "@name": partNumb,
-                        "@symbol": partName,
-                        "@x": 0,
-                        "@y": 0
-                    }
-                ]
-            },
-            "devices": {
-                "device": {
-                    "@name": partName,
-                    "@package": partName,
-                    "connects": {
-                        "connect": [
-                            #{
-                            #    "@gate": partNum,
-                            #    "@pin": "P$1",
-                            #    "@pad": "P$1"
-                            #}
-                        ]
-                    },
-                    "technologies": {
-                        "technology": {
-                            "@name": "",
-                            "attribute": [
-                                {
-                                    "@name": "POPULATE",
-                                    "@value": "YES",
-                                    "@constant": "no"
-                                },
-                                {
-                                    "@name": "LCSC_PART",
-                                    "@value": partNumb,
-                                    "@constant": "yes"
-                                }
-                            ]
-                        }
-                    }
-                }
-            }
-        }
+                if isinstance(shapes, batchJob.PartFailure):
+                    raise shapes
+                sourceKeys = sourceKeys or (payloadHash(partData["partSymbolPhrased"]), payloadHash(partData["partFootprintPhrased"]))
+                shapes = convertMissingShapes(partData, sourceKeys, shapes, symbolDeduplicator, packageDeduplicator, metrics)
+            except Exception as e:
+                failure = e if isinstance(e, batchJob.PartFailure) else batchJob.PartFailure("convert", e)
+                failures.append(failure.toDict(partData.get("partNumb")))
+                logger.warning("##### Skipping Part %s: %s #####", partData.get("partNumb"), failure)
+                return
+        record = convertPartToXML(partData, writer, metaDict, symbolDeduplicator, packageDeduplicator, devicesetNames, keepMetaData=saveMetaDict, sourceKeys=sourceKeys, shapes=shapes, metrics=metrics, fragments=fragments)
+        if indexRecords is not None:
+            indexRecords.add(record)
+        metrics.partDone()
 
-        while len(metaDict[partNumb]["SYMBOL"]["PINS"]) > 0:
-            findPin = metaDict[partNumb]["SYMBOL"]["PINS"].pop(0)
-            connectPin = [findPin]
-
-            for pin in metaDict[partNumb]["SYMBOL"]["PINS"].copy():
-                if pin.rstrip("*") == findPin.rstrip("*"):
-                    metaDict[partNumb]["SYMBOL"]["PINS"].remove(pin)
-                    connectPin.append(pin)
-
-            connectPad = []
-
-            for pad in metaDict[partNumb]["FOOTPRINT"]["PADS"].copy():
-                if pad.rstrip("*") == findPin.rstrip("*"):
-                    metaDict[partNumb]["FOOTPRINT"]["PADS"].remove(pad)
-                    connectPad.append(pad)
-            
-            if len(connectPin) > 0 and len(connectPad) > 0:
-                print(f"CONNECTING PINS {connectPin} WITH PADS {connectPad}")
-                componentDict["devices"]["device"]["connects"]["connect"].append({
-                    "@gate": partNumb,
-                    "@pin": " ".join(connectPin),
-                    "@pad": " ".join(connectPad)
-                })
-            else:
-                print(f"CONNECT TERMINATED FOR PINS {connectPin} WITH PADS {connectPad}")
-        xmlContent["eagle"]["drawing"]["library"]["devicesets"]["deviceset"].append(componentDict)
+    #####
 
-        print(f"##### Finished Creating XML for Part {partName} #####")
-    
-    print(f"##### Finished XML Creation with total time of {time.time() - xmlStartTime}s #####")
+    try:
+        if processes > 1:
+            for partData, sourceKeys, shapes in convertInParallel(partDataList, symbolDeduplicator, packageDeduplicator, processes, metrics, isolate=failures is not None):
+                writePart(partData, sourceKeys, shapes)
+        else:
+            for partData in partDataList:
+                writePart(partData)
+    except:
+        writer.abort()
+        metrics.finish()
+        raise
+    finally:
+        if fragments is not None:
+            fragments.flush()
+    writer.close()
+    metrics.finish()
+
+    logger.info("##### Finished XML Creation with total time of %.3fs #####", time.perf_counter() - xmlStartTime)
+
+    dedupReport = {"symbols": symbolDeduplicator.stats, "packages": packageDeduplicator.stats}
+    dedupReport["bytesSaved"] = symbolDeduplicator.stats["bytesSaved"] + packageDeduplicator.stats["bytesSaved"]
+    dedupReport["msSaved"] = round(symbolDeduplicator.stats["msSaved"] + packageDeduplicator.stats["msSaved"], 3)
+    logger.info("##### Deduplicated %d Symbols and %d Footprints, saving %d bytes and %sms #####", symbolDeduplicator.stats["duplicates"], packageDeduplicator.stats["duplicates"], dedupReport["bytesSaved"], dedupReport["msSaved"])
+    counters = metrics.report()["counters"]
+    if counters.get("elementsRemoved") or counters.get("verticesRemoved"):
+        logger.info("##### Minimized Geometry, removing %d Elements and %d Vertices, %d bytes #####", counters["elementsRemoved"], counters["verticesRemoved"], counters["bytesRemoved"])
+    if fragments is not None:
+        fragmentReport = fragments.report()
+        logger.info("##### Reused %d Converted Parts and Rebuilt %d #####", fragmentReport["partsReused"], fragmentReport["partsRebuilt"])
+    if stats is not None:
+        stats["dedup"] = dedupReport
+        stats["metrics"] = metrics.report()
+        if fragments is not None:
+            stats["fragments"] = fragmentReport
 
     if saveMetaDict:
         with open("./metaDict.json", "w", encoding="utf-8") as file:
             file.write(json.dumps(metaDict, indent=2))
 
-    return xmlInitial + xmltodict.unparse(xmlContent, pretty=True, full_document=False)
+    if stringOutput is not None:
+        return stringOutput.getvalue()
+
+def openPartIndex():
+    #The part index beside api.cache, or None when it can not be opened. It is optional, so the run carries on without it
+    try:
+        return partIndex.besideCache(api.cache)
+    except partIndex.Error as e:
+        logger.warning("##### Part Index Not Updated: %s #####", e)
+        return None
+
+def updatePartIndex(update, *args):
+    #Runs one update of the part index, a locked or broken index only costs a warning
+    try:
+        update(*args)
+    except partIndex.Error as e:
+        logger.warning("##### Part Index Not Updated: %s #####", e)
+
+def writeShard(partDataList, path, fragments=None, isolate=False, indexed=False):
+    #Writes one shard, in a worker process when shards are written in parallel, see createShardedLibrary
+    metrics = runMetrics.RunMetrics()
+    stats = {}
+    failures = [] if isolate else None
+    records = partIndex.RecordCollector() if indexed else None
+    createXML(partDataList, stats=stats, output=path, metrics=metrics, failures=failures, fragments=fragments, indexRecords=records)
+    return {
+        "records": records,
+        "failures": failures or [],
+        "metrics": metrics.snapshot(),
+        "dedup": stats["dedup"],
+        "bytes": os.path.getsize(path),
+        "fragments": (fragments.pending, fragments.stats) if fragments is not None and fragments.deferWrites else None
+    }
+
+def createShardedLibrary(partDataList, outputDir, shardBy="package", processes=1, onlyShards=None, stats=None, metrics=None, failures=None, fragments=None, searchIndex=None):
+    """
+    Writes the parts as several libraries in outputDir, one per shard, along
+    with a manifest.json mapping every LCSC code to its shard.
+
+    shardBy is "code", "name" or "package", see libraryShards, or a function
+    taking a partData and returning its shard. Shards are written on up to
+    `processes` worker processes and each shard file is replaced on its own.
+    With onlyShards only those shards are written, from the parts of
+    partDataList that belong to them, and every other shard is left as it is.
+    Otherwise shards that no longer have any parts are removed.
+
+    failures, fragments and metrics work like in createXML. With searchIndex,
+    a partIndex.PartIndex, the parts of every shard written replace what the
+    index held for that shard. Returns the manifest.
+    """
+    startTime = time.perf_counter()
+    keyFunction = libraryShards.shardKeyFunction(shardBy)
+    shardByName = shardBy if isinstance(shardBy, str) else getattr(shardBy, "__name__", repr(shardBy))
+    if metrics is None:
+        metrics = runMetrics.RunMetrics()
+    os.makedirs(outputDir, exist_ok=True)
+    manifest = libraryShards.readManifest(outputDir)
+    if onlyShards is not None:
+        onlyShards = set(onlyShards)
+        if manifest is not None and manifest["shardBy"] != shardByName:
+            raise ValueError(f"{outputDir} is sharded by {manifest['shardBy']}, not {shardByName}")
+
+    shards = libraryShards.groupByShard(partDataList, keyFunction)
+    if onlyShards is not None:
+        shards = {shard: shardParts for shard, shardParts in shards.items() if shard in onlyShards}
+    fileNames = {shard: libraryShards.shardFileName(shard) for shard in shards}
+    if len(set(fileNames.values())) < len(fileNames):
+        raise ValueError("Two shards would be written to the same file, shard keys may only differ in letters, digits, - and _")
+
+    #####
+
+    written = {}
+    dedupReports = {}
+    def finished(shard, result):
+        failedCodes = set(failure["partNum"] for failure in result["failures"])
+        codes = [partData["partNumb"] for partData in shards[shard] if partData["partNumb"] not in failedCodes]
+        written[shard] = {"file": fileNames[shard], "codes": codes, "bytes": result["bytes"]}
+        dedupReports[shard] = result["dedup"]
+        metrics.merge(result["metrics"])
+        metrics.partDone(len(codes))
+        if failures is not None:
+            failures.extend(result["failures"])
+        if result["fragments"] is not None:
+            fragments.merge(*result["fragments"])
+        if searchIndex is not None:
+            updatePartIndex(searchIndex.replaceLibrary, os.path.join(outputDir, fileNames[shard]), result["records"], shard)
+
+    metrics.startPhase("convert", sum(len(shardParts) for shardParts in shards.values()))
+    try:
+        if processes > 1 and len(shards) > 1:
+            from concurrent.futures import ProcessPoolExecutor, as_completed
+            workerFragments = fragments.deferred() if fragments is not None else None
+            with ProcessPoolExecutor(max_workers=min(processes, len(shards))) as executor:
+                futures = {}
+                for shard, shardParts in sorted(shards.items(), key=lambda item: -len(item[1])): #Biggest first so no process is left with a big one at the end
+                    futures[executor.submit(writeShard, shardParts, os.path.join(outputDir, fileNames[shard]), workerFragments, failures is not None, searchIndex is not None)] = shard
+                for future in as_completed(futures):
+                    finished(futures[future], future.result())
+        else:
+            for shard, shardParts in shards.items():
+                finished(shard, writeShard(shardParts, os.path.join(outputDir, fileNames[shard]), fragments, failures is not None, searchIndex is not None))
+    finally:
+        metrics.finish()
+        if fragments is not None:
+            fragments.flush()
+
+    #####
 
-def convertSinglePartToEagle(partNum, savePartData=False, saveMetaDict=False):
+    manifest, dropped = libraryShards.updateManifest(manifest, shardByName, written, onlyShards)
+    libraryShards.writeManifest(outputDir, manifest)
+    for fileName in set(dropped) - set(fileNames.values()):
+        try:
+            os.remove(os.path.join(outputDir, fileName))
+        except FileNotFoundError:
+            pass
+        if searchIndex is not None:
+            updatePartIndex(searchIndex.removeLibrary, os.path.join(outputDir, fileName))
+    logger.info("##### Wrote %d Shards with %d Parts to %s in %.3fs #####", len(written), sum(len(entry["codes"]) for entry in written.values()), outputDir, time.perf_counter() - startTime)
+
+    if stats is not None:
+        stats["dedup"] = dedupReports
+        stats["metrics"] = metrics.report()
+        if fragments is not None:
+            stats["fragments"] = fragments.report()
+    return manifest
+
+def convertSinglePartToEagle(partNum, savePartData=False, saveMetaDict=False, outputPath="./library.lbr", saveXml=False):
     partInfo = api.partNumToIds(partNum)
-    partSymbol = api.partInfoToSymbol(partInfo)
+    partSymbol, partName = api.partInfoToSymbolAndName(partInfo)
     partSymbolPhrased = parsePartData(partSymbol)
     partFootprint = api.partInfoToFootprint(partInfo)
     partFootprintPhrased = parsePartData(partFootprint)
-    partName = api.partInfoToName(partInfo).replace(" ", "-")
+    partName = partName.replace(" ", "-")
     partNumb = partInfo["product_code"]
+    api.finishBatch()
+    logger.info("##### Cache Stats: %s #####", api.cacheStats())
 
     if savePartData:
         with open("./partInfo.json", "w", encoding="utf-8") as file:
@@ -754,7 +1443,7 @@ def convertSinglePartToEagle(partNum, savePartData=False, saveMetaDict=False):
         with open("./partFootprint.json", "w", encoding="utf-8") as file:
             file.write(json.dumps(partFootprint, indent=2))
 
-    xmlLibrary = createXML([
+    createXML([
         {
             "partInfo": partInfo,
             "partSymbolPhrased": partSymbolPhrased,
@@ -762,42 +1451,383 @@ def convertSinglePartToEagle(partNum, savePartData=False, saveMetaDict=False):
             "partName": partName,
             "partNumb": partNumb
          }
-    ], saveMetaDict=saveMetaDict)
-
-    with open("./library.xml", "w", encoding="utf-8") as file:
-        file.write(xmlLibrary)
-    with open("./library.lbr", "w", encoding="utf-8") as file:
-        file.write(xmlLibrary)
-
-def convertMultiplePartsToEagle(partNums, saveMetaDict=False):
-    requestStartTime = time.time()
-    partInfos = []
-    for partNum in partNums:
-        print(f"##### Requesting Info {partNum} #####")
-        partInfo = api.partNumToIds(partNum)
-        partSymbol = api.partInfoToSymbol(partInfo)
-        partSymbolPhrased = parsePartData(partSymbol)
-        partFootprint = api.partInfoToFootprint(partInfo)
-        partFootprintPhrased = parsePartData(partFootprint)
-        partName = api.partInfoToName(partInfo).replace(" ", "-")
-        partNumb = partInfo["product_code"]
-        print(f"""Part Name: {partName}
-Part Number: {partNumb}""")
-        partInfos.append(
-            {
-                "partInfo": partInfo,
-                "partSymbolPhrased": partSymbolPhrased,
-                "partFootprintPhrased": partFootprintPhrased,
-                "partName": partName,
-                "partNumb": partNumb
-            }
-        )
+    ], saveMetaDict=saveMetaDict, output=outputPath)
+
+    if saveXml:
+        shutil.copyfile(outputPath, os.path.splitext(outputPath)[0] + ".xml")
+
+def fetchPartData(partNum, partInfo=None, metrics=None):
+    logger.debug("##### Requesting Info %s #####", partNum)
+    if metrics is None:
+        metrics = runMetrics.RunMetrics()
+    if partInfo is None:
+        with metrics.timer("resolve"):
+            partInfo = api.partNumToIds(partNum)
+    with metrics.timer("fetch"):
+        symbolRows, partName = api.partInfoToSymbolRowsAndName(partInfo)
+        footprintRows, footprintName = api.partInfoToFootprintRowsAndName(partInfo)
+    with metrics.timer("decode", 2):
+        partSymbolPhrased = parsePartData(symbolRows) #Decoded and grouped in one pass
+        partFootprintPhrased = parsePartData(footprintRows)
+    partName = partName.replace(" ", "-")
+    partNumb = partInfo["product_code"]
+    logger.debug("Part Name: %s, Part Number: %s", partName, partNumb)
+    return {
+        "partInfo": partInfo,
+        "partSymbolPhrased": partSymbolPhrased,
+        "partFootprintPhrased": partFootprintPhrased,
+        "partName": partName,
+        "partNumb": partNumb,
+        "footprintName": footprintName
+    }
+
+def fetchMultipleParts(partNums, workers=8, metrics=None):
+    """
+    Fetches and parses every part using up to `workers` threads which share
+    the pooled session in api. Results are returned in the same order as partNums.
+
+    All part numbers are resolved up front with a few bulk searchByCodes
+    requests. Unknown part numbers are reported and left out of the result.
+    """
+    if metrics is None:
+        metrics = runMetrics.RunMetrics()
+    with metrics.timer("resolve", len(partNums)):
+        found, unknown = api.resolvePartNums(partNums, workers=workers)
+    if unknown:
+        logger.warning("##### Unknown LCSC Parts Skipped: %s #####", unknown)
+    partNums = [partNum for partNum in partNums if partNum in found]
+    partInfos = [found[partNum] for partNum in partNums]
+    metrics.startPhase("fetch", len(partNums))
+    partDataList = []
+    def collect(results):
+        for partData in results:
+            partDataList.append(partData)
+            metrics.advance()
+    try:
+        if workers <= 1:
+            collect(fetchPartData(partNum, partInfo, metrics) for partNum, partInfo in zip(partNums, partInfos))
+        else:
+            with ThreadPoolExecutor(max_workers=workers) as executor:
+                collect(executor.map(fetchPartData, partNums, partInfos, [metrics] * len(partNums)))
+    finally:
+        metrics.finish()
+    return partDataList
+
+class PartStream:
+    """
+    The parts of streamPartsResumable, which can be iterated once. len() is
+    the number of parts it yields when none fails to fetch, the total the
+    progress line counts towards.
+    """
+    def __init__(self, parts, length):
+        self.parts = parts
+        self.length = length
+
+    def __iter__(self):
+        return self.parts
 
-    print(f"##### Finished Requesting Info with total time of {time.time() - requestStartTime}s #####")
+    def __len__(self):
+        return self.length
 
-    xmlLibrary = createXML(partInfos, saveMetaDict=saveMetaDict)
+def streamPartsResumable(partNums, workers=8, retryPolicy=None, journal=None, metrics=None, failures=None, window=None):
+    """
+    Resolves partNums and returns (parts, unknown) where parts is a PartStream
+    that fetches and parses the parts on up to `workers` threads while the
+    caller converts and writes the ones before them. Parts are yielded in the
+    order of partNums and at most `window` parts (workers * 4 by default) are
+    fetched ahead of the caller, so memory stays flat however long the batch
+    is. unknown lists the codes EasyEDA does not know.
+
+    Resolving and fetching are retried under retryPolicy (a
+    batchJob.RetryPolicy) and a part that still fails is left out and added
+    to failures as a batchJob.PartFailure.toDict instead of ending the batch.
+    A searchByCodes batch that fails only fails the parts it asked for.
+    Parts whose data the journal (a batchJob.CheckpointJournal) already holds
+    are loaded from it, and every part fetched is saved to it.
+    """
+    retryPolicy = retryPolicy or batchJob.RetryPolicy()
+    if metrics is None:
+        metrics = runMetrics.RunMetrics()
+    if failures is None:
+        failures = []
+    window = window or max(1, workers) * 4
+    uniquePartNums = list(dict.fromkeys(partNums))
+    saved = set(partNum for partNum in uniquePartNums if journal is not None and journal.hasPartData(partNum))
+    if saved:
+        logger.info("##### Resuming, %d Parts Loaded from %s #####", len(saved), journal.jobDir)
+    toFetch = [partNum for partNum in uniquePartNums if partNum not in saved]
+    found, unknown = {}, []
+    if toFetch:
+        resolveFailures = {} #partNum -> error of its searchByCodes batch
+        try:
+            with metrics.timer("resolve", len(toFetch)):
+                found, unknown = retryPolicy.call("resolve", api.resolvePartNums, toFetch, None, workers, resolveFailures)
+            fail = [batchJob.PartFailure("resolve", error).toDict(partNum) for partNum, error in resolveFailures.items()]
+        except batchJob.PartFailure as failure:
+            fail = [failure.toDict(partNum) for partNum in toFetch]
+        failures.extend(fail)
+        if journal is not None:
+            for failureDict in fail:
+                journal.failed(failureDict)
+    if unknown:
+        logger.warning("##### Unknown LCSC Parts Skipped: %s #####", unknown)
+
+    def fetchOne(partNum):
+        if partNum in saved:
+            return journal.loadPartData(partNum)
+        try:
+            partData = retryPolicy.call("fetch", fetchPartData, partNum, found[partNum], metrics)
+        except batchJob.PartFailure as failure:
+            logger.warning("##### Failed to Fetch %s: %s #####", partNum, failure)
+            return failure
+        if journal is not None:
+            journal.savePartData(partData)
+        return partData
+
+    streamNums = [partNum for partNum in uniquePartNums if partNum in saved or partNum in found]
+    def parts():
+        remaining = {} #partNum -> times it is still to be yielded, for part numbers given more than once
+        for partNum in partNums:
+            remaining[partNum] = remaining.get(partNum, 0) + 1
+        kept = {} #partNum -> partData yielded before and given again later
+        pending = deque() #(partNum, Future) in the order of streamNums
+        nextIndex = 0
+        executor = ThreadPoolExecutor(max_workers=max(1, workers))
+        def fill():
+            nonlocal nextIndex
+            while nextIndex < len(streamNums) and len(pending) < window:
+                pending.append((streamNums[nextIndex], executor.submit(fetchOne, streamNums[nextIndex])))
+                nextIndex += 1
+        try:
+            for partNum in partNums:
+                fill()
+                if partNum in kept:
+                    result = kept[partNum]
+                elif pending and pending[0][0] == partNum:
+                    result = pending.popleft()[1].result()
+                    fill() #The fetch threads carry on with the parts after this one while it is converted
+                else:
+                    continue #Unknown, failed to resolve or failed to fetch at its first position
+                remaining[partNum] -= 1
+                if isinstance(result, batchJob.PartFailure):
+                    failureDict = result.toDict(partNum)
+                    failures.append(failureDict)
+                    if journal is not None:
+                        journal.failed(failureDict)
+                    remaining[partNum] = 0
+                    continue
+                if remaining[partNum]:
+                    kept[partNum] = result
+                else:
+                    kept.pop(partNum, None)
+                yield result
+        finally:
+            for _, future in pending:
+                future.cancel()
+            executor.shutdown()
+
+    streamSet = set(streamNums)
+    return PartStream(parts(), sum(1 for partNum in partNums if partNum in streamSet)), unknown
+
+def fetchMultiplePartsResumable(partNums, workers=8, retryPolicy=None, journal=None, metrics=None):
+    """
+    Fetches and parses every part like fetchMultipleParts, with the retries,
+    failure reporting and journal of streamPartsResumable.
+
+    Returns (partDataList, failures, unknown) where partDataList is in the
+    order of partNums, failures are batchJob.PartFailure.toDict and unknown
+    lists the codes EasyEDA does not know.
+    """
+    if metrics is None:
+        metrics = runMetrics.RunMetrics()
+    failures = []
+    parts, unknown = streamPartsResumable(partNums, workers, retryPolicy, journal, metrics, failures)
+    partDataList = []
+    metrics.startPhase("fetch", len(parts))
+    try:
+        for partData in parts:
+            partDataList.append(partData)
+            metrics.advance()
+    finally:
+        metrics.finish()
+    return partDataList, failures, unknown
+
+def convertMultiplePartsToEagle(partNums, saveMetaDict=False, workers=8, outputPath=None, saveXml=False, processes=1, reportPath=None, progress=None, retryPolicy=None, checkpoint=False, reuseFragments=True, shardBy=None, onlyShards=None, window=None, updateIndex=True):
+    """
+    Fetches partNums and writes them as a library to outputPath.
+
+    Parts are fetched on `workers` threads while the parts before them are
+    converted and written, with at most `window` parts fetched ahead, see
+    streamPartsResumable. The run takes about as long as the slower of
+    fetching and converting, and memory does not grow with the batch.
+    A sharded library is written in two phases instead, every part is
+    fetched before the first shard is written.
+
+    A part that fails to resolve, fetch or convert is retried under
+    retryPolicy (a batchJob.RetryPolicy, 3 attempts by default) and then left
+    out instead of ending the run. The library gets every good part and the
+    failures are written to <library>.failures.json. With checkpoint on,
+    progress and a copy of every fetched part are kept in the <library>.job
+    folder so rerunning with the same outputPath loads the parts fetched
+    before and only fetches the rest. The folder belongs to outputPath, not
+    to the list of parts, and is removed once every part made it into the
+    library.
+
+    With reuseFragments on, converted parts are kept in the fragments folder
+    of api.cache and parts whose data did not change since an earlier run
+    are not converted again, see createXML.
+
+    With updateIndex on, the parts written replace what the part index in
+    the folder of api.cache held for the library, see partIndex.
+
+    With shardBy set outputPath is a folder the library is written to in
+    shards, see createShardedLibrary, ./library by default and never a .lbr
+    path. onlyShards then limits writing to those shards. saveMetaDict and
+    saveXml only apply to a single library, written to ./library.lbr by
+    default.
+
+    With reportPath set a JSON run report with the time and count of every
+    stage and element type and the cache stats is written there. progress
+    shows a live progress line on stderr, by default when it is a terminal.
+
+    Returns the failure report as a dict.
+    """
+    if outputPath is None:
+        outputPath = "./library" if shardBy is not None else "./library.lbr"
+    elif shardBy is not None and outputPath.lower().endswith(".lbr"):
+        raise ValueError(f"A sharded library is written to a folder, {outputPath} is a library file")
+    metrics = runMetrics.RunMetrics(progress=progress)
+    basePath = os.path.splitext(outputPath)[0]
+    journal = batchJob.CheckpointJournal(basePath + ".job") if checkpoint else None
+    startTime = time.perf_counter()
+    stats = {}
+    failures = []
+    convertFailures = []
+    searchIndex = None
+    finished = False
+    try:
+        if shardBy is not None:
+            #Parts are grouped into shards before any shard is written, so they are all fetched first
+            parts, fetchFailures, unknown = fetchMultiplePartsResumable(partNums, workers=workers, retryPolicy=retryPolicy, journal=journal, metrics=metrics)
+            failures += fetchFailures
+        else:
+            #Parts are converted and written while the ones after them are still being fetched
+            parts, unknown = streamPartsResumable(partNums, workers=workers, retryPolicy=retryPolicy, journal=journal, metrics=metrics, failures=failures, window=window)
+        fragments = fragmentCache.besideCache(api.cache) if reuseFragments else None
+        searchIndex = openPartIndex() if updateIndex else None
+        if shardBy is not None:
+            createShardedLibrary(parts, outputPath, shardBy, processes=processes, onlyShards=onlyShards, stats=stats, metrics=metrics, failures=convertFailures, fragments=fragments, searchIndex=searchIndex)
+        else:
+            records = partIndex.RecordCollector() if searchIndex is not None else None
+            createXML(parts, saveMetaDict=saveMetaDict, stats=stats, output=outputPath, processes=processes, metrics=metrics, failures=convertFailures, fragments=fragments, indexRecords=records)
+            if searchIndex is not None:
+                updatePartIndex(searchIndex.replaceLibrary, outputPath, records)
+        finished = True
+    finally:
+        api.finishBatch()
+        if searchIndex is not None:
+            searchIndex.close()
+        if journal is not None:
+            for failure in convertFailures:
+                journal.failed(failure)
+            if not finished: #Parts that failed before the run ended are still recorded for the next run
+                journal.close()
+    failures += convertFailures
+
+    logger.info("##### Finished Fetching and Converting %d Parts with total time of %.3fs #####", metrics.parts, time.perf_counter() - startTime)
+    logger.info("##### Cache Stats: %s #####", api.cacheStats())
+
+    failureReport = {"parts": len(partNums), "written": metrics.parts, "failed": failures, "unknown": unknown}
+    failurePath = basePath + ".failures.json"
+    if failures or unknown:
+        with open(failurePath, "w", encoding="utf-8") as file:
+            json.dump(failureReport, file, indent=2)
+        logger.warning("##### %d Parts Failed and %d Are Unknown, see %s #####", len(failures), len(unknown), failurePath)
+    elif os.path.exists(failurePath):
+        os.remove(failurePath) #From an earlier run whose failures are now fixed
+    if journal is not None:
+        if failures:
+            journal.close()
+            logger.warning("##### Run again to retry the failed parts, finished parts are kept in %s #####", journal.jobDir)
+        else:
+            journal.remove()
+
+    if saveXml and shardBy is None:
+        shutil.copyfile(outputPath, os.path.splitext(outputPath)[0] + ".xml")
+    if reportPath is not None:
+        metrics.writeReport(reportPath, {"cache": api.cacheStats(), "dedup": stats["dedup"], "fragments": stats.get("fragments"), "failures": failureReport})
+    return failureReport
+
+def mergeIntoLibrary(partDataList, libraryPath="./library.lbr", removePartNums=(), saveMetaDict=False, index=None, searchIndex=None):
+    """
+    Adds, replaces or removes parts in an existing library without rebuilding it.
+
+    The library is indexed by the LCSC_PART attribute of its devicesets. Parts
+    in partDataList replace any deviceset with the same LCSC part number and
+    parts in removePartNums are dropped, along with symbols and packages no
+    other deviceset uses. Everything else is copied through as raw text and the
+    file is replaced atomically. A missing library is created with createXML.
+    With searchIndex, a partIndex.PartIndex, the added, replaced and removed
+    parts are updated in the part index.
+    """
+    mergeStartTime = time.perf_counter()
+    if index is None:
+        if not os.path.exists(libraryPath):
+            logger.info("##### No Library at %s, Creating it #####", libraryPath)
+            records = partIndex.RecordCollector() if searchIndex is not None else None
+            createXML(partDataList, saveMetaDict=saveMetaDict, output=libraryPath, indexRecords=records)
+            if searchIndex is not None:
+                updatePartIndex(searchIndex.replaceLibrary, libraryPath, records)
+            return
+        with open(libraryPath, "r", encoding="utf-8") as file:
+            index = libraryMerge.LibraryIndex(file.read())
+
+    partDataList = list(partDataList)
+    newPartNums = [partData["partNumb"] for partData in partDataList]
+    removal = libraryMerge.planRemoval(index, set(removePartNums) | set(newPartNums))
+
+    collector = libraryMerge.FragmentCollector()
+    metaDict = {}
+    symbolDeduplicator = ShapeDeduplicator("symbol")
+    symbolDeduplicator.addExisting(libraryMerge.keptFragments(index, "symbols", removal))
+    packageDeduplicator = ShapeDeduplicator("package")
+    packageDeduplicator.addExisting(libraryMerge.keptFragments(index, "packages", removal))
+    devicesetNames = set(fragment.name for fragment in libraryMerge.keptFragments(index, "devicesets", removal))
+    records = [convertPartToXML(partData, collector, metaDict, symbolDeduplicator, packageDeduplicator, devicesetNames, keepMetaData=saveMetaDict) for partData in partDataList]
+
+    libraryMerge.writeMergedLibrary(libraryPath, index, removal, collector)
+    if searchIndex is not None:
+        updatePartIndex(searchIndex.updateParts, libraryPath, set(removePartNums) | set(newPartNums), records)
+
+    replaced = [partNum for partNum in newPartNums if partNum in index.byCode]
+    removed = [partNum for partNum in removePartNums if partNum in index.byCode and partNum not in newPartNums]
+    logger.info("##### Merged into %s: %d added, %d replaced, %d removed in %.3fs #####", libraryPath, len(newPartNums) - len(replaced), len(replaced), len(removed), time.perf_counter() - mergeStartTime)
 
-    with open("./library.xml", "w", encoding="utf-8") as file:
-        file.write(xmlLibrary)
-    with open("./library.lbr", "w", encoding="utf-8") as file:
-        file.write(xmlLibrary)
\ No newline at end of file
+    if saveMetaDict:
+        with open("./metaDict.json", "w", encoding="utf-8") as file:
+            file.write(json.dumps(metaDict, indent=2))
+
+def mergePartsIntoLibrary(partNums, libraryPath="./library.lbr", removePartNums=(), replaceExisting=True, saveMetaDict=False, workers=8, updateIndex=True):
+    """
+    Fetches partNums and merges them into the library at libraryPath, see mergeIntoLibrary.
+    With replaceExisting=False parts already in the library are not fetched again.
+    With updateIndex on the part index in the folder of api.cache is updated.
+    """
+    index = None
+    if os.path.exists(libraryPath):
+        with open(libraryPath, "r", encoding="utf-8") as file:
+            index = libraryMerge.LibraryIndex(file.read())
+        if not replaceExisting:
+            partNums = [partNum for partNum in partNums if partNum not in index.byCode]
+
+    try:
+        partInfos = fetchMultipleParts(partNums, workers=workers) if partNums else []
+    finally:
+        api.finishBatch()
+
+    searchIndex = openPartIndex() if updateIndex else None
+    try:
+        mergeIntoLibrary(partInfos, libraryPath, removePartNums=removePartNums, saveMetaDict=saveMetaDict, index=index, searchIndex=searchIndex)
+    finally:
+        if searchIndex is not None:
+            searchIndex.close()
@@ -0,0 +1,149 @@
+import hashlib
+import os
+import sys
+import threading
+
+import partCache
+
+#Converted symbols, packages and devicesets kept across runs as the text they are written as, so rebuilding a
+#library only converts parts whose EasyEDA data or the converter itself changed. Entries are keyed by the payload
+#hash of the source data together with a stamp of the converter source and its settings. Names depend on the other parts in the
+#library, so fragments are stored with placeholders that are filled in when the fragment is written.
+
+DAY = 24 * 60 * 60
+FORMAT_VERSION = "1" #Bump when the layout of an entry changes
+CONVERTER_MODULES = ("eagleConvert.py", "shapeRecords.py", "shapeMinimizer.py", "libraryWriter.py")
+TAGS = ("symbol", "package", "deviceset")
+#Module settings that change what a part is written as, (module, name, default)
+CONVERTER_SETTINGS = (("eagleConvert", "minimizeShapes", True),)
+
+#Names of parts, symbols and packages never contain spaces, so these never show up in a real name
+NAME_PLACEHOLDER = " name "
+SYMBOL_PLACEHOLDER = " symbol "
+PACKAGE_PLACEHOLDER = " package "
+PLACEHOLDERS = (NAME_PLACEHOLDER, SYMBOL_PLACEHOLDER, PACKAGE_PLACEHOLDER) #In the order devicesetDict takes the names
+#Attribute each placeholder is written to
+PLACEHOLDER_ATTRIBUTES = {"name": NAME_PLACEHOLDER, "symbol": SYMBOL_PLACEHOLDER, "package": PACKAGE_PLACEHOLDER}
+
+def converterVersion():
+    """
+    Hash of the source of the modules that decide what a part is written as.
+    Any change to them invalidates every fragment converted before.
+    """
+    digest = hashlib.sha1(FORMAT_VERSION.encode("utf-8"))
+    directory = os.path.dirname(os.path.abspath(__file__))
+    for fileName in CONVERTER_MODULES:
+        with open(os.path.join(directory, fileName), "rb") as file:
+            digest.update(file.read())
+    return digest.hexdigest()[:16]
+
+def settingsStamp():
+    """
+    The converter settings that differ from their default, read when a
+    fragment is looked up so changing a setting mid run is seen. Settings
+    left at their default add nothing, so fragments converted with the
+    defaults keep their keys.
+    """
+    stamp = ""
+    for module, name, default in CONVERTER_SETTINGS:
+        value = getattr(sys.modules[module], name, default) if module in sys.modules else default
+        if value != default:
+            stamp += f"+{name}={value!r}"
+    return stamp
+
+def fillPlaceholders(fragment, names):
+    #names is attribute -> name, see PLACEHOLDER_ATTRIBUTES. Only the first attribute of that name holding the placeholder is filled,
+    #the root element comes first so a shape's pins and pads keep their names
+    from xml.sax.saxutils import quoteattr #Same quoting xmltodict uses for attributes
+    for attribute, name in names.items():
+        fragment = fragment.replace(f"{attribute}={quoteattr(PLACEHOLDER_ATTRIBUTES[attribute])}", f"{attribute}={quoteattr(name)}", 1)
+    return fragment
+
+class FragmentCache:
+    """
+    Stores the rendered symbol, package and deviceset of converted parts.
+
+    Symbols and packages are keyed by the payload hash of their source data,
+    devicesets by the hashes of the part's symbol and footprint data along
+    with its name and LCSC code. Every key starts with the converter stamp
+    and the settingsStamp. stats counts per tag how many fragments were
+    reused and how many had to be rebuilt. Thread safe, the conversion
+    service shares one between its request threads.
+
+    :param cache: partCache.PartCache the fragments are kept in. Entries never
+                  go stale, only the least recently used are evicted.
+    :param version: Converter stamp, converterVersion() by default.
+    :param deferWrites: Only look entries up and collect new ones in pending
+                        instead of writing them, for worker processes that
+                        hand them back to the process owning the cache.
+    """
+    def __init__(self, cache, version=None, deferWrites=False):
+        self.cache = cache
+        self.version = version or converterVersion()
+        self.deferWrites = deferWrites
+        self.pending = [] #(cache key, entry) not written yet
+        self.stats = {tag: {"reused": 0, "rebuilt": 0} for tag in TAGS}
+        self.lock = threading.Lock() #Guards stats and pending, the cache has a lock of its own
+
+    def __getstate__(self):
+        #Sent to worker processes by createShardedLibrary, the copy gets a lock of its own
+        state = dict(self.__dict__)
+        del state["lock"]
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.lock = threading.Lock()
+
+    def count(self, tag, name, amount=1):
+        with self.lock:
+            self.stats[tag][name] += amount
+
+    def cacheKey(self, tag, sourceKey):
+        return f"{self.version}{settingsStamp()}/{tag}/{sourceKey.hex()}"
+
+    def has(self, tag, sourceKey):
+        return self.cache.enabled and self.cache.has("fragments", self.cacheKey(tag, sourceKey))
+
+    def get(self, tag, sourceKey):
+        if self.deferWrites:
+            found, entry = self.cache.peek("fragments", self.cacheKey(tag, sourceKey)) if self.cache.enabled else (False, None) #Leaves the index alone
+        else:
+            found, entry = self.cache.get("fragments", self.cacheKey(tag, sourceKey))
+        if found and entry is not None:
+            self.count(tag, "reused")
+            return entry
+        return None
+
+    def set(self, tag, sourceKey, entry):
+        self.count(tag, "rebuilt")
+        if self.deferWrites:
+            with self.lock:
+                self.pending.append((self.cacheKey(tag, sourceKey), entry)) #Keyed with the settings of the process that converted it
+        else:
+            self.cache.set("fragments", self.cacheKey(tag, sourceKey), entry, ttl=3650 * DAY, flush=False)
+
+    def flush(self):
+        if not self.deferWrites:
+            self.cache.flush()
+
+    def deferred(self):
+        #A copy for a worker process, see deferWrites
+        return FragmentCache(self.cache, self.version, deferWrites=True)
+
+    def merge(self, pending, stats):
+        #Takes over what a deferred copy collected
+        for key, entry in pending:
+            self.cache.set("fragments", key, entry, ttl=3650 * DAY, flush=False)
+        for tag, counts in stats.items():
+            for name, count in counts.items():
+                self.count(tag, name, count)
+
+    def report(self):
+        #Parts count as reused when their deviceset was, which needs their symbol and footprint data unchanged
+        with self.lock:
+            return {"partsReused": self.stats["deviceset"]["reused"], "partsRebuilt": self.stats["deviceset"]["rebuilt"], **{tag + "s": dict(counts) for tag, counts in self.stats.items()}}
+
+def besideCache(cache):
+    #A FragmentCache in the fragments folder of a download cache, switched on and off with it
+    return FragmentCache(partCache.PartCache(os.path.join(cache.cacheDir, "fragments"), maxBytes=cache.maxBytes, enabled=cache.enabled))
@@ -0,0 +1,213 @@
+import argparse
+import json
+import logging
+import os
+import sys
+import time
+
+#Command line entry point. Only the standard library is imported up front, the converter is imported by the
+#commands that need it and eagleConvert in turn only imports Shapely, NumPy and requests when a part needs them.
+#
+#   python lcscToEagle.py convert C1880271 C2934560 -o library.lbr
+#   python lcscToEagle.py convert -f parts.txt --merge
+#   python lcscToEagle.py cache check C1880271
+#   python lcscToEagle.py cache stats
+#   python lcscToEagle.py serve --port 8766
+#   python lcscToEagle.py index search "QFN-32"
+#   python lcscToEagle.py index rebuild library.lbr
+
+def readPartNums(args):
+    #Codes from the command line and from --file, which may separate them with whitespace, commas or newlines
+    partNums = list(args.partNums)
+    for path in args.file or ():
+        with (sys.stdin if path == "-" else open(path, encoding="utf-8")) as file:
+            for line in file:
+                line = line.split("#", 1)[0]
+                partNums += [code for code in line.replace(",", " ").split() if code]
+    return list(dict.fromkeys(code.upper() for code in partNums))
+
+def useCache(args):
+    import api
+    import partCache
+    if args.cache_dir is not None:
+        api.cache = partCache.PartCache(args.cache_dir)
+    if getattr(args, "no_cache", False):
+        api.cache.enabled = False
+    return api
+
+def convertCommand(args):
+    partNums = readPartNums(args)
+    if not partNums:
+        logging.error("No LCSC part numbers given")
+        return 2
+    useCache(args)
+    import eagleConvert
+    if args.merge and args.shard_by:
+        logging.error("--merge and --shard-by can not be combined")
+        return 2
+    if args.shard_by and args.output is not None and args.output.lower().endswith(".lbr"):
+        logging.error("--shard-by writes a folder of libraries, -o %s is a library file", args.output)
+        return 2
+    if args.merge:
+        eagleConvert.mergePartsIntoLibrary(partNums, libraryPath=args.output or "./library.lbr", saveMetaDict=args.save_meta, workers=args.workers, updateIndex=not args.no_index)
+    else:
+        import batchJob
+        failureReport = eagleConvert.convertMultiplePartsToEagle(partNums, saveMetaDict=args.save_meta, workers=args.workers, outputPath=args.output, saveXml=args.xml, processes=args.processes, reportPath=args.report, progress=False if args.quiet else None, retryPolicy=batchJob.RetryPolicy(attempts=args.retries), checkpoint=args.checkpoint, reuseFragments=not args.rebuild, shardBy=args.shard_by, onlyShards=args.shard, updateIndex=not args.no_index)
+        if failureReport["failed"]:
+            return 1
+    return 0
+
+def cacheCheckCommand(args):
+    #Answers from the cache alone, nothing is downloaded
+    api = useCache(args)
+    missing = 0
+    for partNum in readPartNums(args):
+        found, partInfo = api.cache.peek("codes", partNum)
+        if not found:
+            state = "not cached"
+        elif partInfo is None:
+            state = "unknown part (cached)"
+        else:
+            attributes = partInfo["attributes"]
+            components = [api.cache.has("components", attributes[kind]) for kind in ("Symbol", "Footprint")]
+            state = "cached" if all(components) else "symbol or footprint not cached"
+        if state != "cached":
+            missing += 1
+        print(f"{partNum}\t{state}")
+    return 1 if missing else 0
+
+def cacheStatsCommand(args):
+    api = useCache(args)
+    import fragmentCache
+    for cache in (api.cache, fragmentCache.besideCache(api.cache).cache):
+        stats = cache.stats()
+        print(f"{cache.cacheDir}: {stats['entries']} entries, {stats['bytes'] / 2**20:.2f} MiB")
+    return 0
+
+def cacheClearCommand(args):
+    api = useCache(args)
+    import fragmentCache
+    api.cache.clear()
+    fragmentCache.besideCache(api.cache).cache.clear()
+    print(f"Cleared {api.cache.cacheDir}")
+    return 0
+
+def serveCommand(args):
+    useCache(args)
+    import conversionService
+    conversionService.serve(args.host, args.port, args.workers, args.result_ttl)
+    return 0
+
+def indexSearchCommand(args):
+    api = useCache(args)
+    import partIndex
+    searchIndex = partIndex.besideCache(api.cache)
+    try:
+        parts = searchIndex.search(" ".join(args.text), limit=args.limit, library=args.library)
+    finally:
+        searchIndex.close()
+    if args.json:
+        print(json.dumps(parts, indent=2))
+    else:
+        for part in parts:
+            location = part["library"] if part["shard"] is None else f"{part['library']} ({part['shard']})"
+            print(f"{part['code']}\t{part['title']}\t{part['footprint'] or part['package']}\t{part['pins']} pins\t{part['pads']} pads\t{location}")
+    return 0 if parts else 1
+
+def indexRebuildCommand(args):
+    #A sharded library is rebuilt shard by shard from its manifest
+    api = useCache(args)
+    import libraryShards
+    import partIndex
+    searchIndex = partIndex.besideCache(api.cache)
+    try:
+        for path in args.paths:
+            manifest = libraryShards.readManifest(path) if os.path.isdir(path) else None
+            if os.path.isdir(path) and manifest is None:
+                logging.error("%s is not a library or a sharded library", path)
+                return 2
+            libraries = [(path, None)] if manifest is None else [(os.path.join(path, entry["file"]), shard) for shard, entry in manifest["shards"].items()]
+            for library, shard in libraries:
+                startTime = time.perf_counter()
+                count = searchIndex.rebuildFromLibrary(library, shard)
+                print(f"{library}: {count} parts indexed in {time.perf_counter() - startTime:.2f}s")
+    finally:
+        searchIndex.close()
+    return 0
+
+def indexStatsCommand(args):
+    api = useCache(args)
+    import partIndex
+    searchIndex = partIndex.besideCache(api.cache)
+    try:
+        stats = searchIndex.stats()
+    finally:
+        searchIndex.close()
+    print(f"{stats['path']}: {stats['parts']} parts, {stats['codes']} LCSC codes in {stats['libraries']} libraries" + ("" if stats["fullText"] else ", no FTS5 so searches use LIKE"))
+    return 0
+
+def buildParser():
+    parser = argparse.ArgumentParser(prog="lcscToEagle", description="Convert LCSC/JLCPCB parts into an EAGLE/Fusion 360 Electronics library")
+    parser.add_argument("--cache-dir", default=None, help="Cache folder, ./.partCache by default")
+    verbosity = parser.add_mutually_exclusive_group()
+    verbosity.add_argument("-v", "--verbose", action="store_true", help="Log every step of every part")
+    verbosity.add_argument("-q", "--quiet", action="store_true", help="Only log warnings and errors")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    convertParser = subparsers.add_parser("convert", help="Convert parts into a library")
+    convertParser.add_argument("partNums", nargs="*", help="LCSC part numbers like C1880271")
+    convertParser.add_argument("-f", "--file", action="append", help="Read part numbers from a file, - for stdin")
+    convertParser.add_argument("-o", "--output", default=None, help="Library to write, ./library.lbr or with --shard-by the ./library folder by default")
+    convertParser.add_argument("--merge", action="store_true", help="Add the parts to the existing library instead of rebuilding it")
+    convertParser.add_argument("--shard-by", default=None, help="Split the library into a folder of shards by code, package or name, code:4 or name:2 set the prefix length")
+    convertParser.add_argument("--shard", action="append", default=None, help="Only write this shard, leaving the others as they are")
+    convertParser.add_argument("--workers", type=int, default=8, help="Download threads")
+    convertParser.add_argument("--processes", type=int, default=1, help="Conversion processes")
+    convertParser.add_argument("--report", default=None, help="Write a JSON run report here")
+    convertParser.add_argument("--save-meta", action="store_true", help="Also write metaDict.json")
+    convertParser.add_argument("--xml", action="store_true", help="Also write a .xml copy of the library")
+    convertParser.add_argument("--no-cache", action="store_true", help="Download everything again")
+    convertParser.add_argument("--rebuild", action="store_true", help="Convert every part again instead of reusing converted parts from the cache")
+    convertParser.add_argument("--retries", type=int, default=3, help="Tries per part before it is reported as failed")
+    convertParser.add_argument("--checkpoint", action="store_true", help="Keep a job folder with the fetched parts to resume a failed run from")
+    convertParser.add_argument("--no-index", action="store_true", help="Leave the part index alone")
+    convertParser.set_defaults(run=convertCommand)
+
+    serveParser = subparsers.add_parser("serve", help="Run a local HTTP service that converts parts on request")
+    serveParser.add_argument("--host", default="127.0.0.1")
+    serveParser.add_argument("--port", type=int, default=8766)
+    serveParser.add_argument("--workers", type=int, default=8, help="Download threads per conversion")
+    serveParser.add_argument("--result-ttl", type=float, default=3600, help="Seconds a converted library is served from memory")
+    serveParser.set_defaults(run=serveCommand)
+
+    cacheParser = subparsers.add_parser("cache", help="Inspect the download cache")
+    cacheSubparsers = cacheParser.add_subparsers(dest="cacheCommand", required=True)
+    checkParser = cacheSubparsers.add_parser("check", help="Show whether parts are cached, exits with 1 if any is not")
+    checkParser.add_argument("partNums", nargs="*")
+    checkParser.add_argument("-f", "--file", action="append", help="Read part numbers from a file, - for stdin")
+    checkParser.set_defaults(run=cacheCheckCommand)
+    cacheSubparsers.add_parser("stats", help="Number of entries and size of the download and converted part caches").set_defaults(run=cacheStatsCommand)
+    cacheSubparsers.add_parser("clear", help="Remove every cached download and converted part").set_defaults(run=cacheClearCommand)
+
+    indexParser = subparsers.add_parser("index", help="Search the index of converted parts")
+    indexSubparsers = indexParser.add_subparsers(dest="indexCommand", required=True)
+    searchParser = indexSubparsers.add_parser("search", help="Find parts by LCSC code, name, footprint, package or symbol, exits with 1 if none match")
+    searchParser.add_argument("text", nargs="+", help="Words that all have to match, end a word with * to match what it starts")
+    searchParser.add_argument("--library", default=None, help="Only search this library")
+    searchParser.add_argument("--limit", type=int, default=50)
+    searchParser.add_argument("--json", action="store_true", help="Print the matches as JSON")
+    searchParser.set_defaults(run=indexSearchCommand)
+    rebuildParser = indexSubparsers.add_parser("rebuild", help="Index the parts of existing libraries or sharded library folders")
+    rebuildParser.add_argument("paths", nargs="+")
+    rebuildParser.set_defaults(run=indexRebuildCommand)
+    indexSubparsers.add_parser("stats", help="Number of parts and libraries in the index").set_defaults(run=indexStatsCommand)
+    return parser
+
+def main(argv=None):
+    args = buildParser().parse_args(argv)
+    level = logging.DEBUG if args.verbose else logging.WARNING if args.quiet else logging.INFO
+    logging.basicConfig(level=level, format="%(message)s")
+    return args.run(args)
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,208 @@
+import os
+import re
+
+import libraryWriter
+
+#Works on the raw text of an EAGLE library so parts that are not touched are copied through as they are.
+
+ATTRIBUTES = r"""((?:[^>"']|"[^"]*"|'[^']*')*?)"""
+DEVICESET_TAG_PATTERN = re.compile(r"<(gate|device|attribute)\b" + ATTRIBUTES + r"/?>")
+ATTRIBUTE_PATTERN = re.compile(r"""([\w:.-]+)\s*=\s*(?:"([^"]*)"|'([^']*)')""")
+SECTION_TAGS = {"symbols": "symbol", "packages": "package", "devicesets": "deviceset"}
+ENTITIES = {"&lt;": "<", "&gt;": ">", "&quot;": '"', "&apos;": "'", "&amp;": "&"}
+ENTITY_PATTERN = re.compile(r"&(?:lt|gt|quot|apos|amp);")
+
+def startTagPattern(tag):
+    return re.compile(rf"<{tag}\b" + ATTRIBUTES + r"(/?)>")
+
+def unescape(text):
+    #xml.sax.saxutils.unescape in one pass, importing saxutils pulls in urllib
+    return ENTITY_PATTERN.sub(lambda match: ENTITIES[match.group(0)], text) if "&" in text else text
+
+def parseAttributes(attributeText):
+    return {match.group(1): unescape(match.group(2) if match.group(2) is not None else match.group(3)) for match in ATTRIBUTE_PATTERN.finditer(attributeText)}
+
+class Fragment:
+    """
+    One top-level symbol, package or deviceset of a library as raw text,
+    including the whitespace in front of it.
+    """
+    __slots__ = ("name", "text", "code", "symbols", "packages")
+
+    def __init__(self, name, text):
+        self.name = name
+        self.text = text
+        self.code = None #LCSC_PART of a deviceset
+        self.symbols = set() #Symbols used by a deviceset
+        self.packages = set() #Packages used by a deviceset
+
+class Section:
+    def __init__(self, tag):
+        self.tag = tag
+        self.openEnd = None #Index right after <symbols>
+        self.contentEnd = None #Index right after the last fragment
+        self.closeStart = None #Index of </symbols>
+        self.selfClosing = False
+        self.fragments = []
+
+class LibraryIndex:
+    """
+    Indexes the symbols, packages and devicesets of an EAGLE library in one
+    pass over its text without parsing it. Devicesets are indexed by the LCSC_PART attribute
+    createXML writes on every device.
+    """
+    def __init__(self, text):
+        self.text = text
+        self.sections = {}
+        self.libraryClose = None
+        self.scan()
+        self.byCode = {}
+        for fragment in self.fragments("devicesets"):
+            if fragment.code is not None:
+                self.byCode.setdefault(fragment.code, []).append(fragment)
+
+    def fragments(self, section):
+        return self.sections[section].fragments if section in self.sections else []
+
+    def scan(self):
+        #Symbols, packages and devicesets never contain an element of their own kind,
+        #so each one ends at the first matching close tag and only their start tags need matching.
+        text = self.text
+        closeIndex = text.rfind("</library>")
+        self.libraryClose = closeIndex if closeIndex != -1 else None
+        for sectionName, tag in SECTION_TAGS.items():
+            sectionMatch = startTagPattern(sectionName).search(text)
+            if sectionMatch is None:
+                continue
+            section = Section(sectionName)
+            self.sections[sectionName] = section
+            section.openEnd = section.contentEnd = sectionMatch.end()
+            if sectionMatch.group(2):
+                section.selfClosing = True
+                section.closeStart = sectionMatch.start()
+                continue
+            section.closeStart = text.index(f"</{sectionName}>", sectionMatch.end())
+            fragmentPattern = startTagPattern(tag)
+            closeTag = f"</{tag}>"
+            position = sectionMatch.end()
+            while True:
+                fragmentMatch = fragmentPattern.search(text, position, section.closeStart)
+                if fragmentMatch is None:
+                    break
+                end = fragmentMatch.end() if fragmentMatch.group(2) else text.index(closeTag, fragmentMatch.end()) + len(closeTag)
+                fragment = Fragment(parseAttributes(fragmentMatch.group(1)).get("name", ""), text[position:end])
+                if tag == "deviceset":
+                    self.indexDeviceset(fragment)
+                section.fragments.append(fragment)
+                position = end
+            section.contentEnd = position
+
+    def indexDeviceset(self, fragment):
+        for tagMatch in DEVICESET_TAG_PATTERN.finditer(fragment.text):
+            tag, attributes = tagMatch.group(1), parseAttributes(tagMatch.group(2))
+            if tag == "gate":
+                fragment.symbols.add(attributes.get("symbol"))
+            elif tag == "device":
+                if "package" in attributes:
+                    fragment.packages.add(attributes["package"])
+            elif attributes.get("name") == "LCSC_PART":
+                fragment.code = attributes.get("value")
+
+class FragmentCollector:
+    """
+    Stands in for LibraryWriter and keeps each new symbol, package and
+    deviceset as rendered text so it can be merged into an existing library.
+    """
+    def __init__(self):
+        self.fragments = {"symbol": [], "package": [], "deviceset": []}
+
+    def render(self, tag, content):
+        return libraryWriter.renderFragment(tag, content)
+
+    def writeRendered(self, tag, fragment):
+        fragment = "\n" + fragment
+        self.fragments[tag].append(fragment)
+        return len(fragment.encode("utf-8"))
+
+    def write(self, tag, content):
+        return self.writeRendered(tag, self.render(tag, content))
+
+    def writeSymbol(self, symbolDict):
+        return self.write("symbol", symbolDict)
+
+    def writePackage(self, packageDict):
+        return self.write("package", packageDict)
+
+    def writeDeviceset(self, devicesetDict):
+        return self.write("deviceset", devicesetDict)
+
+def planRemoval(index, removeCodes):
+    """
+    Returns the names of the symbols, packages and devicesets to drop when the
+    devicesets for removeCodes are removed. Symbols and packages are only
+    dropped when no remaining deviceset still uses them.
+    """
+    removedDevicesets = [fragment for code in removeCodes for fragment in index.byCode.get(code, [])]
+    removedIds = set(id(fragment) for fragment in removedDevicesets)
+    keptDevicesets = [fragment for fragment in index.fragments("devicesets") if id(fragment) not in removedIds]
+    usedSymbols = set().union(*(fragment.symbols for fragment in keptDevicesets))
+    usedPackages = set().union(*(fragment.packages for fragment in keptDevicesets))
+    return {
+        "symbols": set().union(*(fragment.symbols for fragment in removedDevicesets)) - usedSymbols,
+        "packages": set().union(*(fragment.packages for fragment in removedDevicesets)) - usedPackages,
+        "devicesets": removedIds
+    }
+
+def keptFragments(index, section, removal):
+    for fragment in index.fragments(section):
+        if section == "devicesets":
+            if id(fragment) not in removal["devicesets"]:
+                yield fragment
+        elif fragment.name not in removal[section]:
+            yield fragment
+
+def writeMergedLibrary(path, index, removal, collector):
+    """
+    Writes the library with the removed fragments left out and the collected
+    fragments appended to each section. The file is replaced atomically.
+    """
+    text = index.text
+    tempPath = f"{path}.{os.getpid()}.tmp"
+    position = 0
+    missing = []
+    with open(tempPath, "w", encoding="utf-8") as file:
+        edits = []
+        for section, tag in libraryWriter.SECTIONS:
+            if section in index.sections:
+                edits.append((index.sections[section], tag))
+            else:
+                missing.append((section, tag))
+        edits.sort(key=lambda edit: edit[0].openEnd)
+        for sectionInfo, tag in edits:
+            section = sectionInfo.tag
+            if sectionInfo.selfClosing:
+                file.write(text[position:sectionInfo.closeStart])
+                file.write(f"<{section}>")
+                trailing = ""
+            else:
+                file.write(text[position:sectionInfo.openEnd])
+                trailing = text[sectionInfo.contentEnd:sectionInfo.closeStart]
+            for fragment in keptFragments(index, section, removal):
+                file.write(fragment.text)
+            for fragment in collector.fragments[tag]:
+                file.write(fragment)
+            if collector.fragments[tag] and not trailing.strip() and "\n" not in trailing:
+                trailing = "\n\t\t\t"
+            file.write(trailing)
+            if sectionInfo.selfClosing:
+                file.write(f"</{section}>")
+                position = text.index(">", sectionInfo.closeStart) + 1
+            else:
+                position = sectionInfo.closeStart
+        if missing:
+            file.write(text[position:index.libraryClose])
+            for section, tag in missing:
+                file.write(f"\n\t\t\t<{section}>" + "".join(collector.fragments[tag]) + f"\n\t\t\t</{section}>\n\t\t")
+            position = index.libraryClose
+        file.write(text[position:])
+    os.replace(tempPath, path)
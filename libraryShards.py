@@ -0,0 +1,81 @@
+import json
+import os
+import re
+
+#Splitting a library into shards, smaller libraries that each hold the parts with the same shard key, along with
+#a manifest.json listing every shard and which shard each LCSC code is in. Shard keys are the LCSC code prefix,
+#the package family or the part name prefix, so designers only load the shards they need.
+
+MANIFEST_NAME = "manifest.json"
+MANIFEST_VERSION = 1
+
+def codePrefix(partData, length=3):
+    #C25804 -> C25
+    return partData["partNumb"][:length].upper()
+
+def namePrefix(partData, length=1):
+    name = re.sub(r"[^A-Za-z0-9]", "", partData["partName"])
+    return name[:length].upper() or "OTHER"
+
+def packageFamily(partData):
+    #The leading letters of the footprint name, SOT for SOT-23-3_L2.9-W1.3-P1.90-LS2.4-BR and R for R0603
+    match = re.match(r"[A-Za-z]+", partData.get("footprintName") or "")
+    return match.group(0).upper() if match else "OTHER"
+
+SHARD_KEYS = {"code": codePrefix, "name": namePrefix, "package": packageFamily}
+
+def shardKeyFunction(shardBy):
+    """
+    Returns the function giving a part's shard for shardBy, one of "code",
+    "name" or "package", where code and name take a prefix length like
+    "code:4". A function taking a partData is returned as it is.
+    """
+    if callable(shardBy):
+        return shardBy
+    kind, _, length = shardBy.partition(":")
+    if kind not in SHARD_KEYS:
+        raise ValueError(f"Unknown shard key {shardBy!r}, use one of {', '.join(SHARD_KEYS)}")
+    if length:
+        if kind == "package":
+            raise ValueError("The package shard key takes no length")
+        return lambda partData: SHARD_KEYS[kind](partData, int(length))
+    return SHARD_KEYS[kind]
+
+def shardFileName(shard):
+    return re.sub(r"[^A-Za-z0-9_-]", "_", shard) + ".lbr"
+
+def groupByShard(partDataList, keyFunction):
+    #shard -> parts in input order, shards sorted so the output does not depend on the order of the parts
+    shards = {}
+    for partData in partDataList:
+        shards.setdefault(keyFunction(partData), []).append(partData)
+    return dict(sorted(shards.items()))
+
+def readManifest(outputDir):
+    try:
+        with open(os.path.join(outputDir, MANIFEST_NAME), "r", encoding="utf-8") as file:
+            return json.load(file)
+    except FileNotFoundError:
+        return None
+
+def writeManifest(outputDir, manifest):
+    path = os.path.join(outputDir, MANIFEST_NAME)
+    tempPath = f"{path}.{os.getpid()}.tmp"
+    with open(tempPath, "w", encoding="utf-8") as file:
+        json.dump(manifest, file, indent=2, sort_keys=True)
+    os.replace(tempPath, path)
+
+def updateManifest(manifest, shardBy, written, onlyShards=None):
+    """
+    Returns the new manifest after the shards in written (shard -> {"file",
+    "codes", "bytes"}) were written. With onlyShards every other shard of
+    manifest is kept as it is, otherwise shards that were not written are
+    dropped. Returns (manifest, files of dropped shards).
+    """
+    shards = {}
+    if onlyShards is not None and manifest is not None:
+        shards = {shard: entry for shard, entry in manifest["shards"].items() if shard not in onlyShards}
+    dropped = [entry["file"] for shard, entry in (manifest or {}).get("shards", {}).items() if shard not in shards and shard not in written]
+    shards.update(written)
+    parts = {code: shard for shard, entry in shards.items() for code in entry["codes"]}
+    return {"version": MANIFEST_VERSION, "shardBy": shardBy, "shards": dict(sorted(shards.items())), "parts": parts}, dropped
@@ -0,0 +1,217 @@
+import os
+import shutil
+import tempfile
+import time
+
+XML_INITIAL = '<?xml version="1.0" encoding="utf-8"?>\n<!DOCTYPE eagle SYSTEM "eagle.dtd">\n'
+LIBRARY_PLACEHOLDER = "LIBRARY_CONTENT"
+SECTIONS = [("symbols", "symbol"), ("packages", "package"), ("devicesets", "deviceset")]
+
+EAGLE_DOCUMENT = {
+    "eagle": {
+        "@version": "9.7.0",
+        "drawing": {
+            "settings": {
+                "setting": [
+                    {"@alwaysvectorfont": "no"},
+                    {"@verticaltext": "up"}
+                ]
+            },
+            "grid": {
+                "@distance": "10",
+                "@unitdist": "mm",
+                "@unit": "mm",
+                "@style": "lines",
+                "@multiple": "1",
+                "@display": "no",
+                "@altdistance": "1",
+                "@altunitdist": "mm",
+                "@altunit": "mm"
+            },
+            "layers": {
+                "layer":  [
+                    {"@number": "1", "@name": "Top", "@color": "4", "@fill": "1", "@visible": "yes", "@active": "yes"},
+                    {"@number": "2", "@name": "Route2", "@color": "16", "@fill": "1", "@visible": "no", "@active": "yes"},
+                    {"@number": "3", "@name": "Route3", "@color": "17", "@fill": "1", "@visible": "no", "@active": "yes"},
+                    {"@number": "4", "@name": "Route4", "@color": "18", "@fill": "1", "@visible": "no", "@active": "yes"},
+                    {"@number": "5", "@name": "Route5", "@color": "19", "@fill": "1", "@visible": "no", "@active": "yes"},
+                    {"@number": "6", "@name": "Route6", "@color": "25", "@fill": "1", "@visible": "no", "@active": "yes"},
+                    {"@number": "7", "@name": "Route7", "@color": "26", "@fill": "1", "@visible": "no", "@active": "yes"},
+                    {"@number": "8", "@name": "Route8", "@color": "27", "@fill": "1", "@visible": "no", "@active": "yes"},
+                    {"@number": "9", "@name": "Route9", "@color": "28", "@fill": "1", "@visible": "no", "@active": "yes"},
+                    {"@number": "10", "@name": "Route10", "@color": "29", "@fill": "1", "@visible": "no", "@active": "yes"},
+                    {"@number": "11", "@name": "Route11", "@color": "30", "@fill": "1", "@visible": "no", "@active": "yes"},
+                    {"@number": "12", "@name": "Route12", "@color": "20", "@fill": "1", "@visible": "no", "@active": "yes"},
+                    {"@number": "13", "@name": "Route13", "@color": "21", "@fill": "1", "@visible": "no", "@active": "yes"},
+                    {"@number": "14", "@name": "Route14", "@color": "22", "@fill": "1", "@visible": "no", "@active": "yes"},
+                    {"@number": "15", "@name": "Route15", "@color": "23", "@fill": "1", "@visible": "no", "@active": "yes"},
+                    {"@number": "16", "@name": "Bottom", "@color": "1", "@fill": "1", "@visible": "yes", "@active": "yes"},
+                    {"@number": "17", "@name": "Pads", "@color": "2", "@fill": "1", "@visible": "yes", "@active": "yes"},
+                    {"@number": "18", "@name": "Vias", "@color": "2", "@fill": "1", "@visible": "yes", "@active": "yes"},
+                    {"@number": "19", "@name": "Unrouted", "@color": "6", "@fill": "1", "@visible": "yes", "@active": "yes"},
+                    {"@number": "20", "@name": "Dimension", "@color": "24", "@fill": "1", "@visible": "yes", "@active": "yes"},
+                    {"@number": "21", "@name": "tPlace", "@color": "7", "@fill": "1", "@visible": "yes", "@active": "yes"},
+                    {"@number": "22", "@name": "bPlace", "@color": "7", "@fill": "1", "@visible": "yes", "@active": "yes"},
+                    {"@number": "23", "@name": "tOrigins", "@color": "15", "@fill": "1", "@visible": "yes", "@active": "yes"},
+                    {"@number": "24", "@name": "bOrigins", "@color": "15", "@fill": "1", "@visible": "yes", "@active": "yes"},
+                    {"@number": "25", "@name": "tNames", "@color": "7", "@fill": "1", "@visible": "yes", "@active": "yes"},
+                    {"@number": "26", "@name": "bNames", "@color": "7", "@fill": "1", "@visible": "yes", "@active": "yes"},
+                    {"@number": "27", "@name": "tValues", "@color": "7", "@fill": "1", "@visible": "yes", "@active": "yes"},
+                    {"@number": "28", "@name": "bValues", "@color": "7", "@fill": "1", "@visible": "yes", "@active": "yes"},
+                    {"@number": "29", "@name": "tStop", "@color": "7", "@fill": "3", "@visible": "no", "@active": "yes"},
+                    {"@number": "30", "@name": "bStop", "@color": "7", "@fill": "6", "@visible": "no", "@active": "yes"},
+                    {"@number": "31", "@name": "tCream", "@color": "7", "@fill": "4", "@visible": "no", "@active": "yes"},
+                    {"@number": "32", "@name": "bCream", "@color": "7", "@fill": "5", "@visible": "no", "@active": "yes"},
+                    {"@number": "33", "@name": "tFinish", "@color": "6", "@fill": "3", "@visible": "no", "@active": "yes"},
+                    {"@number": "34", "@name": "bFinish", "@color": "6", "@fill": "6", "@visible": "no", "@active": "yes"},
+                    {"@number": "35", "@name": "tGlue", "@color": "7", "@fill": "4", "@visible": "no", "@active": "yes"},
+                    {"@number": "36", "@name": "bGlue", "@color": "7", "@fill": "5", "@visible": "no", "@active": "yes"},
+                    {"@number": "37", "@name": "tTest", "@color": "7", "@fill": "1", "@visible": "no", "@active": "yes"},
+                    {"@number": "38", "@name": "bTest", "@color": "7", "@fill": "1", "@visible": "no", "@active": "yes"},
+                    {"@number": "39", "@name": "tKeepout", "@color": "4", "@fill": "11", "@visible": "yes", "@active": "yes"},
+                    {"@number": "40", "@name": "bKeepout", "@color": "1", "@fill": "11", "@visible": "yes", "@active": "yes"},
+                    {"@number": "41", "@name": "tRestrict", "@color": "4", "@fill": "10", "@visible": "yes", "@active": "yes"},
+                    {"@number": "42", "@name": "bRestrict", "@color": "1", "@fill": "10", "@visible": "yes", "@active": "yes"},
+                    {"@number": "43", "@name": "vRestrict", "@color": "2", "@fill": "10", "@visible": "yes", "@active": "yes"},
+                    {"@number": "44", "@name": "Drills", "@color": "7", "@fill": "1", "@visible": "no", "@active": "yes"},
+                    {"@number": "45", "@name": "Holes", "@color": "7", "@fill": "1", "@visible": "no", "@active": "yes"},
+                    {"@number": "46", "@name": "Milling", "@color": "3", "@fill": "1", "@visible": "no", "@active": "yes"},
+                    {"@number": "47", "@name": "Measures", "@color": "7", "@fill": "1", "@visible": "no", "@active": "yes"},
+                    {"@number": "48", "@name": "Document", "@color": "7", "@fill": "1", "@visible": "yes", "@active": "yes"},
+                    {"@number": "49", "@name": "Reference", "@color": "7", "@fill": "1", "@visible": "yes", "@active": "yes"},
+                    {"@number": "51", "@name": "tDocu", "@color": "7", "@fill": "1", "@visible": "yes", "@active": "yes"},
+                    {"@number": "52", "@name": "bDocu", "@color": "7", "@fill": "1", "@visible": "yes", "@active": "yes"},
+                    {"@number": "88", "@name": "SimResults", "@color": "9", "@fill": "1", "@visible": "yes", "@active": "yes"},
+                    {"@number": "89", "@name": "SimProbes", "@color": "9", "@fill": "1", "@visible": "yes", "@active": "yes"},
+                    {"@number": "90", "@name": "Modules", "@color": "5", "@fill": "1", "@visible": "yes", "@active": "yes"},
+                    {"@number": "91", "@name": "Nets", "@color": "2", "@fill": "1", "@visible": "yes", "@active": "yes"},
+                    {"@number": "92", "@name": "Busses", "@color": "1", "@fill": "1", "@visible": "yes", "@active": "yes"},
+                    {"@number": "93", "@name": "Pins", "@color": "2", "@fill": "1", "@visible": "yes", "@active": "yes"},
+                    {"@number": "94", "@name": "Symbols", "@color": "4", "@fill": "1", "@visible": "yes", "@active": "yes"},
+                    {"@number": "95", "@name": "Names", "@color": "7", "@fill": "1", "@visible": "yes", "@active": "yes"},
+                    {"@number": "96", "@name": "Values", "@color": "7", "@fill": "1", "@visible": "yes", "@active": "yes"},
+                    {"@number": "97", "@name": "Info", "@color": "7", "@fill": "1", "@visible": "yes", "@active": "yes"},
+                    {"@number": "98", "@name": "Guide", "@color": "6", "@fill": "1", "@visible": "yes", "@active": "yes"}
+                ]
+            },
+            "library": LIBRARY_PLACEHOLDER #Symbols, packages and devicesets are streamed in by LibraryWriter
+        }
+    }
+}
+
+def renderFragment(tag, content, depth=4):
+    """
+    Serializes one element the same way xmltodict.unparse(pretty=True) would
+    inside the full document, indented for `depth` levels of nesting.
+    """
+    import xmltodict #Deferred until something is written, importing it is slow
+    wrapped = {tag: content}
+    for level in range(depth):
+        wrapped = {f"depth{level}": wrapped}
+    lines = xmltodict.unparse(wrapped, pretty=True, full_document=False).split("\n")
+    return "\n".join(lines[depth:-depth])
+
+class LibraryWriter:
+    """
+    Writes an EAGLE library one symbol, package and deviceset at a time so the
+    whole library never has to be held in memory.
+
+    The header and layer table are written once. Symbols go straight to the
+    output while packages and devicesets are spooled to temporary files and
+    appended by close(), keeping the usual symbols, packages, devicesets order.
+    The output is the same as passing the whole document to xmltodict.unparse.
+
+    :param output: A path or a text file object. A path is written to a
+                   temporary file first and moved into place by close().
+    :param metrics: Optional runMetrics.RunMetrics that gets the time spent
+                    rendering fragments as "serialize" and writing them as "write".
+    """
+    def __init__(self, output, metrics=None):
+        self.metrics = metrics
+        self.path = None
+        if isinstance(output, (str, os.PathLike)):
+            self.path = os.fspath(output)
+            self.tempPath = f"{self.path}.{os.getpid()}.tmp"
+            self.file = open(self.tempPath, "w", encoding="utf-8")
+        else:
+            self.file = output
+        self.spools = {"package": tempfile.TemporaryFile("w+", encoding="utf-8"), "deviceset": tempfile.TemporaryFile("w+", encoding="utf-8")}
+        self.counts = {"symbol": 0, "package": 0, "deviceset": 0}
+        self.bytesWritten = 0
+        import xmltodict
+        document = XML_INITIAL + xmltodict.unparse(EAGLE_DOCUMENT, pretty=True, full_document=False)
+        self.header, self.footer = document.split(LIBRARY_PLACEHOLDER)
+        self.file.write(self.header + "\n\t\t\t<symbols>")
+
+    def render(self, tag, content):
+        startTime = time.perf_counter()
+        fragment = renderFragment(tag, content)
+        if self.metrics is not None:
+            self.metrics.add("serialize", time.perf_counter() - startTime)
+        return fragment
+
+    def writeRendered(self, tag, fragment):
+        """
+        Writes a symbol, package or deviceset already rendered by render() and
+        returns its size in bytes.
+        """
+        startTime = time.perf_counter()
+        fragment = "\n" + fragment
+        (self.file if tag == "symbol" else self.spools[tag]).write(fragment)
+        if self.metrics is not None:
+            self.metrics.add("write", time.perf_counter() - startTime)
+        self.counts[tag] += 1
+        size = len(fragment.encode("utf-8"))
+        self.bytesWritten += size
+        return size
+
+    def write(self, tag, content):
+        """
+        Writes a symbol, package or deviceset dict and returns its size in bytes.
+        """
+        return self.writeRendered(tag, self.render(tag, content))
+
+    def writeSymbol(self, symbolDict):
+        return self.write("symbol", symbolDict)
+
+    def writePackage(self, packageDict):
+        return self.write("package", packageDict)
+
+    def writeDeviceset(self, devicesetDict):
+        return self.write("deviceset", devicesetDict)
+
+    def closeSection(self, section, tag):
+        self.file.write(f"\n\t\t\t</{section}>" if self.counts[tag] else f"</{section}>")
+
+    def close(self):
+        startTime = time.perf_counter()
+        self.closeSection("symbols", "symbol")
+        for section, tag in SECTIONS[1:]:
+            self.file.write(f"\n\t\t\t<{section}>")
+            spool = self.spools[tag]
+            spool.seek(0)
+            shutil.copyfileobj(spool, self.file)
+            spool.close()
+            self.closeSection(section, tag)
+        self.file.write("\n\t\t" + self.footer)
+        if self.path is not None:
+            self.file.close()
+            os.replace(self.tempPath, self.path)
+        if self.metrics is not None:
+            self.metrics.add("write", time.perf_counter() - startTime, 0) #Appending the spools, not a fragment
+
+    def abort(self):
+        for spool in self.spools.values():
+            spool.close()
+        if self.path is not None:
+            self.file.close()
+            os.remove(self.tempPath)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, excType, excValue, traceback):
+        if excType is None:
+            self.close()
+        else:
+            self.abort()
@@ -0,0 +1,269 @@
+import contextlib
+import hashlib
+import json
+import os
+import threading
+import time
+
+DAY = 24 * 60 * 60
+EVICT_TO = 0.9 #Eviction frees space down to this share of maxBytes, so the next writes do not sort the index again
+
+@contextlib.contextmanager
+def lockedFile(path):
+    #Holds an exclusive lock on path for the with block, shared by every process using the same file
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "a+b") as file:
+        if os.name == "nt":
+            import msvcrt
+            file.seek(0)
+            msvcrt.locking(file.fileno(), msvcrt.LK_LOCK, 1)
+            try:
+                yield
+            finally:
+                file.seek(0)
+                msvcrt.locking(file.fileno(), msvcrt.LK_UNLCK, 1)
+        else:
+            import fcntl
+            fcntl.flock(file.fileno(), fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(file.fileno(), fcntl.LOCK_UN)
+
+class PartCache:
+    """
+    On-disk cache for raw EasyEDA responses.
+
+    Entries are stored as one JSON file per key under cacheDir/<namespace>/
+    and tracked in cacheDir/index.json with their size, expiry time and
+    last access time. Entries expire after their TTL and the least recently
+    used entries are evicted down to EVICT_TO of maxBytes whenever the total
+    size goes over it.
+
+    Several processes can share one cacheDir. Each keeps its own copy of the
+    index and flush() merges it with what the others wrote meanwhile, under a
+    lock on cacheDir/index.lock, so no process drops another's entries.
+
+    A value of None is stored as a negative entry (e.g. an unknown LCSC code)
+    and uses negativeTtl so it gets looked up again sooner.
+
+    :param cacheDir: Folder the cache is kept in.
+    :param ttl: Seconds a normal entry stays valid.
+    :param negativeTtl: Seconds a negative entry stays valid.
+    :param maxBytes: Size cap for all entry files together.
+    :param enabled: When False every lookup is a miss and nothing is written.
+    """
+    def __init__(self, cacheDir="./.partCache", ttl=30 * DAY, negativeTtl=DAY, maxBytes=512 * 1024 * 1024, enabled=True):
+        self.cacheDir = cacheDir
+        self.ttl = ttl
+        self.negativeTtl = negativeTtl
+        self.maxBytes = maxBytes
+        self.enabled = enabled
+        self.lock = threading.RLock()
+        self.index = None
+        self.indexDirty = False
+        self.changedKeys = {} #Index key -> "write" or "access" since the last flush, see _mergeIndex
+        self.removedKeys = set() #Index keys removed since the last flush
+        self.totalBytes = 0 #Size of every entry in the index, kept up to date so writes do not add it up again
+        self.counters = {"hits": 0, "misses": 0, "negativeHits": 0, "expired": 0, "writes": 0, "evictions": 0}
+
+    def __getstate__(self):
+        #Only the settings, a copy sent to another process loads the index itself
+        state = dict(self.__dict__)
+        del state["lock"]
+        state["index"] = None
+        state["indexDirty"] = False
+        state["changedKeys"] = {}
+        state["removedKeys"] = set()
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.lock = threading.RLock()
+
+    def _indexPath(self):
+        return os.path.join(self.cacheDir, "index.json")
+
+    def _entryPath(self, namespace, key):
+        digest = hashlib.sha1(key.encode("utf-8")).hexdigest()
+        return os.path.join(self.cacheDir, namespace, digest + ".json")
+
+    def _readIndex(self):
+        try:
+            with open(self._indexPath(), "r", encoding="utf-8") as file:
+                return json.load(file)
+        except (OSError, ValueError):
+            return {}
+
+    def _loadIndex(self):
+        if self.index is not None:
+            return self.index
+        self.index = self._readIndex()
+        self.totalBytes = sum(entry["size"] for entry in self.index.values())
+        return self.index
+
+    def _mergeIndex(self):
+        """
+        Replaces the index with the one on disk plus what this process changed
+        since it last flushed. Entries written here win, an entry only read
+        here keeps the later last access time, and entries removed here or by
+        another process stay removed.
+        """
+        merged = self._readIndex()
+        for indexKey in self.removedKeys:
+            merged.pop(indexKey, None)
+        for indexKey, change in self.changedKeys.items():
+            entry = self.index.get(indexKey)
+            other = merged.get(indexKey)
+            if entry is None:
+                continue
+            if change == "write":
+                merged[indexKey] = entry
+            elif other is not None:
+                other["lastAccess"] = max(other["lastAccess"], entry["lastAccess"])
+        self.index = merged
+        self.totalBytes = sum(entry["size"] for entry in merged.values())
+        self.changedKeys = {}
+        self.removedKeys = set()
+
+    def _writeAtomic(self, path, text):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tempPath = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tempPath, "w", encoding="utf-8") as file:
+            file.write(text)
+        os.replace(tempPath, path)
+        return len(text.encode("utf-8"))
+
+    def _removeEntry(self, indexKey):
+        self.changedKeys.pop(indexKey, None)
+        self.removedKeys.add(indexKey)
+        entry = self.index.pop(indexKey, None)
+        if entry:
+            self.totalBytes -= entry["size"]
+            try:
+                os.remove(os.path.join(self.cacheDir, entry["file"]))
+            except OSError:
+                pass
+        self.indexDirty = True
+
+    def _evict(self):
+        if self.totalBytes <= self.maxBytes:
+            return
+        target = self.maxBytes * EVICT_TO
+        for indexKey, entry in sorted(self.index.items(), key=lambda item: item[1]["lastAccess"]):
+            if self.totalBytes <= target:
+                break
+            self._removeEntry(indexKey)
+            self.counters["evictions"] += 1
+
+    def get(self, namespace, key):
+        """
+        Returns a tuple (found, value). A negative entry is returned as (True, None).
+        """
+        if not self.enabled:
+            return False, None
+        with self.lock:
+            index = self._loadIndex()
+            indexKey = f"{namespace}/{key}"
+            entry = index.get(indexKey)
+            if entry is None:
+                self.counters["misses"] += 1
+                return False, None
+            if entry["expires"] < time.time():
+                self._removeEntry(indexKey)
+                self.counters["expired"] += 1
+                self.counters["misses"] += 1
+                return False, None
+            try:
+                with open(os.path.join(self.cacheDir, entry["file"]), "r", encoding="utf-8") as file:
+                    value = json.load(file)
+            except (OSError, ValueError):
+                self._removeEntry(indexKey)
+                self.counters["misses"] += 1
+                return False, None
+            entry["lastAccess"] = time.time()
+            self.changedKeys.setdefault(indexKey, "access")
+            self.indexDirty = True
+            if value is None:
+                self.counters["negativeHits"] += 1
+            else:
+                self.counters["hits"] += 1
+            return True, value
+
+    def peek(self, namespace, key):
+        """
+        Like get but does not count the lookup or update the last access time,
+        for checking what is cached. Returns a tuple (found, value).
+        """
+        with self.lock:
+            entry = self._loadIndex().get(f"{namespace}/{key}")
+            if entry is None or entry["expires"] < time.time():
+                return False, None
+            try:
+                with open(os.path.join(self.cacheDir, entry["file"]), "r", encoding="utf-8") as file:
+                    return True, json.load(file)
+            except (OSError, ValueError):
+                return False, None
+
+    def has(self, namespace, key):
+        #Only checks the index, see peek
+        with self.lock:
+            entry = self._loadIndex().get(f"{namespace}/{key}")
+            return entry is not None and entry["expires"] >= time.time()
+
+    def set(self, namespace, key, value, ttl=None, flush=True):
+        #With flush=False the index is only written by the next flush(), for writing many entries in a row
+        if not self.enabled:
+            return
+        if ttl is None:
+            ttl = self.negativeTtl if value is None else self.ttl
+        with self.lock:
+            index = self._loadIndex()
+            path = self._entryPath(namespace, key)
+            size = self._writeAtomic(path, json.dumps(value))
+            now = time.time()
+            replaced = index.get(f"{namespace}/{key}")
+            self.totalBytes += size - (replaced["size"] if replaced else 0)
+            index[f"{namespace}/{key}"] = {
+                "file": os.path.relpath(path, self.cacheDir),
+                "size": size,
+                "expires": now + ttl,
+                "lastAccess": now
+            }
+            self.changedKeys[f"{namespace}/{key}"] = "write"
+            self.removedKeys.discard(f"{namespace}/{key}")
+            self.counters["writes"] += 1
+            self.indexDirty = True
+            self._evict()
+            if flush:
+                self.flush()
+
+    def flush(self):
+        with self.lock:
+            if self.index is not None and self.indexDirty:
+                with lockedFile(os.path.join(self.cacheDir, "index.lock")):
+                    self._mergeIndex()
+                    self._evict()
+                    self._writeAtomic(self._indexPath(), json.dumps(self.index))
+                    self.changedKeys = {}
+                    self.removedKeys = set()
+                self.indexDirty = False
+
+    def clear(self):
+        with self.lock:
+            self._loadIndex()
+            self.indexDirty = True
+            self.flush() #Takes over the entries other processes added, so they are removed too
+            for indexKey in list(self.index):
+                self._removeEntry(indexKey)
+            self.flush()
+
+    def stats(self):
+        with self.lock:
+            index = self._loadIndex() if self.enabled else {}
+            stats = dict(self.counters)
+            stats["entries"] = len(index)
+            stats["bytes"] = sum(entry["size"] for entry in index.values())
+            lookups = stats["hits"] + stats["negativeHits"] + stats["misses"]
+            stats["hitRate"] = (stats["hits"] + stats["negativeHits"]) / lookups if lookups else 0.0
+            return stats
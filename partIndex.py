@@ -0,0 +1,244 @@
+import os
+import sqlite3
+import threading
+
+#A SQLite index of every converted part and the library it was written to, so questions like "which parts use a
+#QFN-32 footprint" are answered without reading any library. createXML fills it while it writes a library and
+#rebuildFromLibrary fills it from an existing library in one streaming pass. Titles, footprints, packages and
+#symbols are searched with SQLite's FTS5 full-text search, or with LIKE when SQLite was built without it.
+#Records are collected while a library is written and stored in one short transaction once it is written, so
+#runs writing other libraries into the same index only wait for that.
+
+INDEX_NAME = "partIndex.sqlite"
+SCHEMA_VERSION = 1 #Bump when the tables change, an index written by another version is started over
+Error = sqlite3.Error #What opening, updating or searching the index raises
+COLUMNS = ("code", "title", "deviceset", "symbol", "package", "footprint", "pins", "pads")
+SEARCH_COLUMNS = ("code", "title", "footprint", "package", "symbol")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS parts (
+    id INTEGER PRIMARY KEY,
+    code TEXT NOT NULL,
+    title TEXT NOT NULL,
+    deviceset TEXT NOT NULL,
+    symbol TEXT NOT NULL,
+    package TEXT NOT NULL,
+    footprint TEXT NOT NULL,
+    pins INTEGER NOT NULL,
+    pads INTEGER NOT NULL,
+    library TEXT NOT NULL,
+    shard TEXT
+);
+CREATE INDEX IF NOT EXISTS partsByCode ON parts (code);
+CREATE INDEX IF NOT EXISTS partsByLibrary ON parts (library);
+"""
+
+FULL_TEXT_SCHEMA = """
+CREATE VIRTUAL TABLE IF NOT EXISTS partsSearch USING fts5(code, title, footprint, package, symbol, content='parts', content_rowid='id');
+CREATE TRIGGER IF NOT EXISTS partsSearchInsert AFTER INSERT ON parts BEGIN
+    INSERT INTO partsSearch (rowid, code, title, footprint, package, symbol) VALUES (new.id, new.code, new.title, new.footprint, new.package, new.symbol);
+END;
+CREATE TRIGGER IF NOT EXISTS partsSearchDelete AFTER DELETE ON parts BEGIN
+    INSERT INTO partsSearch (partsSearch, rowid, code, title, footprint, package, symbol) VALUES ('delete', old.id, old.code, old.title, old.footprint, old.package, old.symbol);
+END;
+"""
+
+def indexRecord(code, title, deviceset, symbol, package, footprint, pins, pads):
+    #What the index keeps of one part, convertPartToXML returns one for every part it writes
+    return {"code": code, "title": title, "deviceset": deviceset, "symbol": symbol, "package": package, "footprint": footprint or "", "pins": pins, "pads": pads}
+
+def matchQuery(text):
+    """
+    Turns what a user typed into an FTS5 query. Every word has to match, a
+    word like QFN-32 matches QFN followed by 32 and a word ending in * matches
+    every word it starts.
+    """
+    terms = []
+    for word in text.split():
+        prefix = word.endswith("*")
+        word = word.rstrip("*").replace('"', '""')
+        if word:
+            terms.append(f'"{word}"' + ("*" if prefix else ""))
+    return " ".join(terms)
+
+class LibraryUpdate:
+    """
+    The rows of one library (or shard) being written, in one transaction that
+    is committed when the with block ends and rolled back when it fails, so
+    the index never holds half a library. Made by PartIndex.update. The
+    transaction blocks every other writer, so keep the with block short.
+    """
+    def __init__(self, index, library, shard, replace):
+        self.index = index
+        self.library = library
+        self.shard = shard
+        self.replace = replace
+        self.added = 0
+
+    def __enter__(self):
+        self.index.lock.acquire()
+        try:
+            self.index.connection.execute("BEGIN")
+        except:
+            self.index.lock.release()
+            raise
+        if self.replace:
+            self.index.connection.execute("DELETE FROM parts WHERE library = ?", (self.library,))
+        return self
+
+    def add(self, record):
+        self.index.connection.execute(
+            "INSERT INTO parts (code, title, deviceset, symbol, package, footprint, pins, pads, library, shard) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            tuple(record[column] for column in COLUMNS) + (self.library, self.shard))
+        self.added += 1
+
+    def remove(self, code):
+        self.index.connection.execute("DELETE FROM parts WHERE library = ? AND code = ?", (self.library, code))
+
+    def __exit__(self, excType, excValue, traceback):
+        try:
+            self.index.connection.execute("COMMIT" if excType is None else "ROLLBACK")
+        finally:
+            self.index.lock.release()
+
+class RecordCollector(list):
+    #Collects the records of the parts createXML writes, they are stored with PartIndex.replaceLibrary once it is done
+    def add(self, record):
+        self.append(record)
+
+class PartIndex:
+    """
+    The index at path, created when it does not exist yet. Can be shared by
+    threads. Libraries are stored by their absolute path.
+
+    :param path: SQLite file, ":memory:" for an index that is not kept.
+    :param timeout: Seconds to wait for another process writing the index.
+    """
+    def __init__(self, path=INDEX_NAME, timeout=30.0):
+        self.path = path
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.lock = threading.RLock()
+        self.connection = sqlite3.connect(path, timeout=timeout, check_same_thread=False, isolation_level=None)
+        self.connection.row_factory = sqlite3.Row
+        self.connection.execute("PRAGMA journal_mode = WAL")
+        self.connection.execute("PRAGMA synchronous = NORMAL")
+        version = self.connection.execute("PRAGMA user_version").fetchone()[0]
+        if version not in (0, SCHEMA_VERSION): #It only indexes the libraries, they can be indexed again
+            self.connection.executescript("DROP TABLE IF EXISTS partsSearch; DROP TABLE IF EXISTS parts;")
+        self.connection.executescript(SCHEMA)
+        try:
+            self.connection.executescript(FULL_TEXT_SCHEMA)
+            self.fullText = True
+        except sqlite3.OperationalError: #SQLite without FTS5
+            self.fullText = False
+        self.connection.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+
+    def update(self, library, shard=None, replace=True):
+        """
+        Returns a LibraryUpdate for the library at path `library`. With replace
+        on, the rows the library had are dropped first, as when it is written
+        from scratch. Use it in a with block.
+        """
+        return LibraryUpdate(self, os.path.abspath(library), shard, replace)
+
+    def replaceLibrary(self, library, records, shard=None):
+        #Replaces the rows of a library that was just written with the records collected while writing it
+        with self.update(library, shard) as update:
+            for record in records:
+                update.add(record)
+
+    def updateParts(self, library, removeCodes, records):
+        #For a library parts were merged into, drops the rows of removeCodes and adds records
+        with self.update(library, replace=False) as update:
+            for code in removeCodes:
+                update.remove(code)
+            for record in records:
+                update.add(record)
+
+    def removeLibrary(self, library):
+        with self.lock:
+            self.connection.execute("DELETE FROM parts WHERE library = ?", (os.path.abspath(library),))
+
+    def rebuildFromLibrary(self, library, shard=None):
+        """
+        Replaces the rows of a library with what is in the library file,
+        reading it in one streaming pass. Returns the number of parts indexed.
+        """
+        records = list(scanLibrary(library)) #Read before the transaction starts, so writers only wait for the rows
+        self.replaceLibrary(library, records, shard)
+        return len(records)
+
+    def search(self, text, limit=50, library=None):
+        """
+        Returns the parts matching text, best matches first, as dicts with
+        the columns of the index. See matchQuery for what text can hold.
+        """
+        query = matchQuery(text)
+        if not query:
+            return []
+        where, arguments = "", []
+        if library is not None:
+            where, arguments = " AND parts.library = ?", [os.path.abspath(library)]
+        with self.lock:
+            if self.fullText:
+                rows = self.connection.execute(
+                    "SELECT parts.* FROM partsSearch JOIN parts ON parts.id = partsSearch.rowid WHERE partsSearch MATCH ?" + where + " ORDER BY bm25(partsSearch), parts.code LIMIT ?",
+                    [query] + arguments + [limit]).fetchall()
+            else:
+                words = [word.rstrip("*") for word in text.split() if word.rstrip("*")]
+                condition = "(" + " OR ".join(f"{column} LIKE ?" for column in SEARCH_COLUMNS) + ")"
+                wordArguments = [f"%{word}%" for word in words for _ in SEARCH_COLUMNS]
+                rows = self.connection.execute("SELECT * FROM parts WHERE " + " AND ".join([condition] * len(words)) + where + " ORDER BY code LIMIT ?", wordArguments + arguments + [limit]).fetchall()
+        return [dict(row) for row in rows]
+
+    def lookup(self, code):
+        #Every library the part with this LCSC code was written to
+        with self.lock:
+            return [dict(row) for row in self.connection.execute("SELECT * FROM parts WHERE code = ? ORDER BY library", (code.upper(),))]
+
+    def stats(self):
+        with self.lock:
+            parts, codes, libraries = self.connection.execute("SELECT COUNT(*), COUNT(DISTINCT code), COUNT(DISTINCT library) FROM parts").fetchone()
+        return {"path": self.path, "parts": parts, "codes": codes, "libraries": libraries, "fullText": self.fullText}
+
+    def close(self):
+        with self.lock:
+            self.connection.close()
+
+def scanLibrary(path):
+    """
+    Yields the index record of every deviceset with an LCSC_PART attribute in
+    the library at path. The library is parsed as a stream and every symbol,
+    package and deviceset is dropped once it was read, so only the pin and pad
+    counts per symbol and package are kept.
+    """
+    from xml.etree.ElementTree import iterparse
+    pins = {} #symbol name -> pins
+    pads = {} #package name -> pads and SMDs
+    sections = {}
+    for event, element in iterparse(path, events=("start", "end")):
+        tag = element.tag
+        if event == "start":
+            if tag in ("symbols", "packages", "devicesets"):
+                sections[tag] = element
+            continue
+        if tag == "symbol" and "symbols" in sections:
+            pins[element.get("name")] = len(element.findall("pin"))
+            sections["symbols"].remove(element)
+        elif tag == "package" and "packages" in sections:
+            pads[element.get("name")] = len(element.findall("pad")) + len(element.findall("smd"))
+            sections["packages"].remove(element)
+        elif tag == "deviceset" and "devicesets" in sections:
+            symbols = [gate.get("symbol") for gate in element.iterfind("gates/gate")]
+            for device in element.iterfind("devices/device"):
+                attributes = {attribute.get("name"): attribute.get("value") for attribute in device.iterfind("technologies/technology/attribute")}
+                if attributes.get("LCSC_PART") is None:
+                    continue
+                package = device.get("package") or ""
+                yield indexRecord(attributes["LCSC_PART"], device.get("name") or "", element.get("name"), " ".join(symbols), package, attributes.get("FOOTPRINT"), sum(pins.get(symbol, 0) for symbol in symbols), pads.get(package, 0))
+            sections["devicesets"].remove(element)
+
+def besideCache(cache):
+    #The index in the folder of a download cache, it is not a cache so clearing the cache leaves it alone
+    return PartIndex(os.path.join(cache.cacheDir, INDEX_NAME))
@@ -1,6 +1,9 @@
+import logging
 import api
 import eagleConvert
 
+logging.basicConfig(level=logging.INFO, format="%(message)s") #DEBUG shows every step of every part
+
 eagleConvert.convertSinglePartToEagle("C44598", savePartData=True, saveMetaDict=True)
 
 #eagleConvert.convertMultiplePartsToEagle(["C7545661", "C1880271"], saveMetaDict=True)
@@ -0,0 +1,207 @@
+import json
+import math
+import sys
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+#Times and counts for one conversion run. Stages are the steps every part goes through (resolve, fetch, decode,
+#convert.symbol, convert.footprint, smdPlacement, minimize, serialize, write), elements are the EasyEDA element
+#types converted and counters are plain totals like the elements the minimize pass removed. Adding to a
+#RunMetrics is thread safe so fetch workers can share one. LatencyLog keeps the latencies of a long running
+#service for its p50 and p99.
+
+def percentile(values, fraction):
+    #Nearest rank, values must be sorted
+    if not values:
+        return 0.0
+    return values[min(len(values) - 1, max(0, math.ceil(fraction * len(values)) - 1))]
+
+class ProgressLine:
+    """
+    A single status line redrawn in place on a terminal showing how many
+    items of the current phase are done, the rate and the estimated time left.
+    Redraws at most every `interval` seconds.
+    """
+    def __init__(self, stream=None, interval=0.2):
+        self.stream = stream or sys.stderr
+        self.interval = interval
+        self.phase = None
+        self.total = None
+        self.done = 0
+        self.startTime = 0.0
+        self.drawnAt = 0.0
+        self.drawnDone = None
+        self.width = 0
+
+    def start(self, phase, total=None):
+        self.finish()
+        self.phase = phase
+        self.total = total
+        self.done = 0
+        self.startTime = self.drawnAt = time.perf_counter()
+
+    def advance(self, count=1):
+        self.done += count
+        now = time.perf_counter()
+        if now - self.drawnAt >= self.interval or self.done == self.total:
+            self.drawnAt = now
+            self.draw(now)
+
+    def draw(self, now):
+        elapsed = now - self.startTime
+        rate = self.done / elapsed if elapsed > 0 else 0.0
+        line = f"{self.phase} {self.done}" + (f"/{self.total}" if self.total else "") + f" parts {rate:.1f} parts/s"
+        if self.total and rate > 0:
+            line += f" ETA {max(0.0, (self.total - self.done) / rate):.0f}s"
+        self.stream.write("\r" + line.ljust(self.width))
+        self.stream.flush()
+        self.width = len(line)
+        self.drawnDone = self.done
+
+    def finish(self):
+        if self.phase is not None:
+            if self.drawnDone != self.done:
+                self.draw(time.perf_counter())
+            self.stream.write("\n")
+            self.stream.flush()
+            self.phase = None
+
+class RunMetrics:
+    """
+    Collects the time spent and the number of items handled per stage and per
+    element type for one run, and reports them as a dict for the JSON run
+    report.
+
+    :param progress: True to show a ProgressLine, None to show one only when
+                     stderr is a terminal.
+    """
+    def __init__(self, progress=False):
+        self.stages = {} #stage -> [seconds, count]
+        self.elements = {} #element type -> [seconds, count]
+        self.counters = {} #name -> total
+        self.parts = 0
+        self.lock = threading.Lock()
+        self.startTime = time.perf_counter()
+        if progress is None:
+            progress = sys.stderr.isatty()
+        self.progressLine = ProgressLine() if progress else None
+
+    def add(self, stage, seconds, count=1):
+        with self.lock:
+            totals = self.stages.get(stage)
+            if totals is None:
+                self.stages[stage] = [seconds, count]
+            else:
+                totals[0] += seconds
+                totals[1] += count
+
+    @contextmanager
+    def timer(self, stage, count=1):
+        startTime = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(stage, time.perf_counter() - startTime, count)
+
+    def addElements(self, elementTimes):
+        #elementTimes is element type -> [seconds, count] for one symbol or footprint
+        with self.lock:
+            for elementType, (seconds, count) in elementTimes.items():
+                totals = self.elements.get(elementType)
+                if totals is None:
+                    self.elements[elementType] = [seconds, count]
+                else:
+                    totals[0] += seconds
+                    totals[1] += count
+
+    def count(self, counts):
+        #counts is name -> amount to add
+        with self.lock:
+            for name, amount in counts.items():
+                self.counters[name] = self.counters.get(name, 0) + amount
+
+    def snapshot(self):
+        #Plain lists and dicts so the metrics of a worker process can be sent back and merged
+        with self.lock:
+            return {"stages": {stage: list(totals) for stage, totals in self.stages.items()}, "elements": {elementType: list(totals) for elementType, totals in self.elements.items()}, "counters": dict(self.counters)}
+
+    def merge(self, snapshot):
+        for stage, (seconds, count) in snapshot["stages"].items():
+            self.add(stage, seconds, count)
+        self.addElements(snapshot["elements"])
+        self.count(snapshot["counters"])
+
+    def startPhase(self, phase, total=None):
+        if self.progressLine is not None:
+            with self.lock:
+                self.progressLine.start(phase, total)
+
+    def advance(self, count=1):
+        #Moves the progress line on without counting parts, for phases before parts are written
+        if self.progressLine is not None:
+            with self.lock:
+                self.progressLine.advance(count)
+
+    def partDone(self, count=1):
+        with self.lock:
+            self.parts += count
+            if self.progressLine is not None:
+                self.progressLine.advance(count)
+
+    def finish(self):
+        if self.progressLine is not None:
+            with self.lock:
+                self.progressLine.finish()
+
+    def report(self):
+        elapsed = time.perf_counter() - self.startTime
+        def timings(totals):
+            return {name: {"seconds": round(seconds, 6), "count": count, "perItemMs": round(seconds / count * 1000, 6) if count else 0.0} for name, (seconds, count) in sorted(totals.items())}
+        with self.lock:
+            return {
+                "seconds": round(elapsed, 6),
+                "parts": self.parts,
+                "partsPerSecond": round(self.parts / elapsed, 3) if elapsed > 0 else 0.0,
+                "stages": timings(self.stages),
+                "elements": timings(self.elements),
+                "counters": dict(sorted(self.counters.items()))
+            }
+
+    def writeReport(self, path, extra=None):
+        report = self.report()
+        if extra:
+            report.update(extra)
+        with open(path, "w", encoding="utf-8") as file:
+            json.dump(report, file, indent=2)
+        return report
+
+class LatencyLog:
+    """
+    The latest latencies per kind of request, like warm cache hits and
+    conversions, for a service that runs too long to keep every one.
+
+    :param window: Latencies kept per kind, older ones are dropped.
+    """
+    def __init__(self, window=10000):
+        self.window = window
+        self.latencies = {} #kind -> deque of seconds
+        self.counts = {} #kind -> requests since the start, including the dropped ones
+        self.lock = threading.Lock()
+
+    def add(self, kind, seconds):
+        with self.lock:
+            self.latencies.setdefault(kind, deque(maxlen=self.window)).append(seconds)
+            self.counts[kind] = self.counts.get(kind, 0) + 1
+
+    def report(self):
+        with self.lock:
+            latencies = {kind: sorted(values) for kind, values in self.latencies.items()}
+            counts = dict(self.counts)
+        return {kind: {
+            "count": counts[kind],
+            "p50Ms": round(percentile(values, 0.50) * 1000, 3),
+            "p99Ms": round(percentile(values, 0.99) * 1000, 3),
+            "maxMs": round(values[-1] * 1000, 3)
+        } for kind, values in sorted(latencies.items())}
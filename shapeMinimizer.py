@@ -0,0 +1,240 @@
+from array import array
+
+import libraryWriter
+import shapeRecords
+
+#Shrinks a converted shapeRecords.Shape without changing how it looks. Identical primitives are written once,
+#wires on the same layer with the same width that continue each other in a straight line become one wire, shapes
+#that draw nothing are dropped and polygon outlines lose vertices that sit on a straight edge or repeat the one
+#before. Pins, pads and SMDs are never touched. Wires have round caps in EAGLE, so two collinear wires sharing an
+#end cover exactly the area of the one wire between their outer ends.
+
+TOLERANCE = 1e-9 #Coordinates are rounded to 0.01mm, so this only absorbs floating point error
+
+def cross(ax, ay, bx, by):
+    return ax * by - ay * bx
+
+def isCollinear(ax, ay, bx, by):
+    #Whether vectors a and b lie on one line, scaled so long wires are not treated differently
+    return abs(cross(ax, ay, bx, by)) <= TOLERANCE * max(1.0, abs(ax) + abs(ay)) * max(1.0, abs(bx) + abs(by))
+
+def renderedBytes(tag, content, depth=5):
+    #Size of one child of a symbol or package as LibraryWriter writes it, including its newline
+    return len(libraryWriter.renderFragment(tag, content, depth).encode("utf-8")) + 1
+
+class Minimizer:
+    """
+    Runs the minimize pass over one shape and counts what it removed.
+    counts holds elementsRemoved, wiresMerged, verticesRemoved and
+    bytesRemoved, the bytes the shape is smaller by once written.
+    """
+    def __init__(self):
+        self.counts = {"elementsRemoved": 0, "wiresMerged": 0, "verticesRemoved": 0, "bytesRemoved": 0}
+        self.originals = {} #id of a changed wire -> its dict before the change
+        self.changed = {} #id of a changed wire -> the wire
+
+    def remember(self, record):
+        if id(record) not in self.originals:
+            self.originals[id(record)] = record.toDict()
+
+    def removed(self, records, tag):
+        self.counts["elementsRemoved"] += len(records)
+        for record in records:
+            #A record that was changed before it was dropped is still written as it was
+            self.counts["bytesRemoved"] += renderedBytes(tag, self.originals.pop(id(record), None) or record.toDict())
+
+    def unique(self, records, key):
+        #Keeps the first of every set of records with the same key, in order
+        seen = set()
+        kept = []
+        dropped = []
+        for record in records:
+            recordKey = key(record)
+            if recordKey in seen:
+                dropped.append(record)
+            else:
+                seen.add(recordKey)
+                kept.append(record)
+        return kept, dropped
+
+    def minimize(self, shape):
+        shape.polygon = self.minimizePolygons(shape.polygon)
+        shape.wire = self.minimizeWires(shape.wire)
+        shape.rectangle = self.minimizeRecords(shape.rectangle, "rectangle", lambda rectangle: rectangle.x1 == rectangle.x2 or rectangle.y1 == rectangle.y2, rectangleKey)
+        shape.circle = self.minimizeRecords(shape.circle, "circle", lambda circle: circle.radius == 0 and not circle.width, lambda circle: circle.key())
+        shape.text = self.minimizeRecords(shape.text, "text", lambda text: not str(text.text).strip(), lambda text: text.key())
+        for recordId, original in self.originals.items(): #Records that were changed and kept
+            self.counts["bytesRemoved"] += renderedBytes("wire", original) - renderedBytes("wire", self.changed[recordId].toDict())
+        return shape
+
+    def minimizeRecords(self, records, tag, isEmpty, key):
+        kept = [record for record in records if not isEmpty(record)]
+        self.removed([record for record in records if isEmpty(record)], tag)
+        kept, dropped = self.unique(kept, key)
+        self.removed(dropped, tag)
+        return kept
+
+    #####
+
+    def minimizeWires(self, wires):
+        wires, dropped = self.unique(wires, wireKey)
+        self.removed(dropped, "wire")
+        wires = self.mergeWires(wires)
+        empty = [wire for wire in wires if wire.x1 == wire.x2 and wire.y1 == wire.y2 and not wire.width] #A dot only shows with a width
+        self.removed(empty, "wire")
+        wires = [wire for wire in wires if not (wire.x1 == wire.x2 and wire.y1 == wire.y2 and not wire.width)]
+        wires, dropped = self.unique(wires, wireKey) #Merging can turn two chains into the same wire
+        self.removed(dropped, "wire")
+        return wires
+
+    def mergeWires(self, wires):
+        """
+        Merges wires that share an end, lie on one line and have the same
+        layer and width. The merged wire takes the place of the first of them.
+        """
+        alive = [True] * len(wires)
+        ends = {} #(layer, width, x, y) -> indices of the wires ending there
+        def endKeys(wire):
+            return (wire.layer, wire.width, wire.x1, wire.y1), (wire.layer, wire.width, wire.x2, wire.y2)
+        for index, wire in enumerate(wires):
+            for endKey in endKeys(wire):
+                ends.setdefault(endKey, set()).add(index)
+
+        for index, wire in enumerate(wires):
+            if not alive[index]:
+                continue
+            merging = True
+            while merging:
+                merging = False
+                for endKey in endKeys(wire):
+                    for other in sorted(ends[endKey]):
+                        if other == index or not alive[other]:
+                            continue
+                        merged = mergedEnds(wire, wires[other], endKey[2], endKey[3])
+                        if merged is None:
+                            continue
+                        for key in endKeys(wire):
+                            ends[key].discard(index)
+                        for key in endKeys(wires[other]):
+                            ends[key].discard(other)
+                        self.remember(wire)
+                        self.changed[id(wire)] = wire
+                        wire.x1, wire.y1, wire.x2, wire.y2 = merged
+                        for key in endKeys(wire):
+                            ends.setdefault(key, set()).add(index)
+                        alive[other] = False
+                        self.counts["wiresMerged"] += 1
+                        self.removed([wires[other]], "wire")
+                        merging = True
+                        break
+                    if merging:
+                        break
+
+        keptWires = [wire for index, wire in enumerate(wires) if alive[index]]
+        for wire in wires:
+            if id(wire) in self.originals and wire.toDict() == self.originals[id(wire)]:
+                del self.originals[id(wire)] #Merged back into what it was, like a wire and its own duplicate reversed
+        return keptWires
+
+    #####
+
+    def minimizePolygons(self, records):
+        #Symbols keep the SMD of a POLY pad with their polygons, only the polygons around it are minimized
+        polygons = [record for record in records if isinstance(record, shapeRecords.Polygon)]
+        users = {} #id of a Vertices -> number of polygons drawing it, shared outlines are only simplified once
+        for polygon in polygons:
+            users[id(polygon.vertices)] = users.get(id(polygon.vertices), 0) + 1
+        simplified = set()
+        for polygon in polygons:
+            vertices = polygon.vertices
+            if id(vertices) in simplified:
+                continue
+            simplified.add(id(vertices))
+            removedVertices = simplifyVertices(vertices)
+            if removedVertices:
+                self.counts["verticesRemoved"] += len(removedVertices) * users[id(vertices)]
+                self.counts["bytesRemoved"] += sum(renderedBytes("vertex", {"@x": x, "@y": y}, 6) for x, y in removedVertices) * users[id(vertices)]
+        empty = [polygon for polygon in polygons if len(polygon.vertices) < 3] #Encloses nothing, EAGLE does not draw it
+        self.removed(empty, "polygon")
+        polygons = [polygon for polygon in polygons if len(polygon.vertices) >= 3]
+        polygons, dropped = self.unique(polygons, lambda polygon: polygon.key())
+        self.removed(dropped, "polygon")
+        kept = set(map(id, polygons))
+        return [record for record in records if id(record) in kept or not isinstance(record, shapeRecords.Polygon)]
+
+def wireKey(wire):
+    #The same wire drawn in either direction
+    ends = sorted(((wire.x1, wire.y1), (wire.x2, wire.y2)))
+    return (ends[0], ends[1], wire.width, wire.layer)
+
+def rectangleKey(rectangle):
+    return (min(rectangle.x1, rectangle.x2), min(rectangle.y1, rectangle.y2), max(rectangle.x1, rectangle.x2), max(rectangle.y1, rectangle.y2), rectangle.layer)
+
+def mergedEnds(wire, other, x, y):
+    """
+    Returns the ends (x1, y1, x2, y2) of the one wire covering both wires,
+    which share the end at x, y, or None when they do not lie on one line.
+    """
+    ax, ay = (wire.x2, wire.y2) if (wire.x1, wire.y1) == (x, y) else (wire.x1, wire.y1)
+    bx, by = (other.x2, other.y2) if (other.x1, other.y1) == (x, y) else (other.x1, other.y1)
+    if (ax, ay) == (x, y): #wire is a dot inside the end of other
+        return other.x1, other.y1, other.x2, other.y2
+    if (bx, by) == (x, y):
+        return wire.x1, wire.y1, wire.x2, wire.y2
+    if not isCollinear(ax - x, ay - y, bx - x, by - y):
+        return None
+    if (ax - x) * (bx - x) + (ay - y) * (by - y) < 0: #On both sides of the shared end, the wire runs from one far end to the other
+        return (ax, ay, bx, by) if (wire.x1, wire.y1) != (x, y) else (bx, by, ax, ay)
+    #Both run the same way from the shared end, the longer one covers the other
+    if (ax - x) ** 2 + (ay - y) ** 2 >= (bx - x) ** 2 + (by - y) ** 2:
+        return wire.x1, wire.y1, wire.x2, wire.y2
+    return (x, y, bx, by) if (wire.x1, wire.y1) == (x, y) else (bx, by, x, y)
+
+def simplifyVertices(vertices):
+    """
+    Removes the vertices of a closed outline that repeat the vertex before
+    them or sit on a straight line between their neighbours, as long as no
+    arc starts or ends at them and at least 3 vertices are left. Changes
+    vertices in place and returns the (x, y) of the vertices removed.
+    """
+    points = vertices.points()
+    curves = vertices.curves or {}
+    def removable(before, index, after):
+        #A vertex's curve bends the edge from it to the next vertex, so the edges into and out of index have to stay straight
+        if before in curves or index in curves:
+            return False
+        (x, y), (beforeX, beforeY), (afterX, afterY) = points[index], points[before], points[after]
+        if (x, y) == (beforeX, beforeY):
+            return True
+        #Only when the outline carries on past it, a spike that turns back is drawn
+        return isCollinear(x - beforeX, y - beforeY, afterX - x, afterY - y) and (x - beforeX) * (afterX - x) + (y - beforeY) * (afterY - y) > 0
+
+    kept = [] #Indices of the vertices kept so far
+    for index in range(len(points)):
+        while len(kept) >= 2 and removable(kept[-2], kept[-1], index):
+            kept.pop()
+        kept.append(index)
+    while len(kept) > 3: #The outline is closed, so the first and last vertices are neighbours
+        if removable(kept[-2], kept[-1], kept[0]):
+            kept.pop()
+        elif removable(kept[-1], kept[0], kept[1]):
+            kept.pop(0)
+        else:
+            break
+    if len(kept) < 3 or len(kept) == len(points): #Too little left to enclose an area, leave it as it was
+        return []
+
+    keptSet = set(kept)
+    removed = [point for index, point in enumerate(points) if index not in keptSet]
+    vertices.coordinates = array("d", [value for index in kept for value in points[index]])
+    vertices.curves = {position: curves[index] for position, index in enumerate(kept) if index in curves} or None
+    return removed
+
+def minimizeShape(shape):
+    """
+    Runs the minimize pass over shape in place and returns the counts of what
+    it removed, see Minimizer.
+    """
+    minimizer = Minimizer()
+    minimizer.minimize(shape)
+    return minimizer.counts
@@ -0,0 +1,194 @@
+import hashlib
+from array import array
+
+#Compact records for converted symbols and footprints. Converting fills these in and they are only
+#turned into the xmltodict style dicts the writers take when a shape is written. Attributes are written
+#in __slots__ order and left out when None. Layers are small ints, which Python already shares.
+
+class Record:
+    __slots__ = ()
+    TAG = None
+
+    def toDict(self):
+        attributes = {}
+        for slot in self.__slots__:
+            value = getattr(self, slot)
+            if value is not None:
+                attributes["@" + slot] = value
+        return attributes
+
+    def key(self):
+        return (self.TAG,) + tuple(getattr(self, slot) for slot in self.__slots__)
+
+class Wire(Record):
+    __slots__ = ("x1", "y1", "x2", "y2", "width", "layer")
+    TAG = "wire"
+
+    def __init__(self, x1, y1, x2, y2, width, layer):
+        self.x1 = x1
+        self.y1 = y1
+        self.x2 = x2
+        self.y2 = y2
+        self.width = width
+        self.layer = layer
+
+class Rectangle(Record):
+    __slots__ = ("x1", "y1", "x2", "y2", "layer")
+    TAG = "rectangle"
+
+    def __init__(self, x1, y1, x2, y2, layer):
+        self.x1 = x1
+        self.y1 = y1
+        self.x2 = x2
+        self.y2 = y2
+        self.layer = layer
+
+class Circle(Record):
+    __slots__ = ("x", "y", "radius", "width", "layer")
+    TAG = "circle"
+
+    def __init__(self, x, y, radius, width, layer):
+        self.x = x
+        self.y = y
+        self.radius = radius
+        self.width = width
+        self.layer = layer
+
+class Pin(Record):
+    __slots__ = ("name", "x", "y", "length", "direction", "rot")
+    TAG = "pin"
+
+    def __init__(self, name, x, y, length, direction, rot):
+        self.name = name
+        self.x = x
+        self.y = y
+        self.length = length
+        self.direction = direction
+        self.rot = rot
+
+class Pad(Record):
+    __slots__ = ("name", "x", "y", "drill", "diameter", "slotLength", "shape", "rot")
+    TAG = "pad"
+
+    def __init__(self, name, x, y, drill, diameter, slotLength=None, shape=None, rot=None):
+        self.name = name
+        self.x = x
+        self.y = y
+        self.drill = drill
+        self.diameter = diameter
+        self.slotLength = slotLength
+        self.shape = shape
+        self.rot = rot
+
+class Smd(Record):
+    __slots__ = ("name", "x", "y", "dx", "dy", "layer", "roundness", "rot")
+    TAG = "smd"
+
+    def __init__(self, name, x, y, dx, dy, layer, roundness=None, rot=None):
+        self.name = name
+        self.x = x
+        self.y = y
+        self.dx = dx
+        self.dy = dy
+        self.layer = layer
+        self.roundness = roundness
+        self.rot = rot
+
+class Vertices:
+    """
+    The vertices of a polygon as one flat array of x, y pairs. Polygons that
+    share an outline, like the copper, solder and stencil layers of a POLY
+    pad, share one Vertices.
+    """
+    __slots__ = ("coordinates", "curves")
+
+    def __init__(self, coordinates, curves=None):
+        self.coordinates = array("d", coordinates)
+        self.curves = curves #Vertex index -> curve of the edge from it to the next vertex, or None
+
+    def __len__(self):
+        return len(self.coordinates) // 2
+
+    def points(self):
+        coordinates = self.coordinates
+        return list(zip(coordinates[0::2], coordinates[1::2]))
+
+    def toDicts(self):
+        vertexData = [{"@x": x, "@y": y} for x, y in self.points()]
+        if self.curves:
+            for index, curve in self.curves.items():
+                vertexData[index]["@curve"] = curve
+        return vertexData
+
+    def key(self):
+        return (self.coordinates.tobytes(), tuple(sorted(self.curves.items())) if self.curves else ())
+
+class Polygon(Record):
+    __slots__ = ("width", "layer", "pour", "vertices")
+    TAG = "polygon"
+
+    def __init__(self, width, layer, pour, vertices):
+        self.width = width
+        self.layer = layer
+        self.pour = pour
+        self.vertices = vertices
+
+    def toDict(self, materialized=None):
+        #materialized keeps one vertex list per Vertices so shared outlines stay shared
+        if materialized is None:
+            vertexData = self.vertices.toDicts()
+        else:
+            vertexData = materialized.get(id(self.vertices))
+            if vertexData is None:
+                vertexData = materialized[id(self.vertices)] = self.vertices.toDicts()
+        return {"@width": self.width, "@layer": self.layer, "@pour": self.pour, "vertex": vertexData}
+
+    def key(self):
+        return (self.TAG, self.width, self.layer, self.pour, self.vertices.key())
+
+class Text(Record):
+    __slots__ = ("x", "y", "size", "layer", "align", "text")
+    TAG = "text"
+
+    def __init__(self, x, y, size, layer, align, text):
+        self.x = x
+        self.y = y
+        self.size = size
+        self.layer = layer
+        self.align = align
+        self.text = text
+
+    def toDict(self):
+        return {"@x": self.x, "@y": self.y, "@size": self.size, "@layer": self.layer, "@align": self.align, "#text": self.text}
+
+class Shape:
+    """
+    A converted symbol or footprint. Each list holds the records written as
+    that element, in the order they were converted.
+    """
+    __slots__ = ("name", "wire", "rectangle", "circle", "pin", "pad", "smd", "polygon", "text")
+    LISTS = __slots__[1:]
+
+    def __init__(self, name):
+        self.name = name
+        self.wire = []
+        self.rectangle = []
+        self.circle = []
+        self.pin = []
+        self.pad = []
+        self.smd = []
+        self.polygon = []
+        self.text = []
+
+    def toDict(self):
+        #Same layout as the dicts the writers always took
+        shapeDict = {"@name": self.name}
+        materialized = {}
+        for listName in self.LISTS:
+            shapeDict[listName] = [record.toDict(materialized) if isinstance(record, Polygon) else record.toDict() for record in getattr(self, listName)]
+        return shapeDict
+
+    def contentKey(self):
+        #Hash of everything except the name, shapes with the same key are written the same way
+        content = tuple((listName, tuple(record.key() for record in getattr(self, listName))) for listName in self.LISTS)
+        return hashlib.sha1(repr(content).encode("utf-8")).digest()
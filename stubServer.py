@@ -0,0 +1,206 @@
+import argparse
+import contextlib
+import json
+import os
+import random
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import syntheticParts
+
+#A local stand-in for the two EasyEDA endpoints api uses, devices/searchByCodes and v2/components/{uuid}.
+#It serves recorded or synthetic payloads and can add latency, jitter, server errors and 429 rate limiting
+#so batch jobs can be load tested without touching pro.easyeda.com. Point api at it with api.setBaseUrl(server.url)
+#or the EASYEDA_API_URL environment variable.
+
+class RateLimiter:
+    """
+    Token bucket allowing `rate` requests per second with bursts of up to
+    `burst` requests. take() returns 0 when a request may go ahead, or the
+    seconds until the next token otherwise.
+    """
+    def __init__(self, rate, burst=None):
+        self.rate = rate
+        self.burst = burst or max(1.0, rate)
+        self.tokens = self.burst
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def take(self):
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return 0.0
+            return (1 - self.tokens) / self.rate
+
+class StubServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, partInfos, components, latency=0.0, jitter=0.0, errorRate=0.0, rateLimit=None, host="127.0.0.1", port=0, seed=None):
+        super().__init__((host, port), StubHandler)
+        self.partInfos = partInfos #LCSC code -> part info as searchByCodes returns it
+        self.components = components #uuid -> {"dataStr", "display_title"}
+        self.latency = latency #Seconds added to every response
+        self.jitter = jitter #Up to this many seconds more, picked at random per request
+        self.errorRate = errorRate #Share of requests answered with a 503
+        self.rateLimiter = RateLimiter(rateLimit) if rateLimit else None
+        self.random = random.Random(seed)
+        self.counts = {"requests": 0, "errors": 0, "rateLimited": 0}
+        self.countLock = threading.Lock()
+
+    @property
+    def url(self):
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def count(self, name):
+        with self.countLock:
+            self.counts[name] += 1
+
+    def fault(self):
+        """
+        Decides what happens to the next request. Returns (delay, status) where
+        status is None for a normal response.
+        """
+        with self.countLock:
+            delay = self.latency + (self.random.uniform(0, self.jitter) if self.jitter else 0.0)
+            failed = self.errorRate and self.random.random() < self.errorRate
+        if self.rateLimiter is not None:
+            retryAfter = self.rateLimiter.take()
+            if retryAfter:
+                return retryAfter, 429
+        return delay, 503 if failed else None
+
+    def start(self):
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1" #Keep-alive so pooled connections are actually reused
+    disable_nagle_algorithm = True
+
+    def sendJson(self, status, body, headers=()):
+        data = json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        for name, value in headers:
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def respond(self, result):
+        #result is only called for requests that get a normal response
+        server = self.server
+        server.count("requests")
+        delay, status = server.fault()
+        if status == 429:
+            server.count("rateLimited")
+            #Fractional seconds so short load tests do not stall, api also accepts the whole seconds EasyEDA sends
+            self.sendJson(429, {"result": None}, [("Retry-After", f"{delay:.3f}")])
+            return
+        if delay:
+            time.sleep(delay)
+        if status is not None:
+            server.count("errors")
+            self.sendJson(status, {"result": None})
+            return
+        status, body = result()
+        self.sendJson(status, body)
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length", 0))
+        form = parse_qs(self.rfile.read(length).decode("utf-8"))
+        if urlparse(self.path).path.rstrip("/").endswith("/devices/searchByCodes"):
+            partInfos = self.server.partInfos
+            codes = form.get("codes[]", [])
+            self.respond(lambda: (200, {"result": [partInfos[code] for code in codes if code in partInfos]}))
+        else:
+            self.sendJson(404, {"result": None})
+
+    def do_GET(self):
+        path = urlparse(self.path).path
+        if "/v2/components/" in path:
+            uuid = path.rsplit("/", 1)[-1]
+            component = self.server.components.get(uuid)
+            self.respond(lambda: (200, {"result": component}) if component is not None else (404, {"result": None}))
+        else:
+            self.sendJson(404, {"result": None})
+
+    def log_message(self, format, *args):
+        pass
+
+def loadFixtureCatalog(directory):
+    """
+    Returns (partInfos, components) built from the fixtures `benchmark.py record`
+    writes, one JSON file per part holding its partInfo, symbol and footprint.
+    """
+    partInfos = {}
+    components = {}
+    for fileName in sorted(os.listdir(directory)):
+        if not fileName.endswith(".json"):
+            continue
+        with open(os.path.join(directory, fileName), encoding="utf-8") as file:
+            fixture = json.load(file)
+        partInfo = fixture["partInfo"]
+        partInfos[partInfo["product_code"]] = partInfo
+        components[partInfo["attributes"]["Symbol"]] = fixture["symbol"]
+        components[partInfo["attributes"]["Footprint"]] = fixture["footprint"]
+    return partInfos, components
+
+def startStubServer(partInfos, components, **options):
+    return StubServer(partInfos, components, **options).start()
+
+@contextlib.contextmanager
+def usingStubServer(partInfos, components, **options):
+    """
+    Points api at a stub server with an empty cache for the duration of the
+    with block and yields the server. Retries back off for a millisecond
+    only. Everything is put back and the server stopped afterwards.
+    """
+    import api
+    import partCache
+    server = startStubServer(partInfos, components, **options)
+    previous = api.baseUrl, api.cache, api.retryBackoff
+    with tempfile.TemporaryDirectory() as cacheDir:
+        api.setBaseUrl(server.url)
+        api.cache = partCache.PartCache(cacheDir)
+        api.retryBackoff = 0.001
+        api.clearComponentMemo()
+        try:
+            yield server
+        finally:
+            api.clearComponentMemo()
+            api.baseUrl, api.cache, api.retryBackoff = previous
+            server.shutdown()
+            server.server_close()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Local stand-in for the EasyEDA API")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--fixtures", default=None, help="Serve the parts recorded in this directory")
+    parser.add_argument("--parts", type=int, default=64, help="Synthetic parts to serve when there are no fixtures")
+    parser.add_argument("--latency", type=float, default=0.0)
+    parser.add_argument("--jitter", type=float, default=0.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--rate-limit", type=float, default=None, help="Requests per second before answering 429")
+    parser.add_argument("--seed", type=int, default=None)
+    args = parser.parse_args()
+
+    if args.fixtures:
+        partInfos, components = loadFixtureCatalog(args.fixtures)
+    else:
+        partInfos, components = syntheticParts.makeCatalog(args.parts)
+    server = StubServer(partInfos, components, latency=args.latency, jitter=args.jitter, errorRate=args.error_rate, rateLimit=args.rate_limit, port=args.port, seed=args.seed)
+    print(f"Serving {len(partInfos)} parts on {server.url}, use EASYEDA_API_URL={server.url}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    print(f"Requests: {server.counts}")
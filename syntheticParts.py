@@ -0,0 +1,113 @@
+import json
+import math
+import random
+
+#Generates EasyEDA style symbol and footprint data so the converter can be exercised without the API.
+#The layout of each row matches what convertPhrasedToXML reads from the real dataStr.
+
+PIN_TYPES = ["IN", "OUT", "Bidirectional", "Passive", "Power", "GND"]
+
+def symbolItems(pinCount, seed=0):
+    rand = random.Random(seed)
+    rows = (pinCount + 1) // 2
+    items = [
+        ["CANVAS", "e0", 0, "mm"],
+        ["RECT", "e1", -30, -10, 30, rows * 10 + 10, 0, 0]
+    ]
+    for pin in range(pinCount):
+        pinId = f"p{pin}"
+        side = -1 if pin < rows else 1
+        items.append(["PIN", pinId, 1, 1, side * 50, (pin % rows) * 10, 20, 0 if side < 0 else 180, 0])
+        items.append(["ATTR", f"n{pin}", pinId, "NUMBER", str(pin + 1), False])
+        items.append(["ATTR", f"t{pin}", pinId, "Pin Type", rand.choice(PIN_TYPES), False])
+        items.append(["ATTR", f"a{pin}", pinId, "NAME", f"P{pin + 1}", False])
+    items.append(["STRING", "e2", 0, 3, 0, -20, "U?", 0, 10, 0, 0, 0, 1])
+    return items
+
+def polyPath(centerX, centerY, radius, vertexCount, arcEvery=0):
+    #With arcEvery set, every arcEvery-th vertex is reached with an ARC instead of a line
+    path = []
+    command = "L"
+    for vertex in range(vertexCount):
+        angle = 2 * math.pi * vertex / vertexCount
+        scale = radius if vertex % 2 == 0 else radius * 0.8
+        point = [round(centerX + scale * math.cos(angle), 3), round(centerY + scale * math.sin(angle), 3)]
+        if vertex > 0 and arcEvery and vertex % arcEvery == 0:
+            path += ["ARC", 45] + point
+            command = "ARC"
+        else:
+            if command != "L" and vertex > 0:
+                path.append("L")
+                command = "L"
+            path += point
+        if vertex == 0:
+            path.append("L")
+    return path
+
+def footprintItems(padCount, seed=0, polyPads=0, polyVertices=8, logoVertices=0, lineCount=0, logoArcEvery=0):
+    rand = random.Random(seed)
+    items = [["CANVAS", "e0", 0, "mm"]]
+    columns = max(1, int(padCount ** 0.5))
+    for pad in range(padCount):
+        x = (pad % columns) * 20
+        y = (pad // columns) * 20
+        kind = pad % 4
+        if kind == 0:
+            items.append(["PAD", f"d{pad}", 0, 0, 1, str(pad + 1), x, y, 0, None, ["RECT", 10, 6]])
+        elif kind == 1:
+            items.append(["PAD", f"d{pad}", 0, 0, 1, str(pad + 1), x, y, 90, None, ["OVAL", 10, 6]])
+        elif kind == 2:
+            items.append(["PAD", f"d{pad}", 0, 0, 12, str(pad + 1), x, y, 0, ["ROUND", 4, 4], ["RECT", 8, 8]])
+        else:
+            items.append(["PAD", f"d{pad}", 0, 0, 12, str(pad + 1), x, y, 0, ["ROUND", 4, 4], ["ELLIPSE", 8, 8]])
+    for pad in range(polyPads):
+        path = polyPath(-100 - pad * 60, 0, 20 + rand.random() * 5, polyVertices)
+        items.append(["PAD", f"q{pad}", 0, 0, 1, str(padCount + pad + 1), 0, 0, 0, None, ["POLY", path]])
+    items.append(["POLY", "e1", 0, 0, 3, 1, [-20, -20, "L", columns * 20, -20, columns * 20, -30]])
+    for line in range(lineCount): #Silkscreen outline segments
+        x = rand.randint(-50, 50)
+        y = rand.randint(-50, 50)
+        items.append(["POLY", f"l{line}", 0, 0, 3, 1, [x, y, "L", x + rand.randint(1, 20), y]])
+    if logoVertices:
+        items.append(["FILL", "e2", 0, 0, 3, 1, 0, [polyPath(0, -200, 80, logoVertices, logoArcEvery)]])
+    items.append(["STRING", "e3", 0, 3, 0, -40, "REF", 0, 10, 0, 0, 0, 1])
+    return items
+
+def dataStr(items):
+    return "\n".join(json.dumps(item) for item in items)
+
+def partCode(index):
+    return f"C{900000 + index}"
+
+def makePart(index, pinCount=8, sharedVariants=None, **footprintOptions):
+    """
+    Returns the searchByCodes result and the two component payloads for a synthetic part.
+    With sharedVariants set, parts reuse one of that many symbols and footprints
+    the same way every 0402 resistor shares one Symbol uuid on EasyEDA.
+    """
+    code = partCode(index)
+    variant = index if sharedVariants is None else index % sharedVariants
+    symbolUuid = f"sym{variant:06d}"
+    footprintUuid = f"fp{variant:06d}"
+    partInfo = {
+        "uuid": f"dev{index:06d}",
+        "product_code": code,
+        "attributes": {"Symbol": symbolUuid, "Footprint": footprintUuid}
+    }
+    components = {
+        symbolUuid: {"dataStr": dataStr(symbolItems(pinCount, variant)), "display_title": f"SYNTH {pinCount}PIN {variant}"},
+        footprintUuid: {"dataStr": dataStr(footprintItems(pinCount, variant, **footprintOptions)), "display_title": f"SYNTH-FP {pinCount}PIN {variant}"}
+    }
+    return partInfo, components
+
+def makeCatalog(partCount, pinCount=8, sharedVariants=None, **footprintOptions):
+    """
+    Returns (partInfos keyed by LCSC code, component payloads keyed by uuid).
+    """
+    partInfos = {}
+    components = {}
+    for index in range(partCount):
+        partInfo, partComponents = makePart(index, pinCount, sharedVariants, **footprintOptions)
+        partInfos[partInfo["product_code"]] = partInfo
+        components.update(partComponents)
+    return partInfos, components
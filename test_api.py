@@ -0,0 +1,92 @@
+import requests
+
+import api
+import batchJob
+import eagleConvert
+import stubServer
+import syntheticParts
+
+#Resolving LCSC codes against the local stub server with a fresh cache, nothing is downloaded from EasyEDA.
+#apiTest.py is the manual check against the real API. Run with python -m pytest test_api.py
+
+def respondWith(status):
+    #A sendRequest answering every request with status
+    response = requests.Response()
+    response.status_code = status
+    response.url = f"{api.baseUrl}/devices/searchByCodes"
+    return lambda *args, **kwargs: response
+
+def failingFor(failCode):
+    #A searchByCodes whose batches holding failCode fail
+    searchByCodes = api.searchByCodes
+    def search(partNums):
+        if failCode in partNums:
+            raise requests.HTTPError("500 Server Error")
+        return searchByCodes(partNums)
+    return search
+
+######################## Statuses ########################
+
+def testRedirectIsAnError():
+    sendRequest = api.sendRequest
+    api.sendRequest = respondWith(302)
+    try:
+        api.searchByCodes(["C1"])
+    except requests.HTTPError as e:
+        assert "302" in str(e)
+    else:
+        raise AssertionError("searchByCodes returned on a 302")
+    finally:
+        api.sendRequest = sendRequest
+
+def testCodesAreMatchedAsEasyEdaWritesThem():
+    partInfos, components = syntheticParts.makeCatalog(1)
+    with stubServer.usingStubServer(partInfos, components) as server:
+        assert api.resolvePartNums([" c900000", "C900000", "c1"]) == ({" c900000": partInfos["C900000"], "C900000": partInfos["C900000"]}, ["c1"])
+        assert api.resolvePartNums(["c900000 "]) == ({"c900000 ": partInfos["C900000"]}, []) #From the cache
+        assert server.counts["requests"] == 1
+
+######################## Failed Batches ########################
+#One failing batch of searchByCodes must not lose the batches that were resolved
+
+def testFailedBatchIsReported():
+    partInfos, components = syntheticParts.makeCatalog(6)
+    codes = list(partInfos) + ["C1"]
+    searchByCodes = api.searchByCodes
+    with stubServer.usingStubServer(partInfos, components):
+        api.searchByCodes = failingFor("C900002")
+        try:
+            failures = {}
+            found, unknown = api.resolvePartNums(codes, batchSize=2, workers=4, failures=failures)
+            assert sorted(found) == ["C900000", "C900001", "C900004", "C900005"]
+            assert sorted(failures) == ["C900002", "C900003"]
+            assert unknown == ["C1"]
+            try:
+                api.resolvePartNums(codes, batchSize=2, workers=4)
+            except requests.HTTPError:
+                pass
+            else:
+                raise AssertionError("the failed batch was not raised")
+        finally:
+            api.searchByCodes = searchByCodes
+        assert api.resolvePartNums(codes, batchSize=2) == ({code: partInfos[code] for code in partInfos}, ["C1"])
+
+def testFailedBatchFailsOnlyItsParts():
+    partInfos, components = syntheticParts.makeCatalog(4)
+    searchByCodes, batchSize = api.searchByCodes, api.searchBatchSize
+    with stubServer.usingStubServer(partInfos, components):
+        api.searchByCodes, api.searchBatchSize = failingFor("C900000"), 2
+        try:
+            failures = []
+            parts, unknown = eagleConvert.streamPartsResumable(list(partInfos), workers=2, retryPolicy=batchJob.RetryPolicy(backoff=0), failures=failures)
+            assert [partData["partNumb"] for partData in parts] == ["C900002", "C900003"]
+        finally:
+            api.searchByCodes, api.searchBatchSize = searchByCodes, batchSize
+    assert [(failure["partNum"], failure["stage"]) for failure in failures] == [("C900000", "resolve"), ("C900001", "resolve")]
+    assert unknown == []
+
+if __name__ == "__main__":
+    for name, test in list(globals().items()):
+        if name.startswith("test") and callable(test):
+            test()
+            print(name, "passed")
@@ -0,0 +1,87 @@
+import os
+import tempfile
+
+import api
+import batchJob
+import eagleConvert
+import stubServer
+import syntheticParts
+
+#Batch fetching against the local stub server with a fresh cache, nothing is downloaded from EasyEDA.
+#Run with python -m pytest test_batchJob.py
+
+def streamParts(partNums, **options):
+    failures = []
+    parts, unknown = eagleConvert.streamPartsResumable(partNums, workers=2, retryPolicy=batchJob.RetryPolicy(backoff=0), failures=failures, **options)
+    return list(parts), unknown, failures
+
+######################## Retries ########################
+#api.sendRequest retries rate limits and server errors, the RetryPolicy must not retry them a second time
+
+def testMissingComponentIsNotRetried():
+    partInfos, components = syntheticParts.makeCatalog(2)
+    del components[partInfos["C900001"]["attributes"]["Footprint"]]
+    with stubServer.usingStubServer(partInfos, components) as server:
+        parts, unknown, failures = streamParts(["C900000", "C900001"])
+        #One search and two components per part, the 404 is asked for once
+        assert server.counts["requests"] == 5
+    assert [partData["partNumb"] for partData in parts] == ["C900000"]
+    assert [(failure["partNum"], failure["stage"], failure["attempts"]) for failure in failures] == [("C900001", "fetch", 1)]
+
+def testServerErrorIsRetriedOnce():
+    partInfos, components = syntheticParts.makeCatalog(1)
+    with stubServer.usingStubServer(partInfos, components, errorRate=1.0) as server:
+        parts, unknown, failures = streamParts(["C900000"])
+        assert server.counts["requests"] == api.maxRetries + 1
+    assert parts == []
+    assert [(failure["stage"], failure["attempts"]) for failure in failures] == [("resolve", 1)]
+
+def testOtherErrorsAreRetried():
+    calls = []
+    def flaky():
+        calls.append(None)
+        if len(calls) < 3:
+            raise TimeoutError("slow disk")
+        return "done"
+    assert batchJob.RetryPolicy(backoff=0).call("fetch", flaky) == "done"
+    assert len(calls) == 3
+
+######################## Resuming ########################
+#A rerun loads the parts the journal holds and only fetches the rest
+
+def testResumeLoadsSavedParts():
+    partInfos, components = syntheticParts.makeCatalog(2)
+    with stubServer.usingStubServer(partInfos, components) as server, tempfile.TemporaryDirectory() as jobDir:
+        journal = batchJob.CheckpointJournal(jobDir)
+        parts, unknown, failures = streamParts(["C900000", "C900001"], journal=journal)
+        journal.close()
+        requests = server.counts["requests"]
+        journal = batchJob.CheckpointJournal(jobDir)
+        resumed, unknown, failures = streamParts([" c900001", "c900000"], journal=journal) #Asked for differently this time
+        journal.close()
+        assert server.counts["requests"] == requests
+    assert [partData["partNumb"] for partData in resumed] == ["C900001", "C900000"]
+    assert resumed == parts[::-1]
+
+def testRerunOnlyFetchesFailedParts():
+    partInfos, components = syntheticParts.makeCatalog(3)
+    footprint = partInfos["C900001"]["attributes"]["Footprint"]
+    missing = components.pop(footprint)
+    with stubServer.usingStubServer(partInfos, components) as server, tempfile.TemporaryDirectory() as directory:
+        outputPath = os.path.join(directory, "library.lbr")
+        options = {"outputPath": outputPath, "checkpoint": True, "reuseFragments": False, "updateIndex": False, "progress": False, "retryPolicy": batchJob.RetryPolicy(backoff=0)}
+        report = eagleConvert.convertMultiplePartsToEagle(list(partInfos), **options)
+        assert [failure["partNum"] for failure in report["failed"]] == ["C900001"]
+        assert os.path.isdir(os.path.join(directory, "library.job"))
+        server.components[footprint] = missing
+        requests = server.counts["requests"]
+        report = eagleConvert.convertMultiplePartsToEagle(list(partInfos), **options)
+        assert server.counts["requests"] == requests + 1 #Only the footprint that was missing, everything else is journaled or cached
+        assert report["failed"] == [] and report["written"] == 3
+        assert not os.path.exists(os.path.join(directory, "library.job"))
+
+if __name__ == "__main__":
+    for name, test in list(globals().items()):
+        if name.startswith("test") and callable(test):
+            test()
+            print(name, "passed")
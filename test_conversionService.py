@@ -0,0 +1,83 @@
+import threading
+
+import api
+import conversionService
+import fragmentCache
+import stubServer
+import syntheticParts
+
+#The conversion service against the local stub server with a fresh cache, nothing is downloaded from EasyEDA.
+#Run with python -m pytest test_conversionService.py
+
+def inParallel(function, argumentsList):
+    #Calls function once per arguments on its own thread, all at once, and returns the results in order
+    results = [None] * len(argumentsList)
+    start = threading.Barrier(len(argumentsList))
+    def run(position, arguments):
+        start.wait()
+        results[position] = function(*arguments)
+    threads = [threading.Thread(target=run, args=(position, arguments)) for position, arguments in enumerate(argumentsList)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results
+
+def newService():
+    return conversionService.ConversionService(workers=2, fragments=fragmentCache.besideCache(api.cache))
+
+######################## Sharing Work ########################
+
+def testOrderOfCodesDoesNotMatter():
+    partInfos, components = syntheticParts.makeCatalog(2)
+    with stubServer.usingStubServer(partInfos, components):
+        service = newService()
+        first, served = service.library(["C900000", "C900001"])
+        assert served == "converted"
+        assert service.library(["C900001", "C900000", "C900001"]) == (first, "hit")
+        assert first.index(b"C900000") < first.index(b"C900001")
+
+def testConcurrentRequestsFetchEachPartOnce():
+    partInfos, components = syntheticParts.makeCatalog(2)
+    with stubServer.usingStubServer(partInfos, components, latency=0.2):
+        service = newService()
+        results = inParallel(service.library, [(["C900000"],), (["C900000", "C900001"],), (["C900001", "C900000"],)])
+        assert sorted(served for library, served in results) == ["coalesced", "converted", "converted"]
+        assert service.partCounts == {"fetched": 2, "shared": 1}
+        assert results[1][0] == results[2][0]
+
+def testUnknownPartsAreReported():
+    partInfos, components = syntheticParts.makeCatalog(1)
+    with stubServer.usingStubServer(partInfos, components):
+        try:
+            newService().library(["C900000", "C1"])
+        except conversionService.UnknownParts as e:
+            assert e.partNums == ["C1"]
+        else:
+            raise AssertionError("C1 is not in the catalog")
+
+######################## Component Memo ########################
+#api's component memo is process wide, it is only cleared once no request is fetching parts
+
+def testMemoIsClearedWhenNothingIsFetched():
+    partInfos, components = syntheticParts.makeCatalog(4)
+    cleared = []
+    finishBatch = api.finishBatch
+    def recordingFinishBatch():
+        cleared.append(service.converting)
+        finishBatch()
+    with stubServer.usingStubServer(partInfos, components, latency=0.05):
+        service = newService()
+        api.finishBatch = recordingFinishBatch
+        try:
+            inParallel(service.library, [([partNum],) for partNum in partInfos])
+        finally:
+            api.finishBatch = finishBatch
+        assert cleared and set(cleared) == {0}
+        assert not api.componentMemo
+
+if __name__ == "__main__":
+    for name, test in list(globals().items()):
+        if name.startswith("test") and callable(test):
+            test()
+            print(name, "passed")
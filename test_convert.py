@@ -0,0 +1,169 @@
+import math
+import tempfile
+import xml.etree.ElementTree as ElementTree
+
+import api
+import eagleConvert
+import fragmentCache
+import partCache
+import shapeMinimizer
+import shapeRecords
+import syntheticParts
+
+#Offline checks of the converter on synthetic EasyEDA data, nothing is downloaded.
+#Run with python test_convert.py or python -m pytest
+
+def phrasedItems(items):
+    return eagleConvert.parsePartData(api.parseDataStr(syntheticParts.dataStr(items)))
+
+def syntheticPartData(index=0, extraFootprintItems=(), sharedVariants=None):
+    #The partData fetchPartData returns for a synthetic part
+    partInfo, components = syntheticParts.makePart(index, sharedVariants=sharedVariants)
+    symbol, footprint = (components[partInfo["attributes"][kind]] for kind in ("Symbol", "Footprint"))
+    return {
+        "partInfo": partInfo,
+        "partSymbolPhrased": eagleConvert.parsePartData(api.parseDataStr(symbol["dataStr"])),
+        "partFootprintPhrased": eagleConvert.parsePartData(api.parseDataStr(footprint["dataStr"])) + phrasedItems(extraFootprintItems),
+        "partName": symbol["display_title"].replace(" ", "-"),
+        "partNumb": partInfo["product_code"],
+        "footprintName": footprint["display_title"]
+    }
+
+def withMinimize(minimize, function, *args, **kwargs):
+    previous = eagleConvert.minimizeShapes
+    eagleConvert.minimizeShapes = minimize
+    try:
+        return function(*args, **kwargs)
+    finally:
+        eagleConvert.minimizeShapes = previous
+
+def convertSymbolItems(items, minimize=True):
+    return withMinimize(minimize, eagleConvert.convertItems, phrasedItems(items), "TEST", eagleConvert.ConversionContext("C1", True))[0]
+
+def libraryContents(library):
+    #The symbol and package names of a library and, per deviceset, the symbol and package it uses
+    root = ElementTree.fromstring(library.split("\n", 2)[2]) #Without the XML declaration and doctype
+    contents = {tag: [element.get("name") for element in root.iter(tag)] for tag in ("symbol", "package")}
+    contents["devicesets"] = {deviceset.get("name"): (deviceset.find("gates/gate").get("symbol"), deviceset.find("devices/device").get("package")) for deviceset in root.iter("deviceset")}
+    return contents
+
+######################## Shared Symbols and Packages ########################
+
+def testIdenticalShapesAreWrittenOnce():
+    partDataList = [syntheticPartData(index, sharedVariants=2) for index in range(6)]
+    stats = {}
+    contents = libraryContents(eagleConvert.createXML(partDataList, stats=stats))
+    assert contents["symbol"] == ["SYNTH-8PIN-0", "SYNTH-8PIN-1"]
+    assert contents["package"] == ["SYNTH-8PIN-0"] #The two footprint variants only differ in their title
+    assert len(contents["devicesets"]) == 6
+    assert set(contents["devicesets"].values()) == {("SYNTH-8PIN-0", "SYNTH-8PIN-0"), ("SYNTH-8PIN-1", "SYNTH-8PIN-0")}
+    symbols, packages = stats["dedup"]["symbols"], stats["dedup"]["packages"]
+    assert (symbols["unique"], symbols["duplicates"], symbols["skippedConversions"]) == (2, 4, 4)
+    assert (packages["unique"], packages["duplicates"], packages["skippedConversions"]) == (1, 5, 5)
+    assert packages["bytesSaved"] > 0
+
+def testDifferentShapesWithOneNameGetSuffixes():
+    partDataList = [syntheticPartData(index) for index in range(2)]
+    partDataList[1]["partName"] = partDataList[0]["partName"]
+    contents = libraryContents(eagleConvert.createXML(partDataList))
+    assert contents["symbol"] == ["SYNTH-8PIN-0", "SYNTH-8PIN-0_2"]
+    assert sorted(symbol for symbol, package in contents["devicesets"].values()) == ["SYNTH-8PIN-0", "SYNTH-8PIN-0_2"]
+
+######################## POLY Pad in a Symbol ########################
+#The SMD of a POLY pad in a symbol is kept with the symbol's polygons, the minimize pass has to leave it alone
+
+def testSymbolWithPolyPad():
+    items = syntheticParts.symbolItems(4) + [["PAD", "q0", 0, 0, 1, "9", 0, 0, 0, None, ["POLY", syntheticParts.polyPath(0, 0, 20, 8)]]]
+    minimized = convertSymbolItems(items)
+    converted = convertSymbolItems(items, minimize=False)
+    assert [type(record) for record in minimized.polygon] == [shapeRecords.Smd]
+    assert [record.toDict() for record in minimized.polygon] == [record.toDict() for record in converted.polygon]
+
+######################## SMD Placement on POLY Pads ########################
+#The SMD is the largest axis-aligned rectangle inside the pad, with sizes rounded down to 0.01mm. Sizes found by
+#search can end up a step under a rectangle that only fits exactly, like on the turned square, never over the pad
+
+def rotated(points, degrees):
+    angle = math.radians(degrees)
+    return [(round(x * math.cos(angle) - y * math.sin(angle), 6), round(x * math.sin(angle) + y * math.cos(angle), 6)) for x, y in points]
+
+def placement(points):
+    x, y, width, height = eagleConvert.computeSmdPlacement([{"@x": x, "@y": y} for x, y in points])
+    smd = eagleConvert.box(x - width / 2, y - height / 2, x + width / 2, y + height / 2)
+    assert smd.buffer(-1e-9).within(eagleConvert.Polygon(points))
+    return round(x, 3) + 0.0, round(y, 3) + 0.0, width, height #+ 0.0 turns -0.0 into 0.0
+
+def testSmdOnRectangle():
+    assert placement([(0, 0), (2, 0), (2, 1), (0, 1)]) == (1.0, 0.5, 2.0, 1.0)
+
+def testSmdOnConcavePads():
+    assert placement([(0, 0), (4, 0), (4, 1), (1, 1), (1, 3), (0, 3)]) == (2.0, 0.5, 4.0, 1.0) #L shape, along its long leg
+    assert placement([(0, 0), (4, 0), (4, 2), (2, 1), (0, 2)]) == (2.0, 0.5, 4.0, 1.0) #V notch in the top edge
+
+def testSmdOnRotatedPads():
+    assert placement([(1, 0), (2, 1), (1, 2), (0, 1)]) == (1.0, 1.0, 0.99, 1.0) #Square turned by 45 degrees
+    assert placement(rotated([(-2, -0.5), (2, -0.5), (2, 0.5), (-2, 0.5)], 30)) == (-0.41, -0.237, 1.0, 0.57)
+    hexagon = [(round(math.cos(math.radians(60 * corner)), 6), round(math.sin(math.radians(60 * corner)), 6)) for corner in range(6)]
+    assert placement(hexagon) == (0.0, 0.0, 1.0, 1.72)
+
+def testSmdOnThinPad():
+    assert placement(rotated([(-3, -0.1), (3, -0.1), (3, 0.1), (-3, 0.1)], 10)) == (0.242, 0.043, 0.57, 0.1)
+
+######################## Curved Outlines ########################
+#Dropping vertices of an outline must not move an arc, EAGLE bends the edge from a vertex with a curve to the next vertex
+
+def renderOutline(vertices, segments=64):
+    #The outline as EAGLE draws it, with every curved edge split into short lines
+    points, curves = vertices.points(), vertices.curves or {}
+    outline = []
+    for index, (x, y) in enumerate(points):
+        outline.append((x, y))
+        curve = curves.get(index)
+        if not curve:
+            continue
+        nextX, nextY = points[(index + 1) % len(points)]
+        #The center sits left of the chord for a counterclockwise (positive) curve
+        offset = 1 / (2 * math.tan(math.radians(curve) / 2))
+        centerX = (x + nextX) / 2 - (nextY - y) * offset
+        centerY = (y + nextY) / 2 + (nextX - x) * offset
+        radius, start = math.hypot(x - centerX, y - centerY), math.atan2(y - centerY, x - centerX)
+        for step in range(1, segments):
+            angle = start + math.radians(curve) * step / segments
+            outline.append((centerX + radius * math.cos(angle), centerY + radius * math.sin(angle)))
+    return eagleConvert.Polygon(outline)
+
+def simplifiedOutline(coordinates, curves):
+    vertices = shapeRecords.Vertices(coordinates, curves)
+    before = renderOutline(vertices)
+    removed = shapeMinimizer.simplifyVertices(vertices)
+    assert before.symmetric_difference(renderOutline(vertices)).area < 1e-9
+    return removed
+
+def testSimplifyKeepsCurvedEdges():
+    square = [0, 0, 1, 0, 2, 0, 2, 2, 0, 2]
+    assert simplifiedOutline(square, {0: 45}) == [] #The arc from (0, 0) ends at (1, 0), not at (2, 0)
+    assert simplifiedOutline(square, {1: 45}) == []
+    assert simplifiedOutline(square, {2: 90}) == [(1.0, 0.0)] #The arc starts after the straight run
+    assert simplifiedOutline(square, {4: -60}) == [(1.0, 0.0)] #The closing edge back to (0, 0) is curved
+    assert simplifiedOutline([0, 0, 1, 0, 2, 0, 2, 1, 2, 2, 0, 2], {2: 30, 4: 90}) == [(1.0, 0.0)]
+
+######################## Converter Settings in the Fragment Cache ########################
+#Fragments converted with minimizeShapes on must not be reused once it is switched off
+
+def testFragmentsFollowMinimizeShapes():
+    line = ["POLY", "l0", 0, 0, 3, 1, [0, 40, "L", 20, 40]]
+    partDataList = [syntheticPartData(0, [line, line])] #The second copy is dropped by the minimize pass
+    with tempfile.TemporaryDirectory() as cacheDir:
+        fragments = fragmentCache.FragmentCache(partCache.PartCache(cacheDir))
+        minimized = withMinimize(True, eagleConvert.createXML, partDataList, fragments=fragments)
+        unminimized = withMinimize(False, eagleConvert.createXML, partDataList, fragments=fragments)
+        fragments.cache.flush()
+    assert unminimized != minimized
+    assert unminimized == withMinimize(False, eagleConvert.createXML, partDataList)
+    assert minimized == withMinimize(True, eagleConvert.createXML, partDataList)
+
+if __name__ == "__main__":
+    for name, test in list(globals().items()):
+        if name.startswith("test") and callable(test):
+            test()
+            print(name, "passed")
@@ -0,0 +1,60 @@
+import tempfile
+
+import eagleConvert
+import fragmentCache
+import partCache
+from test_convert import syntheticPartData, withMinimize
+
+#Converting synthetic parts with a fragment cache in a temporary folder.
+#Run with python -m pytest test_fragmentCache.py
+
+def createWithFragments(partDataList, fragments):
+    stats = {}
+    library = eagleConvert.createXML(partDataList, stats=stats, fragments=fragments)
+    fragments.flush()
+    return library, stats["fragments"]
+
+######################## Reuse ########################
+
+def testSecondRunReusesEveryPart():
+    partDataList = [syntheticPartData(index) for index in range(3)]
+    with tempfile.TemporaryDirectory() as cacheDir:
+        first, firstStats = createWithFragments(partDataList, fragmentCache.FragmentCache(partCache.PartCache(cacheDir)))
+        second, secondStats = createWithFragments(partDataList, fragmentCache.FragmentCache(partCache.PartCache(cacheDir)))
+    assert (firstStats["partsReused"], firstStats["partsRebuilt"]) == (0, 3)
+    assert (secondStats["partsReused"], secondStats["partsRebuilt"]) == (3, 0)
+    assert secondStats["symbols"] == {"reused": 3, "rebuilt": 0}
+    assert second == first == eagleConvert.createXML(partDataList)
+
+def testChangedPartIsRebuilt():
+    line = ["POLY", "l0", 0, 0, 3, 1, [0, 40, "L", 20, 40]]
+    with tempfile.TemporaryDirectory() as cacheDir:
+        createWithFragments([syntheticPartData(index) for index in range(3)], fragmentCache.FragmentCache(partCache.PartCache(cacheDir)))
+        changed = [syntheticPartData(0), syntheticPartData(1, [line]), syntheticPartData(2)]
+        library, stats = createWithFragments(changed, fragmentCache.FragmentCache(partCache.PartCache(cacheDir)))
+    assert (stats["partsReused"], stats["partsRebuilt"]) == (2, 1)
+    assert stats["symbols"] == {"reused": 3, "rebuilt": 0} #Only the footprint changed
+    assert stats["packages"]["rebuilt"] == 1
+    assert library == eagleConvert.createXML(changed)
+
+######################## Keys ########################
+
+def testSettingsOnlyStampChangedSettings():
+    fragments = fragmentCache.FragmentCache(partCache.PartCache(None, enabled=False), version="v")
+    assert fragmentCache.settingsStamp() == ""
+    assert fragments.cacheKey("symbol", b"\x01") == "v/symbol/01"
+    assert withMinimize(False, fragmentCache.settingsStamp) == "+minimizeShapes=False"
+    assert withMinimize(False, fragments.cacheKey, "symbol", b"\x01") == "v+minimizeShapes=False/symbol/01"
+
+######################## Placeholders ########################
+
+def testPlaceholdersAreFilledOnTheirAttribute():
+    fragment = '<deviceset name=" name " prefix=" symbol "><gates><gate name="C1" symbol=" symbol " x="0" y="0"/></gates></deviceset>'
+    filled = fragmentCache.fillPlaceholders(fragment, {"name": "PART", "symbol": "SYM"})
+    assert filled == '<deviceset name="PART" prefix=" symbol "><gates><gate name="C1" symbol="SYM" x="0" y="0"/></gates></deviceset>'
+
+if __name__ == "__main__":
+    for name, test in list(globals().items()):
+        if name.startswith("test") and callable(test):
+            test()
+            print(name, "passed")
@@ -0,0 +1,63 @@
+import os
+import tempfile
+
+import eagleConvert
+from test_convert import libraryContents, syntheticPartData
+
+#Merging synthetic parts into a library written to a temporary folder.
+#Run with python -m pytest test_libraryMerge.py
+
+def readLibrary(path):
+    with open(path, encoding="utf-8") as file:
+        return file.read()
+
+def devicesetText(library, code):
+    #The raw text of the deviceset with LCSC_PART code
+    end = library.index(f'name="LCSC_PART" value="{code}"')
+    start = library.rindex("<deviceset ", 0, end)
+    return library[start:library.index("</deviceset>", end)]
+
+def testMergeAddsReplacesAndRemoves():
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "library.lbr")
+        eagleConvert.mergeIntoLibrary([syntheticPartData(index) for index in range(3)], path) #Created, as there is no library yet
+        before = readLibrary(path)
+        changed = syntheticPartData(0)
+        changed["partName"] = "RENAMED"
+        eagleConvert.mergeIntoLibrary([changed, syntheticPartData(3)], path, removePartNums=["C900001"])
+        after = readLibrary(path)
+    contents = libraryContents(after)
+    assert sorted(contents["devicesets"]) == ["RENAMED", "SYNTH-8PIN-2", "SYNTH-8PIN-3"]
+    #The symbols only the replaced and removed parts used go with them, new shapes are added at the end
+    assert contents["symbol"] == ["SYNTH-8PIN-2", "RENAMED", "SYNTH-8PIN-3"]
+    assert contents["devicesets"]["RENAMED"] == ("RENAMED", "SYNTH-8PIN-0") #The package every part shares stays
+    assert devicesetText(after, "C900002") == devicesetText(before, "C900002") #Untouched parts are copied through
+
+def testMergeReusesShapesInTheLibrary():
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "library.lbr")
+        eagleConvert.createXML([syntheticPartData(index) for index in range(2)], output=path)
+        #C900002 and C900003 share their symbols and footprints with C900000 and C900001
+        eagleConvert.mergeIntoLibrary([syntheticPartData(index, sharedVariants=2) for index in (2, 3)], path)
+        contents = libraryContents(readLibrary(path))
+    assert contents["symbol"] == ["SYNTH-8PIN-0", "SYNTH-8PIN-1"]
+    assert contents["package"] == ["SYNTH-8PIN-0"]
+    assert contents["devicesets"]["SYNTH-8PIN-0_2"] == ("SYNTH-8PIN-0", "SYNTH-8PIN-0")
+    assert contents["devicesets"]["SYNTH-8PIN-1_2"] == ("SYNTH-8PIN-1", "SYNTH-8PIN-0")
+
+def testMergeWithFragmentCacheReusesShapes():
+    import fragmentCache
+    import partCache
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "library.lbr")
+        fragments = fragmentCache.FragmentCache(partCache.PartCache(os.path.join(directory, "fragments")))
+        eagleConvert.createXML([syntheticPartData(index) for index in range(2)], output=path, fragments=fragments)
+        eagleConvert.mergeIntoLibrary([syntheticPartData(2, sharedVariants=2)], path)
+        contents = libraryContents(readLibrary(path))
+    assert contents["symbol"] == ["SYNTH-8PIN-0", "SYNTH-8PIN-1"]
+
+if __name__ == "__main__":
+    for name, test in list(globals().items()):
+        if name.startswith("test") and callable(test):
+            test()
+            print(name, "passed")
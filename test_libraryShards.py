@@ -0,0 +1,99 @@
+import os
+import tempfile
+
+import eagleConvert
+import fragmentCache
+import lcscToEagle
+import libraryShards
+import partCache
+import stubServer
+import syntheticParts
+from test_convert import libraryContents, syntheticPartData
+
+#Writing synthetic parts as a sharded library in a temporary folder.
+#Run with python -m pytest test_libraryShards.py
+
+def readShards(outputDir):
+    #File name -> library text of every shard in outputDir
+    shards = {}
+    for fileName in sorted(os.listdir(outputDir)):
+        if fileName.endswith(".lbr"):
+            with open(os.path.join(outputDir, fileName), encoding="utf-8") as file:
+                shards[fileName] = file.read()
+    return shards
+
+######################## Manifest ########################
+
+def testManifestMapsEveryCode():
+    partDataList = [syntheticPartData(index) for index in range(4)]
+    with tempfile.TemporaryDirectory() as outputDir:
+        eagleConvert.createShardedLibrary(partDataList, outputDir, shardBy="code:6")
+        manifest = libraryShards.readManifest(outputDir)
+        shards = readShards(outputDir)
+    assert manifest["shardBy"] == "code:6"
+    assert manifest["parts"] == {"C900000": "C90000", "C900001": "C90000", "C900002": "C90000", "C900003": "C90000"}
+    assert list(shards) == ["C90000.lbr"]
+    assert sorted(libraryContents(shards["C90000.lbr"])["devicesets"]) == [partData["partName"] for partData in partDataList]
+
+def testOnlyShardsLeavesTheOthersAsTheyAre():
+    partDataList = [syntheticPartData(index) for index in range(3)]
+    with tempfile.TemporaryDirectory() as outputDir:
+        eagleConvert.createShardedLibrary(partDataList, outputDir, shardBy="code:7")
+        before = readShards(outputDir)
+        changed = syntheticPartData(1)
+        changed["partName"] = "RENAMED"
+        eagleConvert.createShardedLibrary([changed], outputDir, shardBy="code:7", onlyShards=["C900001"])
+        after = readShards(outputDir)
+        manifest = libraryShards.readManifest(outputDir)
+    assert list(after) == ["C900000.lbr", "C900001.lbr", "C900002.lbr"]
+    assert after["C900000.lbr"] == before["C900000.lbr"] and after["C900002.lbr"] == before["C900002.lbr"]
+    assert list(libraryContents(after["C900001.lbr"])["devicesets"]) == ["RENAMED"]
+    assert sorted(manifest["parts"]) == ["C900000", "C900001", "C900002"]
+
+######################## Worker Processes ########################
+#Worker processes get a copy of the fragment cache and hand what they converted back
+
+def testProcessesWriteTheSameShards():
+    partDataList = [syntheticPartData(index) for index in range(4)]
+    with tempfile.TemporaryDirectory() as directory:
+        single, parallel = os.path.join(directory, "single"), os.path.join(directory, "parallel")
+        eagleConvert.createShardedLibrary(partDataList, single, shardBy="code:7")
+        fragments = fragmentCache.FragmentCache(partCache.PartCache(os.path.join(directory, "fragments")))
+        stats = {}
+        eagleConvert.createShardedLibrary(partDataList, parallel, shardBy="code:7", processes=2, fragments=fragments, stats=stats)
+        assert readShards(parallel) == readShards(single)
+        assert (stats["fragments"]["partsReused"], stats["fragments"]["partsRebuilt"]) == (0, 4)
+        again = fragmentCache.FragmentCache(partCache.PartCache(os.path.join(directory, "fragments")))
+        stats = {}
+        eagleConvert.createShardedLibrary(partDataList, parallel, shardBy="code:7", processes=2, fragments=again, stats=stats)
+        assert (stats["fragments"]["partsReused"], stats["fragments"]["partsRebuilt"]) == (4, 0)
+        assert readShards(parallel) == readShards(single)
+
+######################## Output Folder ########################
+
+def testShardsAreNotWrittenToALibraryPath():
+    try:
+        eagleConvert.convertMultiplePartsToEagle(["C900000"], outputPath="./library.lbr", shardBy="code")
+    except ValueError:
+        pass
+    else:
+        raise AssertionError("a sharded library was written to library.lbr")
+    assert lcscToEagle.main(["convert", "C900000", "--shard-by", "code", "-o", "library.lbr"]) == 2
+
+def testShardsGoToTheLibraryFolderByDefault():
+    partInfos, components = syntheticParts.makeCatalog(2)
+    workingDir = os.getcwd()
+    with stubServer.usingStubServer(partInfos, components), tempfile.TemporaryDirectory() as directory:
+        os.chdir(directory)
+        try:
+            assert lcscToEagle.main(["-q", "convert", *partInfos, "--shard-by", "code:7", "--no-index"]) == 0
+        finally:
+            os.chdir(workingDir)
+        assert sorted(os.listdir(directory)) == ["library"]
+        assert sorted(libraryShards.readManifest(os.path.join(directory, "library"))["parts"]) == sorted(partInfos)
+
+if __name__ == "__main__":
+    for name, test in list(globals().items()):
+        if name.startswith("test") and callable(test):
+            test()
+            print(name, "passed")
@@ -0,0 +1,94 @@
+import json
+import multiprocessing
+import os
+import tempfile
+import time
+
+import partCache
+
+#The on-disk cache in a temporary folder.
+#Run with python -m pytest test_partCache.py
+
+ENTRY = "x" * 98 #json.dumps makes this a 100 byte entry file
+
+######################## Expiry ########################
+
+def testExpiredEntriesAreMisses():
+    with tempfile.TemporaryDirectory() as cacheDir:
+        cache = partCache.PartCache(cacheDir)
+        cache.set("codes", "C1", {"uuid": "a"}, ttl=-1)
+        cache.set("codes", "C2", {"uuid": "b"})
+        assert cache.get("codes", "C1") == (False, None)
+        assert cache.get("codes", "C2") == (True, {"uuid": "b"})
+        assert not cache.has("codes", "C1")
+        stats = cache.stats()
+        assert (stats["expired"], stats["misses"], stats["hits"], stats["entries"]) == (1, 1, 1, 1)
+
+def testNegativeEntries():
+    with tempfile.TemporaryDirectory() as cacheDir:
+        cache = partCache.PartCache(cacheDir)
+        cache.set("codes", "C1", None)
+        assert cache.get("codes", "C1") == (True, None)
+        assert cache.stats()["negativeHits"] == 1
+        #Unknown codes are asked for again sooner, they use negativeTtl
+        shortLived = partCache.PartCache(cacheDir, negativeTtl=-1)
+        shortLived.set("codes", "C2", None)
+        shortLived.set("codes", "C3", {"uuid": "c"})
+        assert shortLived.get("codes", "C2") == (False, None)
+        assert shortLived.get("codes", "C3") == (True, {"uuid": "c"})
+
+######################## Eviction ########################
+
+def testLeastRecentlyUsedAreEvictedToLowWater():
+    with tempfile.TemporaryDirectory() as cacheDir:
+        cache = partCache.PartCache(cacheDir, maxBytes=1000)
+        for number in range(10):
+            cache.set("components", str(number), ENTRY, flush=False)
+            time.sleep(0.002) #Distinct last access times
+        cache.get("components", "0")
+        assert cache.stats()["evictions"] == 0
+        cache.set("components", "10", ENTRY, flush=False) #1100 bytes, 2 entries go to get under 900
+        assert cache.stats()["evictions"] == 2
+        assert [cache.has("components", str(number)) for number in range(4)] == [True, False, False, True]
+        assert not os.path.exists(cache._entryPath("components", "1"))
+        cache.set("components", "11", ENTRY, flush=False) #Back at 1000 bytes, nothing to evict
+        assert cache.stats()["evictions"] == 2
+
+######################## Shared Folder ########################
+#Every process keeps its own copy of the index, flushing must not drop what the others wrote
+
+def testFlushKeepsEntriesOfOtherCaches():
+    with tempfile.TemporaryDirectory() as cacheDir:
+        first, second = partCache.PartCache(cacheDir), partCache.PartCache(cacheDir)
+        first.set("codes", "C0", {"uuid": "z"})
+        assert second.get("codes", "C0") == (True, {"uuid": "z"})
+        first.set("codes", "C1", {"uuid": "a"}, flush=False)
+        second.set("codes", "C2", {"uuid": "b"}, flush=False)
+        second.set("codes", "C0", {"uuid": "y"}, ttl=-1, flush=False)
+        assert second.get("codes", "C0") == (False, None) #Expired, so removed by the second cache only
+        first.flush()
+        second.flush()
+        reader = partCache.PartCache(cacheDir)
+        assert [reader.has("codes", code) for code in ("C0", "C1", "C2")] == [False, True, True]
+
+def writeEntries(cacheDir, prefix, count):
+    cache = partCache.PartCache(cacheDir)
+    for number in range(count):
+        cache.set("codes", f"{prefix}{number}", {"uuid": number})
+
+def testConcurrentFlushes():
+    with tempfile.TemporaryDirectory() as cacheDir:
+        processes = [multiprocessing.Process(target=writeEntries, args=(cacheDir, f"P{worker}-", 40)) for worker in range(4)]
+        for process in processes:
+            process.start()
+        for process in processes:
+            process.join()
+        assert [process.exitcode for process in processes] == [0] * 4
+        with open(os.path.join(cacheDir, "index.json"), encoding="utf-8") as file:
+            assert len(json.load(file)) == 160
+
+if __name__ == "__main__":
+    for name, test in list(globals().items()):
+        if name.startswith("test") and callable(test):
+            test()
+            print(name, "passed")
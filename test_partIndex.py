@@ -0,0 +1,94 @@
+import os
+import sqlite3
+import tempfile
+
+import eagleConvert
+import partIndex
+from test_convert import syntheticPartData
+
+#The part index in a temporary folder, filled with made up records or synthetic parts.
+#Run with python -m pytest test_partIndex.py
+
+def record(code, title, footprint="QFN-32_L5.0-W5.0-P0.50", pins=32):
+    return partIndex.indexRecord(code, title, title, title, footprint.split("_")[0], footprint, pins, pins)
+
+def codes(rows):
+    return sorted(row["code"] for row in rows)
+
+######################## Updates ########################
+
+def testReplaceLibraryDropsWhatItHeld():
+    index = partIndex.PartIndex(":memory:")
+    index.replaceLibrary("a.lbr", [record("C1", "ESP32"), record("C2", "STM32")])
+    index.replaceLibrary("b.lbr", [record("C1", "ESP32")])
+    index.replaceLibrary("a.lbr", [record("C3", "RP2040")])
+    assert codes(index.search("*")) == [] #Not a word
+    assert codes(index.search("QFN")) == ["C1", "C3"]
+    assert [row["library"] for row in index.lookup("c1")] == [os.path.abspath("b.lbr")]
+    assert index.stats()["libraries"] == 2
+
+def testUpdatePartsKeepsTheOtherParts():
+    index = partIndex.PartIndex(":memory:")
+    index.replaceLibrary("a.lbr", [record("C1", "ESP32"), record("C2", "STM32")])
+    index.updateParts("a.lbr", ["C2"], [record("C3", "RP2040")])
+    assert codes(index.search("QFN", library="a.lbr")) == ["C1", "C3"]
+
+def testFailedUpdateIsRolledBack():
+    index = partIndex.PartIndex(":memory:")
+    index.replaceLibrary("a.lbr", [record("C1", "ESP32")])
+    try:
+        with index.update("a.lbr") as update:
+            update.add(record("C2", "STM32"))
+            raise OSError("disk full")
+    except OSError:
+        pass
+    assert codes(index.search("QFN")) == ["C1"]
+
+######################## Search ########################
+
+def testSearchMatchesEveryWord():
+    index = partIndex.PartIndex(":memory:")
+    index.replaceLibrary("a.lbr", [record("C1", "ESP32-C3"), record("C2", "STM32F103", "LQFP-48_L7.0-W7.0-P0.50", 48), record("C3", "RP2040", "QFN-56_L7.0-W7.0-P0.40", 56)])
+    assert codes(index.search("QFN-32")) == ["C1"]
+    assert codes(index.search("qfn 56")) == ["C3"]
+    assert codes(index.search("STM*")) == ["C2"]
+    assert codes(index.search("c2")) == ["C2"]
+    assert index.search("") == []
+
+######################## Schema ########################
+
+def testOtherSchemaVersionStartsOver():
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, partIndex.INDEX_NAME)
+        index = partIndex.PartIndex(path)
+        index.replaceLibrary("a.lbr", [record("C1", "ESP32")])
+        index.close()
+        connection = sqlite3.connect(path)
+        connection.execute(f"PRAGMA user_version = {partIndex.SCHEMA_VERSION + 1}")
+        connection.close()
+        index = partIndex.PartIndex(path)
+        assert index.stats()["parts"] == 0
+        index.replaceLibrary("a.lbr", [record("C1", "ESP32")])
+        assert codes(index.search("ESP32")) == ["C1"]
+        index.close()
+
+######################## Rebuild ########################
+#Rebuilding from the library file gives the records collected while it was written
+
+def testRebuildGivesWhatWasWritten():
+    partDataList = [syntheticPartData(index, sharedVariants=2) for index in range(3)]
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "library.lbr")
+        records = partIndex.RecordCollector()
+        eagleConvert.createXML(partDataList, output=path, indexRecords=records)
+        written, rebuilt = partIndex.PartIndex(":memory:"), partIndex.PartIndex(":memory:")
+        written.replaceLibrary(path, records)
+        assert rebuilt.rebuildFromLibrary(path) == 3
+        for code in ("C900000", "C900001", "C900002"):
+            assert rebuilt.lookup(code) == written.lookup(code) != []
+
+if __name__ == "__main__":
+    for name, test in list(globals().items()):
+        if name.startswith("test") and callable(test):
+            test()
+            print(name, "passed")